@@ -5,6 +5,8 @@
 import os
 import io
 import csv
+import json
+import base64
 import sqlite3
 import httpx
 from contextlib import contextmanager
@@ -18,10 +20,15 @@ from pydantic import BaseModel
 
 from config import (
     MINSK_TZ, DB_PATH, ADMIN_ID,
-    VENUE_OPEN_TIME, VENUE_CLOSE_TIME, TIME_ORDER_SQL,
+    VENUE_OPEN_TIME, TIME_ORDER_SQL,
     BATCH_TEMPLATE_HEADERS, BATCH_TEMPLATE_EXAMPLE, BATCH_CATEGORY_MAP,
-    _build_time_filter, _build_overnight_union,
+    EVENTS_ORDER_SQL,
+    _build_time_filter, _build_overnight_union, _build_category_filter, _build_upcoming_filter,
+    _build_paged_sql, _build_keyset_sql, _build_category_counts_sql, _build_calendar_dates_sql,
 )
+from db_pool import read_connection, write_connection, run_db
+from db_schema import ensure_events_schema
+from search_index import search_clause
 
 # ── Конфиг ──────────────────────────────────────────────────────────────────
 
@@ -38,6 +45,7 @@ app = FastAPI(
 @app.on_event("startup")
 def _run_migrations():
     with sqlite3.connect(DB_PATH) as conn:
+        ensure_events_schema(conn)
         conn.execute("""
             CREATE TABLE IF NOT EXISTS users (
                 user_id INTEGER PRIMARY KEY,
@@ -116,7 +124,6 @@ def _run_migrations():
             ON event_ticket_posts(user_id, event_key, post_type)
         """)
         for sql in [
-            "ALTER TABLE events ADD COLUMN is_kids INTEGER DEFAULT 0",
             "ALTER TABLE pending_events ADD COLUMN is_kids INTEGER DEFAULT 0",
             "ALTER TABLE users ADD COLUMN telegram_username TEXT DEFAULT ''",
             "ALTER TABLE event_attendees ADD COLUMN event_key TEXT DEFAULT ''",
@@ -205,12 +212,16 @@ app.add_middleware(
 
 @contextmanager
 def get_db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    try:
+    """Соединение текущего потока из общего пула (только чтение)."""
+    with read_connection(DB_PATH) as conn:
+        yield conn
+
+
+@contextmanager
+def get_db_write():
+    """Общий писатель процесса: запись сериализована, commit на выходе из блока."""
+    with write_connection(DB_PATH) as conn:
         yield conn
-    finally:
-        conn.close()
 
 
 def row_to_dict(row) -> dict:
@@ -727,6 +738,7 @@ class EventsResponse(BaseModel):
     page: int
     per_page: int
     events: list[Event]
+    next_cursor: Optional[str] = None
 
 
 class CategoryCounts(BaseModel):
@@ -846,27 +858,12 @@ def fetch_events_paged(
     is consistent across all pages.
     """
     if order is None:
-        order = f"event_date, {TIME_ORDER_SQL}, title"
-    
-    SELECT_COLS = """id, title, details, description, event_date, show_time, end_time,
-                     place, location, price, category, source_url, source_name, is_kids"""
-    where = " AND ".join(where_clauses) if where_clauses else "1=1"
+        order = EVENTS_ORDER_SQL
     offset = (page - 1) * per_page
 
-    if extra_union:
-        union_sql, union_params = extra_union
-        main_sql   = f"SELECT {SELECT_COLS} FROM events WHERE {where}"
-        combined   = f"{main_sql} UNION {union_sql}"
-        all_params = params + union_params
-        count_sql  = f"SELECT COUNT(*) FROM ({combined})"
-        page_sql   = f"SELECT * FROM ({combined}) ORDER BY {order} LIMIT ? OFFSET ?"
-    else:
-        all_params = params
-        count_sql  = f"SELECT COUNT(*) FROM events WHERE {where}"
-        page_sql   = (
-            f"SELECT {SELECT_COLS} FROM events WHERE {where}"
-            f" ORDER BY {order} LIMIT ? OFFSET ?"
-        )
+    union_sql, union_params = extra_union or (None, [])
+    all_params = params + union_params
+    count_sql, page_sql = _build_paged_sql(where_clauses, order, union_sql)
 
     with get_db() as conn:
         cursor = conn.cursor()
@@ -877,6 +874,121 @@ def fetch_events_paged(
     return rows, total
 
 
+# ── Keyset-пагинация ─────────────────────────────────────────────────────────
+# Курсор — непрозрачная base64-строка с ключом последней отданной строки
+# (event_date, признак «без времени», show_time, title, id) и закэшированным total.
+# Страница N стоит столько же, сколько первая: WHERE (ключ) > (курсор) LIMIT n.
+# SQL страниц — config._build_keyset_sql (KEYSET_ORDER_SQL / KEYSET_SEEK_SQL).
+
+
+def _encode_cursor(row: dict, total: int) -> str:
+    show_time = row.get("show_time") or ""
+    key = [
+        row.get("event_date") or "",
+        0 if show_time else 1,
+        show_time,
+        row.get("title") or "",
+        row["id"],
+    ]
+    raw = json.dumps({"k": key, "t": total}, ensure_ascii=False, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+# Типы полей ключа курсора (как в _encode_cursor); bool — не int
+_CURSOR_KEY_TYPES = (str, int, str, str, int)
+
+
+def _is_int(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _decode_cursor(cursor: str) -> tuple[list | None, int | None]:
+    """Пустой курсор — первая страница в keyset-режиме. Битый курсор → 400.
+
+    Значения ключа уходят в SQL как параметры, поэтому проверяются их типы:
+    списки / объекты внутри курсора — тоже 400, а не ошибка привязки в SQLite.
+    """
+    if not cursor:
+        return None, None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    key = data.get("k") if isinstance(data, dict) else None
+    total = data.get("t") if isinstance(data, dict) else None
+    valid = (
+        isinstance(key, list)
+        and len(key) == len(_CURSOR_KEY_TYPES)
+        and all(_is_int(v) if t is int else isinstance(v, t) for v, t in zip(key, _CURSOR_KEY_TYPES))
+        and key[1] in (0, 1)
+        and (total is None or (_is_int(total) and total >= 0))
+    )
+    if not valid:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return key, total
+
+
+def fetch_events_keyset(
+    where_clauses: list[str],
+    params: list,
+    per_page: int,
+    cursor: str = "",
+    extra_union: tuple[str, list] | None = None,
+) -> tuple[list[dict], int, str | None]:
+    """Keyset-вариант fetch_events_paged: (события, total, next_cursor).
+
+    COUNT(*) выполняется только на первой странице, дальше total едет внутри курсора.
+    next_cursor = None, когда страниц больше нет.
+    """
+    seek_key, total = _decode_cursor(cursor)
+
+    union_sql, union_params = extra_union or (None, [])
+    base_params = params + union_params
+    count_sql, page_sql = _build_keyset_sql(where_clauses, union_sql, seek=seek_key is not None)
+
+    page_params = list(base_params)
+    if seek_key is not None:
+        page_params += seek_key
+    page_params.append(per_page + 1)
+
+    with get_db() as conn:
+        cursor_db = conn.cursor()
+        if total is None:
+            cursor_db.execute(count_sql, base_params)
+            total = cursor_db.fetchone()[0]
+        cursor_db.execute(page_sql, page_params)
+        rows = [row_to_dict(r) for r in cursor_db.fetchall()]
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = _encode_cursor(rows[-1], total)
+    return rows, total, next_cursor
+
+
+def _events_response(
+    where: list[str],
+    params: list,
+    page: int,
+    per_page: int,
+    cursor: Optional[str] = None,
+    extra_union: tuple[str, list] | None = None,
+) -> EventsResponse:
+    """Общий хвост списочных эндпоинтов: OFFSET-режим по page или keyset по cursor."""
+    if cursor is not None:
+        page_events, total, next_cursor = fetch_events_keyset(
+            where, params, per_page, cursor, extra_union=extra_union,
+        )
+        return EventsResponse(total=total, page=page, per_page=per_page,
+                              events=[Event(**e) for e in page_events],
+                              next_cursor=next_cursor)
+    page_events, total = fetch_events_paged(where, params, page, per_page,
+                                            extra_union=extra_union)
+    return EventsResponse(total=total, page=page, per_page=per_page,
+                          events=[Event(**e) for e in page_events])
+
+
 def _event_exists(conn: sqlite3.Connection, event_id: int) -> bool:
     row = conn.execute("SELECT 1 FROM events WHERE id = ? LIMIT 1", (event_id,)).fetchone()
     return bool(row)
@@ -1114,7 +1226,7 @@ def admin_dashboard(
 
 @app.post("/api/events/{event_id}/attend")
 def add_event_attendee(event_id: int, payload: AttendRequest):
-    with get_db() as conn:
+    with get_db_write() as conn:
         resolved_key = _resolve_event_key(conn, payload.event_key, payload.event_id or event_id)
 
         upsert_user_profile(
@@ -1154,7 +1266,7 @@ def remove_event_attendee(
     username: str = Query(""),
     first_name: str = Query(""),
 ):
-    with get_db() as conn:
+    with get_db_write() as conn:
         resolved_key = _resolve_event_key(conn, event_key, event_id)
 
         conn.execute("DELETE FROM event_attendees WHERE event_key = ? AND user_id = ?", (resolved_key, user_id))
@@ -1238,7 +1350,7 @@ def get_event_ratings(event_id: int, user_id: Optional[int] = Query(None), event
 def upsert_event_rating(event_id: int, payload: RatingRequest):
     if payload.score < 1 or payload.score > 5:
         raise HTTPException(status_code=400, detail="score must be between 1 and 5")
-    with get_db() as conn:
+    with get_db_write() as conn:
         resolved_key = _resolve_event_key(conn, payload.event_key, payload.event_id or event_id)
         upsert_user_profile(
             conn,
@@ -1282,7 +1394,7 @@ def remove_event_rating(
     username: str = Query(""),
     first_name: str = Query(""),
 ):
-    with get_db() as conn:
+    with get_db_write() as conn:
         resolved_key = _resolve_event_key(conn, event_key, event_id)
         now = datetime.now(MINSK_TZ).strftime("%Y-%m-%d %H:%M:%S")
 
@@ -1461,7 +1573,7 @@ def get_user_ticket_posts(user_id: int = Query(...)):
 
 @app.post("/api/events/{event_id}/tickets")
 def upsert_event_ticket_post(event_id: int, payload: TicketPostRequest):
-    with get_db() as conn:
+    with get_db_write() as conn:
         _delete_expired_ticket_posts(conn)
         resolved_key = _resolve_event_key(conn, payload.event_key, payload.event_id or event_id)
         post_type = _normalize_ticket_post_type(payload.post_type)
@@ -1526,7 +1638,7 @@ def remove_event_ticket_post(
     username: str = Query(""),
     first_name: str = Query(""),
 ):
-    with get_db() as conn:
+    with get_db_write() as conn:
         _delete_expired_ticket_posts(conn)
         resolved_key = _resolve_event_key(conn, event_key, event_id)
         normalized_type = _normalize_ticket_post_type(post_type)
@@ -1632,12 +1744,23 @@ def get_ticket_posts_summary(payload: TicketSummaryRequest):
 
 # ── Категории ────────────────────────────────────────────────────────────────
 
-def _count_events_for_category(
-    category: str,
+COUNT_CATEGORIES = [
+    "cinema", "concert", "theater", "exhibition", "kids", "fest", "sport", "party",
+    "free", "excursion", "market", "masterclass", "boardgames", "broadcast",
+    "education", "quiz", "other",
+]
+
+
+def _counts_scope(
     filter_name: Optional[str] = None,
     date: Optional[str] = None,
-) -> int:
-    """Count events using the same filtering semantics as list endpoints."""
+) -> tuple[list[str], list, tuple[str, list] | None]:
+    """WHERE-условия и overnight UNION для /api/categories/counts — без фильтра категории.
+
+    Семантика та же, что у списочных эндпоинтов (date / today / tomorrow / weekend /
+    upcoming / по умолчанию — всё начиная с сегодня). Категория применяется уже
+    в агрегате, поэтому набор строк выбирается один раз на все категории.
+    """
     today = today_str()
     now_t = now_time_str()
     where: list[str] = []
@@ -1651,46 +1774,59 @@ def _count_events_for_category(
             time_filter, time_params = _build_time_filter(date, today, now_t)
             where.append(time_filter)
             params.extend(time_params)
-        extra_union = _build_overnight_union(date, now_t if date == today else None, category)
+        extra_union = _build_overnight_union(date, now_t if date == today else None, None)
     elif filter_name == "today":
         where.append("event_date = ?")
         params.append(today)
         time_filter, time_params = _build_time_filter(today, today, now_t)
         where.append(time_filter)
         params.extend(time_params)
-        extra_union = _build_overnight_union(today, now_t, category)
+        extra_union = _build_overnight_union(today, now_t, None)
     elif filter_name == "tomorrow":
         tomorrow = (now_minsk() + timedelta(days=1)).strftime("%Y-%m-%d")
         where.append("event_date = ?")
         params.append(tomorrow)
-        extra_union = _build_overnight_union(tomorrow, None, category)
+        extra_union = _build_overnight_union(tomorrow, None, None)
     elif filter_name == "weekend":
         saturday, sunday = get_weekend_dates()
         where.append("event_date IN (?, ?)")
         params.extend([saturday, sunday])
     elif filter_name == "upcoming":
         until = (now_minsk() + timedelta(days=30)).strftime("%Y-%m-%d")
-        venue_open = now_t < VENUE_CLOSE_TIME
-        if venue_open:
-            today_filter = "(event_date > ? OR (show_time = '' OR show_time IS NULL OR (end_time != '' AND end_time IS NOT NULL AND (end_time > ? OR end_time < show_time)) OR ((end_time = '' OR end_time IS NULL) AND show_time > ?)))"
-        else:
-            today_filter = "(event_date > ? OR ((end_time != '' AND end_time IS NOT NULL AND (end_time > ? OR end_time < show_time)) OR ((end_time = '' OR end_time IS NULL) AND show_time != '' AND show_time IS NOT NULL AND show_time > ?)))"
+        today_filter, today_params = _build_upcoming_filter(today, now_t)
         where.extend(["event_date BETWEEN ? AND ?", today_filter])
-        params.extend([today, until, today, now_t, now_t])
+        params.extend([today, until, *today_params])
     else:
         where.append("event_date >= ?")
         params.append(today)
 
-    if category == "free":
-        where.append("price = 'Бесплатно'")
-    elif category == "kids":
-        where.append("is_kids = 1")
-    elif category and category != "all":
-        where.append("category = ?")
-        params.append(category)
+    return where, params, extra_union
 
-    _, total = fetch_events_paged(where, params, 1, 1, extra_union=extra_union)
-    return total
+
+def count_events_by_category(
+    filter_name: Optional[str] = None,
+    date: Optional[str] = None,
+) -> dict[str, int]:
+    """Счётчики всех категорий одним запросом (GROUP BY category + условные SUM).
+
+    free/kids считаются не по полю category, а по price = 'Бесплатно' и is_kids = 1 —
+    как и в списочных эндпоинтах. Overnight-события (хранятся в D-1) входят в тот же
+    UNION, что и основной набор, поэтому совпадают с тем, что отдаёт список.
+    """
+    where, params, extra_union = _counts_scope(filter_name, date)
+    union_sql, union_params = extra_union or (None, [])
+    all_params = params + union_params
+    sql = _build_category_counts_sql(where, union_sql)
+
+    counts = {category: 0 for category in COUNT_CATEGORIES}
+    with get_db() as conn:
+        for row in conn.execute(sql, all_params).fetchall():
+            counts["free"] += row["free"] or 0
+            counts["kids"] += row["kids"] or 0
+            category = row["category"]
+            if category in counts and category not in ("free", "kids"):
+                counts[category] = row["total"]
+    return counts
 
 
 @app.get("/api/categories/counts", response_model=CategoryCounts)
@@ -1699,13 +1835,7 @@ def categories_counts(
     date: Optional[str] = Query(None, description="YYYY-MM-DD"),
 ):
     """Количество событий по категориям. С filter/date фронт получает все counts одним HTTP-запросом."""
-    categories = [
-        "cinema", "concert", "theater", "exhibition", "kids", "fest", "sport", "party",
-        "free", "excursion", "market", "masterclass", "boardgames", "broadcast",
-        "education", "quiz", "other",
-    ]
-    data = {category: _count_events_for_category(category, filter, date) for category in categories}
-    return CategoryCounts(**data)
+    return CategoryCounts(**count_events_by_category(filter, date))
 
 # ── Даты с событиями (для календаря) ────────────────────────────────────────
 
@@ -1717,24 +1847,11 @@ def calendar_dates(
     """Список дат у которых есть события (для подсветки в календаре)."""
     today = today_str()
     until = (now_minsk() + timedelta(days=30 * months_ahead)).strftime("%Y-%m-%d")
-    params: list = [today, until]
-    where = ["event_date >= ?", "event_date <= ?"]
-    
-    # КАТЕГОРИЯ free/kids — особая обработка (не по полю category)
-    if category == "free":
-        where.append("price = 'Бесплатно'")
-    elif category == "kids":
-        where.append("is_kids = 1")
-    elif category and category != "all":
-        where.append("category = ?")
-        params.append(category)
-        
+    sql, params = _build_calendar_dates_sql(today, until, category)
+
     with get_db() as conn:
         cursor = conn.cursor()
-        cursor.execute(
-            f"SELECT DISTINCT event_date FROM events WHERE {' AND '.join(where)} ORDER BY event_date",
-            params,
-        )
+        cursor.execute(sql, params)
         dates = [row["event_date"] for row in cursor.fetchall()]
     return {"dates": dates}
 
@@ -1767,6 +1884,7 @@ def get_events(
     search: Optional[str]    = Query(None, description="Поиск по названию/месту"),
     page: int                = Query(1, ge=1),
     per_page: int            = Query(10, ge=1, le=500),
+    cursor: Optional[str]    = Query(None, description="Keyset-курсор (пустая строка — первая страница)"),
 ):
     today = today_str()
     now_t = now_time_str()
@@ -1803,12 +1921,9 @@ def get_events(
         where.append("event_date >= ?")
         params.append(today)
         # Фильтруем сегодняшние события по времени
-        venue_open = now_t < VENUE_CLOSE_TIME
-        if venue_open:
-            where.append("(event_date > ? OR (show_time = '' OR show_time IS NULL OR (end_time != '' AND end_time IS NOT NULL AND (end_time > ? OR end_time < show_time)) OR ((end_time = '' OR end_time IS NULL) AND show_time > ?)))")
-        else:
-            where.append("(event_date > ? OR ((end_time != '' AND end_time IS NOT NULL AND (end_time > ? OR end_time < show_time)) OR ((end_time = '' OR end_time IS NULL) AND show_time != '' AND show_time IS NOT NULL AND show_time > ?)))")
-        params.extend([today, now_t, now_t])
+        today_filter, today_params = _build_upcoming_filter(today, now_t)
+        where.append(today_filter)
+        params.extend(today_params)
 
     # КАТЕГОРИЯ FREE - ОСОБАЯ ОБРАБОТКА
     if category == "free":
@@ -1836,21 +1951,14 @@ def get_events(
             where.append("event_date = ?")
             params.append(search_date)
         else:
-            # SQLite LOWER() не работает с кириллицей — генерируем варианты через Python
-            ql = q.lower()
-            qu = q.upper()
-            qc = (ql[0].upper() + ql[1:]) if ql else ql  # "концерт" → "Концерт"
-            spl = f"%{ql}%"   # нижний регистр
-            spc = f"%{qc}%"   # с заглавной первой буквой
-            spu = f"%{qu}%"   # полный верхний регистр (для МАМАКВИЗ! и подобных)
-            where.append(
-                "(title LIKE ? OR title LIKE ? OR title LIKE ? "
-                "OR place LIKE ? OR place LIKE ? OR place LIKE ? "
-                "OR details LIKE ? OR details LIKE ? OR details LIKE ? "
-                "OR description LIKE ? OR description LIKE ? OR description LIKE ? "
-                "OR category LIKE ?)"
-            )
-            params.extend([spl, spc, spu, spl, spc, spu, spl, spc, spu, spl, spc, spu, spl])
+            # Полнотекстовый индекс events_fts (регистр кириллицы складывает токенайзер)
+            text_clause = search_clause(q)
+            if not text_clause:
+                # В запросе нет слов (одна пунктуация) — совпадений нет
+                return EventsResponse(total=0, page=page, per_page=per_page, events=[])
+            text_sql, text_params = text_clause
+            where.append(f"({text_sql} OR category LIKE ?)")
+            params.extend(text_params + [f"%{q.lower()}%"])
 
     # Midnight-crossing events: only when filtering by a specific date, no text search
     extra_union = None
@@ -1858,15 +1966,7 @@ def get_events(
         overnight_now = now_t if date == today else None
         extra_union = _build_overnight_union(date, overnight_now, category)
 
-    page_events, total = fetch_events_paged(where, params, page, per_page,
-                                            extra_union=extra_union)
-
-    return EventsResponse(
-        total=total,
-        page=page,
-        per_page=per_page,
-        events=[Event(**e) for e in page_events],
-    )
+    return _events_response(where, params, page, per_page, cursor, extra_union)
 
 
 # ── Шорткаты ─────────────────────────────────────────────────────────────────
@@ -1876,6 +1976,7 @@ def events_today(
     category: Optional[str] = Query(None),
     page: int = Query(1, ge=1),
     per_page: int = Query(10, ge=1, le=500),
+    cursor: Optional[str] = Query(None),
 ):
     today = today_str()
     now_t = now_time_str()
@@ -1886,19 +1987,13 @@ def events_today(
     where.append(time_filter)
     params.extend(time_params)
 
-    if category == "free":
-        where.append("price = 'Бесплатно'")
-    elif category == "kids":
-        where.append("is_kids = 1")
-    elif category and category != "all":
-        where.append("category = ?")
-        params.append(category)
+    category_filter, category_params = _build_category_filter(category)
+    if category_filter:
+        where.append(category_filter)
+        params.extend(category_params)
 
     extra_union = _build_overnight_union(today, now_t, category)
-    page_events, total = fetch_events_paged(where, params, page, per_page,
-                                            extra_union=extra_union)
-    return EventsResponse(total=total, page=page, per_page=per_page,
-                          events=[Event(**e) for e in page_events])
+    return _events_response(where, params, page, per_page, cursor, extra_union)
 
 
 @app.get("/api/events/tomorrow", response_model=EventsResponse)
@@ -1906,24 +2001,19 @@ def events_tomorrow(
     category: Optional[str] = Query(None),
     page: int = Query(1, ge=1),
     per_page: int = Query(10, ge=1, le=500),
+    cursor: Optional[str] = Query(None),
 ):
     tomorrow = (now_minsk() + timedelta(days=1)).strftime("%Y-%m-%d")
     where = ["event_date = ?"]
     params: list = [tomorrow]
 
-    if category == "free":
-        where.append("price = 'Бесплатно'")
-    elif category == "kids":
-        where.append("is_kids = 1")
-    elif category and category != "all":
-        where.append("category = ?")
-        params.append(category)
+    category_filter, category_params = _build_category_filter(category)
+    if category_filter:
+        where.append(category_filter)
+        params.extend(category_params)
 
     extra_union = _build_overnight_union(tomorrow, None, category)
-    page_events, total = fetch_events_paged(where, params, page, per_page,
-                                            extra_union=extra_union)
-    return EventsResponse(total=total, page=page, per_page=per_page,
-                          events=[Event(**e) for e in page_events])
+    return _events_response(where, params, page, per_page, cursor, extra_union)
 
 
 @app.get("/api/events/weekend", response_model=EventsResponse)
@@ -1931,23 +2021,19 @@ def events_weekend(
     category: Optional[str] = Query(None),
     page: int = Query(1, ge=1),
     per_page: int = Query(10, ge=1, le=500),
+    cursor: Optional[str] = Query(None),
 ):
     saturday, sunday = get_weekend_dates()
     where = ["event_date IN (?, ?)"]
     params: list = [saturday, sunday]
     
     # КАТЕГОРИЯ free/kids — особая обработка (не по полю category)
-    if category == "free":
-        where.append("price = 'Бесплатно'")
-    elif category == "kids":
-        where.append("is_kids = 1")
-    elif category and category != "all":
-        where.append("category = ?")
-        params.append(category)
-        
-    page_events, total = fetch_events_paged(where, params, page, per_page)
-    return EventsResponse(total=total, page=page, per_page=per_page,
-                          events=[Event(**e) for e in page_events])
+    category_filter, category_params = _build_category_filter(category)
+    if category_filter:
+        where.append(category_filter)
+        params.extend(category_params)
+
+    return _events_response(where, params, page, per_page, cursor)
 
 
 @app.get("/api/events/upcoming", response_model=EventsResponse)
@@ -1956,33 +2042,25 @@ def events_upcoming(
     days: int = Query(30, ge=1, le=90),
     page: int = Query(1, ge=1),
     per_page: int = Query(10, ge=1, le=500),
+    cursor: Optional[str] = Query(None),
 ):
     today = today_str()
     now_t = now_time_str()
     until = (now_minsk() + timedelta(days=days)).strftime("%Y-%m-%d")
-    venue_open = now_t < VENUE_CLOSE_TIME
-    if venue_open:
-        today_filter = "(event_date > ? OR (show_time = '' OR show_time IS NULL OR (end_time != '' AND end_time IS NOT NULL AND (end_time > ? OR end_time < show_time)) OR ((end_time = '' OR end_time IS NULL) AND show_time > ?)))"
-    else:
-        today_filter = "(event_date > ? OR ((end_time != '' AND end_time IS NOT NULL AND (end_time > ? OR end_time < show_time)) OR ((end_time = '' OR end_time IS NULL) AND show_time != '' AND show_time IS NOT NULL AND show_time > ?)))"
+    today_filter, today_params = _build_upcoming_filter(today, now_t)
     where = [
         "event_date BETWEEN ? AND ?",
         today_filter,
     ]
-    params: list = [today, until, today, now_t, now_t]
+    params: list = [today, until, *today_params]
     
     # КАТЕГОРИЯ free/kids — особая обработка (не по полю category)
-    if category == "free":
-        where.append("price = 'Бесплатно'")
-    elif category == "kids":
-        where.append("is_kids = 1")
-    elif category and category != "all":
-        where.append("category = ?")
-        params.append(category)
-        
-    page_events, total = fetch_events_paged(where, params, page, per_page)
-    return EventsResponse(total=total, page=page, per_page=per_page,
-                          events=[Event(**e) for e in page_events])
+    category_filter, category_params = _build_category_filter(category)
+    if category_filter:
+        where.append(category_filter)
+        params.extend(category_params)
+
+    return _events_response(where, params, page, per_page, cursor)
 
 
 # ── Сабмит события от пользователя сайта ────────────────────────────────────
@@ -2163,7 +2241,7 @@ def submit_event(event: EventSubmit):
         username  = event.tg_username or "web_user"
         first_name = event.tg_first_name or "Web"
         
-        with get_db() as conn:
+        with get_db_write() as conn:
             cursor = conn.cursor()
             
             # Сохраняем ОДНУ запись, даже если это период
@@ -2280,7 +2358,7 @@ class WebappPingRequest(BaseModel):
 def webapp_ping(req: WebappPingRequest):
     """Сайт вызывает при открытии — логируем для статистики."""
     try:
-        with get_db() as conn:
+        with get_db_write() as conn:
             conn.execute(
                 "INSERT INTO user_stats (user_id, username, first_name, action, detail, created_at) VALUES (?,?,?,?,?,?)",
                 (req.user_id or 0, req.username or "", req.first_name or "",
@@ -2404,7 +2482,7 @@ def add_subscription(req: SubscriptionRequest):
     Добавить или активировать подписку.
     INSERT OR REPLACE гарантирует, что даже если была неактивная — станет активной.
     """
-    with get_db() as conn:
+    with get_db_write() as conn:
         cursor = conn.cursor()
         cursor.execute("""
             INSERT OR REPLACE INTO subscriptions 
@@ -2415,7 +2493,7 @@ def add_subscription(req: SubscriptionRequest):
     
     # Логируем для статистики
     try:
-        with get_db() as conn:
+        with get_db_write() as conn:
             conn.execute(
                 "INSERT INTO user_stats (user_id, action, detail, created_at) VALUES (?, ?, ?, ?)",
                 (req.user_id, "web_subscribe", f"{req.category}_{req.date_type}",
@@ -2433,7 +2511,7 @@ def remove_subscription(req: SubscriptionRequest):
     """
     Деактивировать подписку (мягкое удаление).
     """
-    with get_db() as conn:
+    with get_db_write() as conn:
         cursor = conn.cursor()
         cursor.execute(
             "UPDATE subscriptions SET status='inactive' WHERE user_id = ? AND category = ? AND date_type = ?",
@@ -2443,7 +2521,7 @@ def remove_subscription(req: SubscriptionRequest):
     
     # Логируем для статистики
     try:
-        with get_db() as conn:
+        with get_db_write() as conn:
             conn.execute(
                 "INSERT INTO user_stats (user_id, action, detail, created_at) VALUES (?, ?, ?, ?)",
                 (req.user_id, "web_unsubscribe", f"{req.category}_{req.date_type}",
@@ -2517,7 +2595,7 @@ def add_flash_subscription(req: FlashSubscriptionRequest):
 
     query_clean = req.query.strip()
 
-    with get_db() as conn:
+    with get_db_write() as conn:
         # Проверяем дубликат
         existing = conn.execute(
             "SELECT id FROM flash_subscriptions WHERE user_id = ? AND LOWER(query) = LOWER(?) AND status = 'active'",
@@ -2534,7 +2612,7 @@ def add_flash_subscription(req: FlashSubscriptionRequest):
 
     # Логируем
     try:
-        with get_db() as conn:
+        with get_db_write() as conn:
             conn.execute(
                 "INSERT INTO user_stats (user_id, action, detail, created_at) VALUES (?, ?, ?, ?)",
                 (req.user_id, "web_flash_subscribe", query_clean,
@@ -2550,7 +2628,7 @@ def add_flash_subscription(req: FlashSubscriptionRequest):
 @app.post("/api/flash-subscriptions/remove")
 def remove_flash_subscription(req: FlashSubscriptionRemoveRequest):
     """Деактивировать флеш-подписку по id."""
-    with get_db() as conn:
+    with get_db_write() as conn:
         conn.execute(
             "UPDATE flash_subscriptions SET status = 'inactive' WHERE id = ? AND user_id = ?",
             (req.flash_id, req.user_id)
@@ -2559,7 +2637,7 @@ def remove_flash_subscription(req: FlashSubscriptionRemoveRequest):
 
     # Логируем
     try:
-        with get_db() as conn:
+        with get_db_write() as conn:
             conn.execute(
                 "INSERT INTO user_stats (user_id, action, detail, created_at) VALUES (?, ?, ?, ?)",
                 (req.user_id, "web_flash_unsubscribe", str(req.flash_id),
@@ -2738,40 +2816,8 @@ class BatchUploadRequest(BaseModel):
     tg_first_name: Optional[str] = None
 
 
-@app.post("/api/events/batch")
-async def batch_upload_events(
-    file: UploadFile = File(...),
-    tg_user_id: Optional[int] = Query(None),
-    tg_username: Optional[str] = Query(None),
-    tg_first_name: Optional[str] = Query(None),
-):
-    """
-    Пакетная загрузка событий из xlsx/xls/csv.
-    Файл содержит столбцы: title, details, category, event_date, show_time,
-    place, address, price, description, source_url.
-    Каждое валидное событие попадает в pending_events со статусом pending.
-    Возвращает детальный отчёт.
-    """
-    fname = file.filename or "upload"
-
-    if not (fname.lower().endswith(".xlsx") or fname.lower().endswith(".xls") or fname.lower().endswith(".csv")):
-        raise HTTPException(status_code=400, detail="Поддерживаются только .xlsx, .xls, .csv")
-
-    contents = await file.read()
-    if len(contents) > 5 * 1024 * 1024:
-        raise HTTPException(status_code=400, detail="Файл слишком большой, максимум 5 МБ")
-
-    rows, err = _read_batch_rows(contents, fname)
-    if err:
-        raise HTTPException(status_code=400, detail=err)
-    if not rows:
-        raise HTTPException(status_code=400, detail="Файл пустой или не содержит данных")
-    if len(rows) > 100:
-        raise HTTPException(status_code=400, detail="Максимум 100 событий за раз")
-
-    user_id = tg_user_id or 0
-    username = tg_username or "web_user"
-    first_name = tg_first_name or "Web"
+def _save_batch_rows(rows: list[dict], user_id: int, username: str, first_name: str) -> list[dict]:
+    """Валидация строк batch-файла и запись в pending_events. Блокирующая — зовётся через run_db."""
     now_str = datetime.now(MINSK_TZ).strftime("%Y-%m-%d %H:%M:%S")
 
     seen_in_file: set = set()
@@ -2825,7 +2871,7 @@ async def batch_upload_events(
 
         # Сохраняем в pending_events
         try:
-            with get_db() as conn:
+            with get_db_write() as conn:
                 cursor = conn.cursor()
                 cursor.execute("""
                     INSERT INTO pending_events
@@ -2851,6 +2897,47 @@ async def batch_upload_events(
         except Exception as e:
             results.append({"row": row_num, "title": title[:30], "status": "error", "reason": str(e)})
 
+    return results
+
+
+@app.post("/api/events/batch")
+async def batch_upload_events(
+    file: UploadFile = File(...),
+    tg_user_id: Optional[int] = Query(None),
+    tg_username: Optional[str] = Query(None),
+    tg_first_name: Optional[str] = Query(None),
+):
+    """
+    Пакетная загрузка событий из xlsx/xls/csv.
+    Файл содержит столбцы: title, details, category, event_date, show_time,
+    place, address, price, description, source_url.
+    Каждое валидное событие попадает в pending_events со статусом pending.
+    Возвращает детальный отчёт.
+    """
+    fname = file.filename or "upload"
+
+    if not (fname.lower().endswith(".xlsx") or fname.lower().endswith(".xls") or fname.lower().endswith(".csv")):
+        raise HTTPException(status_code=400, detail="Поддерживаются только .xlsx, .xls, .csv")
+
+    contents = await file.read()
+    if len(contents) > 5 * 1024 * 1024:
+        raise HTTPException(status_code=400, detail="Файл слишком большой, максимум 5 МБ")
+
+    rows, err = _read_batch_rows(contents, fname)
+    if err:
+        raise HTTPException(status_code=400, detail=err)
+    if not rows:
+        raise HTTPException(status_code=400, detail="Файл пустой или не содержит данных")
+    if len(rows) > 100:
+        raise HTTPException(status_code=400, detail="Максимум 100 событий за раз")
+
+    user_id = tg_user_id or 0
+    username = tg_username or "web_user"
+    first_name = tg_first_name or "Web"
+
+    # Проверка дублей и запись в БД — в пуле потоков БД, не в event loop
+    results = await run_db(_save_batch_rows, rows, user_id, username, first_name)
+
     accepted = [r for r in results if r["status"] == "accepted"]
     errors   = [r for r in results if r["status"] == "error"]
 
@@ -2865,8 +2952,8 @@ async def batch_upload_events(
                 f"\U0001f4c1 Файл: {fname}\n\n"
                 f"\U0001f50d /pending — просмотр очереди"
             )
-            with httpx.Client(timeout=5) as client:
-                client.post(
+            async with httpx.AsyncClient(timeout=5) as client:
+                await client.post(
                     f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage",
                     json={"chat_id": ADMIN_ID, "text": msg, "parse_mode": "HTML"}
                 )
@@ -7,13 +7,15 @@ import json
 import re
 import sqlite3
 import logging
-import time
 from datetime import datetime, date
 from typing import List, Dict, Optional
 
-import requests
 from bs4 import BeautifulSoup
-from normalizer import normalize_place, normalize_title, parse_iso_datetime, parse_text_date, format_price_from_offers, is_future_date, normalize_price
+from event_fingerprints import load_dedup_index
+from event_upsert import bulk_connection, upsert_events
+from http_fetch import get_fetcher
+from normalizer import normalize_place, DedupIndex, parse_iso_datetime, parse_text_date, format_price_from_offers, is_future_date, normalize_price
+from source_parser import BaseSourceParser, SourceResult
 
 # ── БД ──────────────────────────────────────────────────────────────────────
 if os.path.exists('/data'):
@@ -60,16 +62,7 @@ CATEGORIES = [
 # ── Вспомогательные функции ──────────────────────────────────────────────────
 
 def fetch_page(url: str, retries: int = 3) -> Optional[str]:
-    for attempt in range(retries):
-        try:
-            r = requests.get(url, headers=HEADERS, timeout=20)
-            r.raise_for_status()
-            return r.text
-        except Exception as e:
-            logger.warning(f"Попытка {attempt+1}/{retries} не удалась: {url} — {e}")
-            if attempt < retries - 1:
-                time.sleep(2 ** attempt)
-    return None
+    return get_fetcher().get(url, headers=HEADERS, retries=retries)
 
 
 
@@ -82,7 +75,9 @@ def fetch_page(url: str, retries: int = 3) -> Optional[str]:
 
 # ── Основной класс ──────────────────────────────────────────────────────────
 
-class BezkassiraParser:
+class BezkassiraParser(BaseSourceParser):
+    key = "bezkassira.by"
+    host = "bezkassira.by"
 
     def __init__(self):
         self.stats = {
@@ -96,47 +91,25 @@ class BezkassiraParser:
 
     # ── Загрузка индекса существующих событий ──
 
-    def load_existing_index(self) -> dict:
-        """Загружает все не-bezkassira события в память для проверки дублей."""
+    def load_existing_index(self, dates=None) -> DedupIndex:
+        """Ключи не-bezkassira событий на даты dates (None — все) из event_fingerprints."""
         conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT title, event_date, place, show_time
-            FROM events
-            WHERE source_name != ?
-        """, (SOURCE_NAME,))
-        rows = cursor.fetchall()
-        conn.close()
-        index = {}
-        for title, ev_date, place, show_time in rows:
-            norm = normalize_title(title)
-            index.setdefault(ev_date, []).append((norm, place or "", show_time or ""))
-        logger.info(f"📋 Индекс: {sum(len(v) for v in index.values())} событий для проверки дублей")
+        try:
+            index = load_dedup_index(conn, SOURCE_NAME, dates)
+        finally:
+            conn.close()
+        logger.info(f"📋 Индекс: {len(index)} событий для проверки дублей")
         return index
 
     def is_duplicate(self, title: str, event_date: str, place: str,
-                     show_time: str, index: dict) -> bool:
-        if not title or not event_date:
-            return False
-        candidates = index.get(event_date, [])
-        if not candidates:
-            return False
-        norm = normalize_title(title)
-        place = place or ""
-        show_time = show_time or ""
-        for norm_ex, ex_place, ex_time in candidates:
-            # Совпадение по месту+времени — точный дубль
-            if place and show_time and ex_place == place and ex_time == show_time:
-                return True
-            # Совпадение по нормализованному названию
-            if norm and norm == norm_ex:
-                return True
-        return False
+                     show_time: str, index: DedupIndex) -> bool:
+        # Дубль: то же место+время или то же нормализованное название в эту дату
+        return index.find(title, event_date, place, show_time) is not None
 
     # ── Парсинг одной карточки ──
 
     def parse_card(self, thumb: BeautifulSoup, category: str,
-                   index: dict) -> Optional[Dict]:
+                   index: Optional[DedupIndex]) -> Optional[Dict]:
         try:
             # 1. Только Минск — проверяем data-city_id И текст города из hint
             city_id = thumb.get("data-city_id", "")
@@ -227,8 +200,8 @@ class BezkassiraParser:
             # Нормализуем цену (пустая останется пустой, "Бесплатно" останется "Бесплатно")
             price = normalize_price(price)
 
-            # 9. Проверка дублей
-            if self.is_duplicate(title, event_date, place, show_time, index):
+            # 9. Проверка дублей (index=None — проверка откладывается до сохранения)
+            if index is not None and self.is_duplicate(title, event_date, place, show_time, index):
                 self.stats["duplicates"] += 1
                 logger.debug(f"  ↩ дубль: {title} / {event_date}")
                 return None
@@ -255,9 +228,12 @@ class BezkassiraParser:
     # ── Парсинг одной страницы категории ──
 
     def parse_category(self, url: str, category: str, label: str,
-                       index: dict) -> List[Dict]:
+                       index: Optional[DedupIndex] = None) -> List[Dict]:
         logger.info(f"📥 Загружаю {label}: {url}")
-        html = fetch_page(url)
+        return self.parse_category_html(fetch_page(url), url, category, label, index)
+
+    def parse_category_html(self, html: Optional[str], url: str, category: str, label: str,
+                            index: Optional[DedupIndex] = None) -> List[Dict]:
         if not html:
             logger.error(f"Не удалось загрузить {url}")
             return []
@@ -281,11 +257,9 @@ class BezkassiraParser:
         return events
 
     # ── Сохранение в БД ──
-    def save_events(self, events: List[Dict]) -> int:
-        if not events:
-            return 0
-
-        # Дедупликация внутри текущего запуска
+    @staticmethod
+    def _unique_events(events: List[Dict]) -> List[Dict]:
+        """Дедупликация внутри текущего запуска по (title, date, time, place)."""
         seen = set()
         unique_events = []
         for ev in events:
@@ -297,36 +271,16 @@ class BezkassiraParser:
 
         if len(unique_events) != len(events):
             logger.info(f"🔂 Убрано дублей внутри запуска: {len(events) - len(unique_events)}")
+        return unique_events
 
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-
-        # удаляем все свои старые записи
-        cursor.execute("DELETE FROM events WHERE source_name = ?", (SOURCE_NAME,))
-        deleted = cursor.rowcount
-        if deleted:
-            logger.info(f"🗑️ Удалено {deleted} старых записей {SOURCE_NAME}")
-
-        saved = 0
-        for ev in unique_events:
-            try:
-                cursor.execute("""
-                    INSERT INTO events
-                      (title, details, description, event_date, show_time,
-                       place, location, price, category, source_name, source_url)
-                    VALUES (?,?,?,?,?,?,?,?,?,?,?)
-                """, (
-                    ev["title"], ev["details"], ev["description"],
-                    ev["event_date"], ev["show_time"],
-                    ev["place"], ev["location"], ev["price"],
-                    ev["category"], ev["source_name"], ev["source_url"],
-                ))
-                saved += 1
-            except Exception as e:
-                logger.error(f"Ошибка сохранения: {ev.get('title')} — {e}")
-        conn.commit()
-        conn.close()
-        return saved
+    def save_events(self, events: List[Dict]) -> int:
+        """Приводит все записи bezkassira в БД к списку events (upsert по разнице)."""
+        if not events:
+            return 0
+        with bulk_connection(DB_PATH) as conn:
+            stats = upsert_events(conn, self._unique_events(events), "source_name = ?", (SOURCE_NAME,))
+        logger.info(f"💾 Изменения в БД: {stats}")
+        return stats.saved
 
     # ── Очистка устаревших событий ──
 
@@ -369,47 +323,57 @@ class BezkassiraParser:
 
     # ── Главный запуск ──
 
-    def run(self):
+    def fetch(self) -> SourceResult:
         logger.info("=" * 50)
         logger.info("🚀 BezKassira парсер запущен")
         logger.info("=" * 50)
 
-        # 1. Очищаем старые записи ОДИН РАЗ
+        # 1. Загружаем все категории параллельно (сеть), дубли проверяем в save()
+        result = SourceResult()
+        pages = get_fetcher().get_many([cat["url"] for cat in CATEGORIES], headers=HEADERS)
+        for cat, html in zip(CATEGORIES, pages):
+            events = self.parse_category_html(html, cat["url"], cat["category"], cat["label"])
+            result.batches.append((cat["label"], events))
+        return result
+
+    def save(self, result: SourceResult) -> SourceResult:
+        # 2. Очищаем старые записи ОДИН РАЗ
         self.clean_old_events()
     
-        # 2. Удаляем ВСЕ старые bezkassira записи ДО парсинга
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM events WHERE source_name = ?", (SOURCE_NAME,))
-        deleted = cursor.rowcount
-        conn.commit()
-        conn.close()
-        if deleted:
-            logger.info(f"🗑️ Удалено {deleted} старых записей {SOURCE_NAME}")
-    
         # 3. Загружаем индекс для проверки дублей с другими источниками
-        index = self.load_existing_index()
-
-        for cat in CATEGORIES:
-            events = self.parse_category(
-                cat["url"], cat["category"], cat["label"], index
-            )
-        
-            # Сохраняем события ЭТОЙ категории (не удаляя другие)
-            cat_saved = self._save_category_events(events)
-
-            self.stats["by_category"][cat["label"]]["saved"] = cat_saved
-            self.stats["saved"] += cat_saved
+        index = self.load_existing_index(ev["event_date"] for ev in result.events)
+
+        to_save = []
+        by_label = []
+        for label, fetched_events in result.batches:
+            events = []
+            for ev in fetched_events:
+                if self.is_duplicate(ev["title"], ev["event_date"], ev["place"], ev["show_time"], index):
+                    self.stats["duplicates"] += 1
+                    logger.debug(f"  ↩ дубль: {ev['title']} / {ev['event_date']}")
+                    continue
+                events.append(ev)
+            events = self._unique_events(events)
+            to_save.extend(events)
+            by_label.append((label, events))
         
             # Обновляем индекс для дедупликации между категориями
             for ev in events:
-                norm = normalize_title(ev['title'])
-                index.setdefault(ev['event_date'], []).append(
-                    (norm, ev.get('place', ''), ev.get('show_time', ''))
-                )
-
-            time.sleep(1)
+                index.add(ev['title'], ev['event_date'], ev.get('place', ''), ev.get('show_time', ''))
 
+        # 4. Все категории — одним upsert: вставляем новые, обновляем изменившиеся,
+        #    удаляем исчезнувшие записи bezkassira
+        #    Ошибка БД пробрасывается — источник помечается неуспешным (run_sources)
+        try:
+            with bulk_connection(DB_PATH) as conn:
+                changes = upsert_events(conn, to_save, "source_name = ?", (SOURCE_NAME,))
+        except Exception as e:
+            logger.error(f"Ошибка сохранения: {e}")
+            raise
+        self.stats["saved"] = changes.saved
+        for label, events in by_label:
+            self.stats["by_category"].setdefault(label, {"found": 0, "saved": 0})["saved"] = \
+                len(changes.written(events))
 
         saved = self.stats["saved"]
 
@@ -418,59 +382,14 @@ class BezkassiraParser:
         logger.info(f"\n📊 Итог:")
         logger.info(f"  Карточек всего: {total_found}")
         logger.info(f"  Не Минск: {self.stats['non_minsk']}")
-        logger.info(f"  Дубликаты: {self.stats['duplicates']}")
-        logger.info(f"  Сохранено: {saved}")
+        logger.info(f"  Дубликаты: {self.stats['duplicates']} {dict(index.reasons)}")
+        logger.info(f"  Сохранено: {saved} ({changes})")
 
-        # RESULT строки для run_all_parsers.py
+        # Счётчики для отчёта run_all_parsers.py
         for label, s in self.stats["by_category"].items():
-            print(f"RESULT:{label}:{s['found']}:{s.get('saved', 0)}")
-
-        return saved
-
-    def _save_category_events(self, events: List[Dict]) -> int:
-        """Сохраняет события категории без удаления других записей."""
-        if not events:
-            return 0
-
-        # Дедупликация внутри текущего запуска
-        seen = set()
-        unique_events = []
-        for ev in events:
-            key = (ev['title'], ev['event_date'], ev.get('show_time', ''), ev.get('place', ''))
-            if key in seen:
-                continue
-            seen.add(key)
-            unique_events.append(ev)
-
-        if len(unique_events) != len(events):
-            logger.info(f"🔂 Убрано дублей внутри запуска: {len(events) - len(unique_events)}")
-
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-
-        saved = 0
-        for ev in unique_events:
-            try:
-                cursor.execute("""
-                    INSERT INTO events
-                      (title, details, description, event_date, show_time,
-                       place, location, price, category, source_name, source_url)
-                    VALUES (?,?,?,?,?,?,?,?,?,?,?)
-                """, (
-                    ev["title"], ev["details"], ev["description"],
-                    ev["event_date"], ev["show_time"],
-                    ev["place"], ev["location"], ev["price"],
-                    ev["category"], ev["source_name"], ev["source_url"],
-                ))
-                saved += 1
-            except Exception as e:
-                logger.error(f"Ошибка сохранения: {ev.get('title')} — {e}")
-    
-        conn.commit()
-        conn.close()
-        return saved
-
+            result.count(label, found=s["found"], saved=s.get("saved", 0))
 
+        return result
 
 
 if __name__ == "__main__":
@@ -7,7 +7,6 @@ import os
 import re
 import sys
 import json
-import sqlite3
 import csv
 import io
 import tempfile
@@ -43,8 +42,16 @@ from config import (
     MINSK_TZ, DB_PATH, ADMIN_ID,
     VENUE_OPEN_TIME, VENUE_CLOSE_TIME,
     BATCH_TEMPLATE_HEADERS, BATCH_TEMPLATE_EXAMPLE, BATCH_CATEGORY_MAP,
-    _build_time_filter, _build_overnight_union,
+    _build_time_filter, _build_overnight_union, _build_date_events_sql,
 )
+from db_pool import read_connection, write_connection, run_db
+from db_schema import ensure_events_schema
+from pagination_store import ResultSnapshot, get_pagination_store
+from listing_cache import Listing, get_listing_cache
+from digest_snapshot import ChannelPost, DigestMessage, DigestSnapshot, get_digest_store
+from search_index import search_clause
+from broadcast import OutboxMessage, enqueue, ensure_outbox, get_broadcaster, new_campaign, outbox_summary
+from flash_matcher import FlashBatch, FlashMatch, QueryIndex, ack_changes, group_batches, match_changes, read_changes
 
 import asyncio
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
@@ -118,13 +125,22 @@ CATEGORY_NAMES = {
 
 @contextmanager
 def get_db_connection():
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
-    conn.create_function("pylow", 1, lambda s: s.lower() if s else "")
-    try:
+    # Соединение потока из общего пула (db_pool): pylow и прагмы уже настроены
+    with read_connection(DB_NAME) as conn:
+        yield conn
+
+
+@contextmanager
+def get_db_write_connection():
+    # Единственный писатель процесса — блоки с INSERT/UPDATE/DELETE идут через него
+    with write_connection(DB_NAME) as conn:
         yield conn
-    finally:
-        conn.close()
+
+
+def fetch_rows(sql: str, params=()) -> list:
+    """Выполняет SELECT и возвращает все строки (для run_db из async-хэндлеров)."""
+    with get_db_connection() as conn:
+        return conn.execute(sql, params).fetchall()
 
 
 def init_db():
@@ -133,7 +149,9 @@ def init_db():
     if db_dir and not os.path.exists(db_dir):
         os.makedirs(db_dir, exist_ok=True)
 
-    with get_db_connection() as conn:
+    with get_db_write_connection() as conn:
+        ensure_events_schema(conn)
+        ensure_outbox(conn)
         cursor = conn.cursor()
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS pending_events (
@@ -249,10 +267,9 @@ def init_db():
             "ALTER TABLE pending_events ADD COLUMN end_time TEXT DEFAULT ''",
             "ALTER TABLE pending_events ADD COLUMN is_promo INTEGER DEFAULT 0",
             "ALTER TABLE pending_events ADD COLUMN is_kids INTEGER DEFAULT 0",
-            "ALTER TABLE events ADD COLUMN end_time TEXT DEFAULT ''",
-            "ALTER TABLE events ADD COLUMN is_kids INTEGER DEFAULT 0",
             "ALTER TABLE subscriptions ADD COLUMN status TEXT DEFAULT 'active'",
             "ALTER TABLE flash_subscriptions ADD COLUMN last_notified_at TEXT DEFAULT ''",
+            "ALTER TABLE flash_subscriptions ADD COLUMN checked_at TEXT DEFAULT ''",
             "ALTER TABLE users ADD COLUMN telegram_username TEXT DEFAULT ''",
             "ALTER TABLE event_attendees ADD COLUMN event_key TEXT DEFAULT ''",
             "ALTER TABLE event_ticket_posts ADD COLUMN event_id INTEGER NOT NULL DEFAULT 0",
@@ -360,7 +377,7 @@ def init_db():
 def save_user_profile(user_id: int, username: str | None, first_name: str | None):
     try:
         now = datetime.now(MINSK_TZ).strftime("%Y-%m-%d %H:%M:%S")
-        with get_db_connection() as conn:
+        with get_db_write_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
                 """
@@ -381,7 +398,7 @@ def save_user_profile(user_id: int, username: str | None, first_name: str | None
 
 def log_user_action(user_id: int, username: str | None, first_name: str | None, action: str, detail: str | None = None):
     try:
-        with get_db_connection() as conn:
+        with get_db_write_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
                 "INSERT INTO user_stats (user_id, username, first_name, action, detail, created_at) VALUES (?, ?, ?, ?, ?, ?)",
@@ -533,6 +550,9 @@ def get_stats_data(exclude_admin: bool = True) -> dict:
             WHERE user_id != ? AND last_notified_at != '' AND last_notified_at >= DATE('now', '-30 days')""", (admin_filter,))
         flash_notified_users_30d = cursor.fetchone()[0]
 
+        # ── Рассылки (broadcast_outbox) ──────────────────────────────
+        broadcast_24h = outbox_summary(conn)
+
         return {
             "total_users": total_users,
             "days_alive": days_alive,
@@ -561,6 +581,7 @@ def get_stats_data(exclude_admin: bool = True) -> dict:
             "flash_new_today": flash_new_today,
             "flash_new_30d": flash_new_30d,
             "flash_notified_users_30d": flash_notified_users_30d,
+            "broadcast_24h": broadcast_24h,
         }
 
 
@@ -608,18 +629,21 @@ def get_events_count_by_category() -> dict:
 
 def search_events_by_title(query: str, limit: int = 20):
     today = datetime.now(MINSK_TZ).strftime("%Y-%m-%d")
-    q = query.lower()
+    text_clause = search_clause(query, ("title", "details", "place"))
+    if not text_clause:
+        return []
+    text_sql, text_params = text_clause
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute("""
+        cursor.execute(f"""
             SELECT id, title, details, description, event_date, show_time, end_time,
                    place, location, price, category, source_url
             FROM events
-            WHERE (pylow(title) LIKE ? OR pylow(details) LIKE ? OR pylow(place) LIKE ?)
+            WHERE {text_sql}
               AND event_date >= ?
             ORDER BY event_date, CASE WHEN show_time = '' OR show_time IS NULL THEN 1 ELSE 0 END, show_time, title
             LIMIT ?
-        """, (f"%{q}%", f"%{q}%", f"%{q}%", today, limit * SEARCH_MULTIPLIER))
+        """, (*text_params, today, limit * SEARCH_MULTIPLIER))
         return cursor.fetchall()
 
 
@@ -658,31 +682,9 @@ def get_events_by_date_and_category(target_date: datetime, category: str | None
     
     with get_db_connection() as conn:
         cursor = conn.cursor()
-
-        SELECT = """SELECT id, title, details, description, event_date, show_time, end_time,
-                           place, location, price, category, source_url, source_name, is_kids
-                    FROM events"""
         overnight_now = now_time if date_str == today_str else None
 
-        # Build WHERE clause
-        where_parts = ["event_date = ?"]
-        params = [date_str]
-
-        if category == "free":
-            where_parts.append("price = 'Бесплатно'")
-        elif category == "kids":
-            where_parts.append("is_kids = 1")
-        elif category and category != "all":
-            where_parts.append("category = ?")
-            params.append(category)
-
-        if date_str == today_str:
-            tf, tp = _build_time_filter(date_str, today_str, now_time)
-            if tf:
-                where_parts.append(tf)
-                params.extend(tp)
-
-        query = f"{SELECT} WHERE {' AND '.join(where_parts)} ORDER BY {TIME_ORDER_SQL}, title"
+        query, params = _build_date_events_sql(date_str, today_str, now_time, category)
         cursor.execute(query, params)
         events = cursor.fetchall()
 
@@ -856,7 +858,7 @@ def _time_sort_value(show_time: str | None) -> str:
 
 
 def add_subscription(user_id: int, category: str, date_type: str):
-    with get_db_connection() as conn:
+    with get_db_write_connection() as conn:
         cursor = conn.cursor()
         cursor.execute(
             "INSERT OR IGNORE INTO subscriptions (user_id, category, date_type, status) VALUES (?, ?, ?, 'active')",
@@ -866,7 +868,7 @@ def add_subscription(user_id: int, category: str, date_type: str):
 
 
 def remove_subscription(user_id: int, category: str, date_type: str):
-    with get_db_connection() as conn:
+    with get_db_write_connection() as conn:
         cursor = conn.cursor()
         # Ставим status='inactive' вместо DELETE — история сохраняется
         cursor.execute(
@@ -901,7 +903,7 @@ def get_all_subscribers() -> dict:
 
 def add_flash_subscription(user_id: int, query: str) -> bool:
     """Добавляет флеш-подписку. Возвращает False если такая уже есть."""
-    with get_db_connection() as conn:
+    with get_db_write_connection() as conn:
         # Проверяем дубликат
         existing = conn.execute(
             "SELECT id FROM flash_subscriptions WHERE user_id=? AND LOWER(query)=LOWER(?) AND status='active'",
@@ -920,7 +922,7 @@ def add_flash_subscription(user_id: int, query: str) -> bool:
 def create_flash_subscription_request(user_id: int, query: str) -> str:
     """Stores full query behind a short callback token."""
     token = uuid.uuid4().hex[:16]
-    with get_db_connection() as conn:
+    with get_db_write_connection() as conn:
         conn.execute(
             "DELETE FROM flash_subscription_requests WHERE created_at < DATETIME('now', '-7 days')"
         )
@@ -946,7 +948,7 @@ def get_flash_subscription_request(token: str, user_id: int) -> str | None:
 
 
 def remove_flash_subscription(flash_id: int, user_id: int):
-    with get_db_connection() as conn:
+    with get_db_write_connection() as conn:
         conn.execute(
             "UPDATE flash_subscriptions SET status='inactive' WHERE id=? AND user_id=?",
             (flash_id, user_id)
@@ -967,7 +969,7 @@ def ignore_flash_matches(flash_id: int, user_id: int, event_ids: list[int]) -> i
     if not clean_ids:
         return 0
 
-    with get_db_connection() as conn:
+    with get_db_write_connection() as conn:
         owner = conn.execute(
             "SELECT id FROM flash_subscriptions WHERE id=? AND user_id=? AND status='active'",
             (flash_id, user_id),
@@ -1011,117 +1013,162 @@ def get_all_flash_subscriptions() -> list:
     """Все активные флеш-подписки для проверки после парсинга."""
     with get_db_connection() as conn:
         return conn.execute(
-            "SELECT id, user_id, query FROM flash_subscriptions WHERE status='active'"
+            "SELECT id, user_id, query, last_notified_at, checked_at FROM flash_subscriptions WHERE status='active'"
         ).fetchall()
 
 
-async def check_flash_subscriptions(bot) -> int:
-    """Проверяет новые события против всех флеш-подписок и рассылает совпадения.
-    Каждая подписка — отдельное сообщение пользователю.
-    Повторно не уведомляет: сравнивает created_at события с last_notified_at подписки.
-    Вызывается после каждого парсинга."""
-    subs = get_all_flash_subscriptions()
-    if not subs:
-        return 0
+FLASH_EVENTS_PER_MESSAGE = 5
 
-    today = datetime.now(MINSK_TZ).strftime("%Y-%m-%d")
-    sent_total = 0
-    import html as _html
-    from telegram.error import RetryAfter
 
+def _flash_sort_key(event) -> tuple:
+    # Как ORDER BY event_date, TIME_ORDER_SQL: события без времени — в конце дня
+    show_time = event["show_time"] or ""
+    return event["event_date"] or "", 0 if show_time else 1, show_time
+
+
+def _flash_full_search(conn, sub, today: str) -> list:
+    """Полный поиск для подписки, которую матчер ещё не видел (checked_at пуст).
+
+    Уже уведомлённая подписка (last_notified_at) получает только события,
+    добавленные после уведомления.
+    """
+    text_clause = search_clause(sub["query"], ("title", "details"), id_column="events.id")
+    if not text_clause:
+        return []
+    text_sql, text_params = text_clause
+    last_notified = sub["last_notified_at"] or ""
+    return conn.execute(f"""
+        SELECT DISTINCT id, title, details, event_date, show_time, place, price, category, source_url
+        FROM events
+        WHERE event_date >= ?
+        AND {text_sql}
+        {"AND (created_at IS NULL OR created_at > ?)" if last_notified else ""}
+        ORDER BY event_date, {TIME_ORDER_SQL}
+    """, (today, *text_params, *((last_notified,) if last_notified else ()))).fetchall()
+
+
+def collect_flash_batches(today: str) -> tuple[list[FlashBatch], list[tuple[int, int]], list[int]]:
+    """Совпадения флеш-подписок по пользователям.
+
+    Изменённые с прошлой проверки события (flash_event_queue) проходят один раз
+    по индексу всех запросов; новые подписки — один раз полным поиском.
+    Возвращает (пачки, ack для очереди, id подписок, впервые проверенных).
+    """
     with get_db_connection() as conn:
-        for sub in subs:
-            user_id = sub["user_id"]
-            q = sub["query"]
-            ql = q.lower()
-            sp = f"%{q}%"
-            spl = f"%{ql}%"
-
-            # Берём last_notified_at для этой подписки (может отсутствовать в старых записях)
-            sub_row = conn.execute(
-                "SELECT last_notified_at FROM flash_subscriptions WHERE id = ?",
-                (sub["id"],)
-            ).fetchone()
-            last_notified = (sub_row["last_notified_at"] or "") if sub_row else ""
-
-            # Показываем только события добавленные ПОСЛЕ последнего уведомления
-            # Для новых подписок (last_notified пуст) — показываем все актуальные события
-            date_condition = "AND event_date >= ?" if not last_notified else "AND event_date >= ? AND (created_at IS NULL OR created_at > ?)"
-            date_params = (today,) if not last_notified else (today, last_notified)
-
-            rows = conn.execute(f"""
-                SELECT DISTINCT id, title, details, event_date, show_time, place, price, category, source_url
-                FROM events
-                WHERE event_date >= ?
-                AND (pylow(title) LIKE ? OR pylow(details) LIKE ?)
-                AND NOT EXISTS (
-                    SELECT 1
-                    FROM flash_ignored_matches fim
-                    WHERE fim.subscription_id = ?
-                      AND fim.event_key = (
-                          pylow(TRIM(COALESCE(events.title, ''))) || '|' ||
-                          COALESCE(events.event_date, '') || '|' ||
-                          pylow(TRIM(COALESCE(events.place, '')))
-                      )
-                )
-                {"AND (created_at IS NULL OR created_at > ?)" if last_notified else ""}
-                ORDER BY event_date, {TIME_ORDER_SQL}
-                LIMIT 5
-            """, (today, spl, spl, sub["id"], *((last_notified,) if last_notified else ()))).fetchall()
+        subs = get_all_flash_subscriptions()
+        changes, acks = read_changes(conn, today)
+        index = QueryIndex(subs)
+        matched = match_changes(index, changes) if len(index) else {}
 
-            if not rows:
+        checked_ids = []
+        for sub in subs:
+            if sub["checked_at"]:
                 continue
+            checked_ids.append(sub["id"])
+            found = _flash_full_search(conn, sub, today)
+            if found:
+                seen = {e["id"] for e in matched.get(sub["id"], [])}
+                matched.setdefault(sub["id"], []).extend(e for e in found if e["id"] not in seen)
+        if not matched:
+            return [], acks, checked_ids
+
+        # «Искать дальше» — события, которые пользователь уже отклонил
+        ignored = defaultdict(set)
+        sub_ids = list(matched)
+        for i in range(0, len(sub_ids), 500):
+            chunk = sub_ids[i:i + 500]
+            placeholders = ",".join("?" for _ in chunk)
+            for row in conn.execute(
+                f"SELECT subscription_id, event_key FROM flash_ignored_matches WHERE subscription_id IN ({placeholders})",
+                chunk,
+            ):
+                ignored[row["subscription_id"]].add(row["event_key"])
+
+    for sub_id, events in list(matched.items()):
+        events = [e for e in events if _flash_event_key(e) not in ignored[sub_id]]
+        matched[sub_id] = sorted(events, key=_flash_sort_key)[:FLASH_EVENTS_PER_MESSAGE]
+    return group_batches(subs, matched), acks, checked_ids
+
+
+def queue_flash_messages(campaign: str, messages: list[OutboxMessage],
+                         acks: list[tuple[int, int]], checked_ids: list[int]) -> int:
+    """Уведомления — в outbox, изменения — из очереди, новые подписки — проверены: одной транзакцией."""
+    now = datetime.now(MINSK_TZ).strftime("%Y-%m-%d %H:%M:%S")
+    with get_db_write_connection() as conn:
+        added = enqueue(conn, campaign, messages)
+        ack_changes(conn, acks)
+        conn.executemany(
+            "UPDATE flash_subscriptions SET checked_at = ? WHERE id = ?",
+            [(now, sub_id) for sub_id in checked_ids],
+        )
+        return added
 
-            lines = [f"⚡ <b>Флеш-подписка: «{_html.escape(q)}»</b>\n"]
-            for e in rows:
-                cat_emoji = CATEGORY_EMOJI.get(e["category"] or "", "🎉")
-                title = _html.escape(e["title"] or "")
-                try:
-                    date_str = datetime.strptime(e["event_date"], "%Y-%m-%d").strftime("%d.%m.%Y")
-                except Exception:
-                    date_str = e["event_date"] or ""
-                time_str = f" ⏰ {e['show_time']}" if e["show_time"] else ""
-                place_str = f"\n🏢 {_html.escape(e['place'])}" if e["place"] else ""
-                price_str = f" | 💰 {e['price']}" if e["price"] else ""
-                url = e["source_url"] or ""
-                title_link = f"<a href=\"{url}\">{title}</a>" if url else title
-                lines.append(f"{cat_emoji} {title_link}\n📅 {date_str}{time_str}{place_str}{price_str}\n")
-
-            lines.append("👉 @Minskdvizh_bot")
-            text = "\n".join(lines)
-
-            sub_id = sub["id"]
-            event_id_parts = [str(e["id"]) for e in rows]
-            while event_id_parts and len(f"fc:{sub_id}:{'-'.join(event_id_parts)}") > 64:
-                event_id_parts.pop()
-            event_ids = "-".join(event_id_parts)
-            confirm_keyboard = InlineKeyboardMarkup([[
-                InlineKeyboardButton("✅ Да, нашёл!", callback_data=f"ff:{sub_id}"),
-                InlineKeyboardButton("🔄 Нет, искать дальше", callback_data=f"fc:{sub_id}:{event_ids}"),
-            ]])
 
-            try:
-                await bot.send_message(
-                    chat_id=user_id, text=text,
-                    parse_mode="HTML", disable_web_page_preview=True,
-                    reply_markup=confirm_keyboard,
-                )
-                sent_total += 1
-                # Обновляем время последнего уведомления
-                conn.execute(
-                    "UPDATE flash_subscriptions SET last_notified_at = ? WHERE id = ?",
-                    (datetime.now(MINSK_TZ).strftime("%Y-%m-%d %H:%M:%S"), sub["id"])
-                )
-                conn.commit()
-                await asyncio.sleep(0.1)
-            except RetryAfter as e:
-                logger.warning(f"Флеш-рассылка RetryAfter {e.retry_after}с для {user_id}")
-                await asyncio.sleep(e.retry_after + 1)
-            except Exception as e:
-                logger.warning(f"Флеш-рассылка {user_id} «{q}»: {e}")
+def mark_flash_notified(sub_ids: list[int]):
+    now = datetime.now(MINSK_TZ).strftime("%Y-%m-%d %H:%M:%S")
+    with get_db_write_connection() as conn:
+        conn.executemany(
+            "UPDATE flash_subscriptions SET last_notified_at = ? WHERE id = ?",
+            [(now, sub_id) for sub_id in sub_ids],
+        )
+
+
+def _flash_message(match: FlashMatch) -> tuple[str, InlineKeyboardMarkup]:
+    import html as _html
+    lines = [f"⚡ <b>Флеш-подписка: «{_html.escape(match.query)}»</b>\n"]
+    for e in match.events:
+        cat_emoji = CATEGORY_EMOJI.get(e["category"] or "", "🎉")
+        title = _html.escape(e["title"] or "")
+        try:
+            date_str = datetime.strptime(e["event_date"], "%Y-%m-%d").strftime("%d.%m.%Y")
+        except Exception:
+            date_str = e["event_date"] or ""
+        time_str = f" ⏰ {e['show_time']}" if e["show_time"] else ""
+        place_str = f"\n🏢 {_html.escape(e['place'])}" if e["place"] else ""
+        price_str = f" | 💰 {e['price']}" if e["price"] else ""
+        url = e["source_url"] or ""
+        title_link = f"<a href=\"{url}\">{title}</a>" if url else title
+        lines.append(f"{cat_emoji} {title_link}\n📅 {date_str}{time_str}{place_str}{price_str}\n")
+
+    lines.append("👉 @Minskdvizh_bot")
+    text = "\n".join(lines)
+
+    sub_id = match.subscription_id
+    event_id_parts = [str(e["id"]) for e in match.events]
+    while event_id_parts and len(f"fc:{sub_id}:{'-'.join(event_id_parts)}") > 64:
+        event_id_parts.pop()
+    event_ids = "-".join(event_id_parts)
+    confirm_keyboard = InlineKeyboardMarkup([[
+        InlineKeyboardButton("✅ Да, нашёл!", callback_data=f"ff:{sub_id}"),
+        InlineKeyboardButton("🔄 Нет, искать дальше", callback_data=f"fc:{sub_id}:{event_ids}"),
+    ]])
+    return text, confirm_keyboard
+
+
+async def check_flash_subscriptions(bot) -> int:
+    """Проверяет изменения в событиях против всех флеш-подписок и рассылает совпадения.
+    Каждая подписка — отдельное сообщение пользователю (flash_matcher.FlashBatch —
+    сообщения одного пользователя), доставка — через broadcast.
+    Повторно не уведомляет: событие проверяется, только когда оно новое или
+    изменилось (flash_event_queue). Вызывается после каждого парсинга."""
+    today = datetime.now(MINSK_TZ).strftime("%Y-%m-%d")
+    batches, acks, checked_ids = await run_db(collect_flash_batches, today)
+
+    messages = []
+    for batch in batches:
+        for match in batch.matches:
+            text, confirm_keyboard = _flash_message(match)
+            messages.append(OutboxMessage(chat_id=batch.user_id, text=text,
+                                          key=str(match.subscription_id), reply_markup=confirm_keyboard))
+    campaign = new_campaign("flash")
+    await run_db(queue_flash_messages, campaign, messages, acks, checked_ids)
+    if not messages:
+        return 0
 
-    logger.info(f"⚡ Флеш-подписки: разослано {sent_total} уведомлений")
-    return sent_total
+    stats = await get_broadcaster().deliver(bot, campaign)
+    await run_db(mark_flash_notified, [int(key) for key in stats.sent_keys])
+    logger.info(f"⚡ Флеш-подписки: разослано {stats.sent} уведомлений")
+    return stats.sent
 
 
 # ---------------------- Форматирование ----------------------
@@ -1358,30 +1405,22 @@ def pre_group_for_pagination(events: list) -> list:
     return result
 
 
-def set_pagination(context: ContextTypes.DEFAULT_TYPE, events, title: str, date_info: str | None = None,
-                   share_query: str = ""):
-    raw = [dict(e) if not isinstance(e, dict) else e for e in events]
-    context.user_data["pagination"] = {
-        "events": raw, "page": 0, "per_page": PER_PAGE,
-        "title": title, "date_info": date_info,
-        "share_query": share_query,
-    }
+def _pagination_item_text(item: dict) -> str:
+    """Текст одной записи страницы (сгруппированной или сырого события) со ссылкой."""
+    if item.get("_pre_formatted"):
+        film_url = item.get("url") or "https://afisha.relax.by/kino/minsk/"
+        return item["text"] + f"\n🔗 <a href=\"{film_url}\">Подробнее</a>"
+    url = item.get("source_url", "") or ""
+    suffix = f"\n🔗 <a href=\"{url}\">Подробнее</a>" if url else ""
+    return format_event_text(item) + suffix
 
 
-def build_page_keyboard(data: dict):
-    """Клавиатура: фильтры категорий + навигация ◀ 1/5 ▶."""
-    events = data.get("_grouped", data["events"])
-    page = data["page"]
-    per_page = data["per_page"]
-    total = len(events)
-    max_page = max(0, (total - 1) // per_page)
-    keyboard = []
-    
-    # Считаем уникальные события (как после группировки) — title+place
+def _pagination_category_counts(grouped: list, raw_events: list) -> dict[str, int]:
+    """Счётчики для кнопок фильтра: уникальные события (как после группировки) — title+place."""
     category_counts = defaultdict(int)
     _seen_cats: dict = defaultdict(set)
-    
-    for e in events:
+
+    for e in grouped:
         cat = e.get("category") if e.get("category") else ("cinema" if e.get("_pre_formatted") else None)
         if not cat:
             continue
@@ -1392,13 +1431,12 @@ def build_page_keyboard(data: dict):
             if key not in _seen_cats[cat]:
                 _seen_cats[cat].add(key)
                 category_counts[cat] += 1
-    
+
     # Считаем бесплатные события из raw_events по price='Бесплатно' —
     # сюда попадают события ЛЮБОЙ категории с этой ценой, не только category='free'.
     # Всегда перезаписываем category_counts["free"], чтобы не занижать счётчик
     # в случае когда среди событий есть и category='free' (1 шт.) и price='Бесплатно'
     # у событий других категорий (ещё N шт.).
-    raw_events = data.get("events", [])
     free_count = len({
         (e.get("title", ""), e.get("event_date", ""), e.get("place") or "")
         for e in raw_events
@@ -1406,7 +1444,74 @@ def build_page_keyboard(data: dict):
     })
     if free_count > 0:
         category_counts["free"] = free_count  # перезаписываем всегда
-    
+    return dict(category_counts)
+
+
+def _render_pagination(raw_events: list[dict]) -> tuple[list[str], dict[str, int]]:
+    """Снимок для pagination_store: группировка и тексты записей — один раз на результат."""
+    grouped = pre_group_for_pagination(raw_events)
+    return [_pagination_item_text(item) for item in grouped], _pagination_category_counts(grouped, raw_events)
+
+
+def set_pagination(context: ContextTypes.DEFAULT_TYPE, events, title: str, date_info: str | None = None,
+                   share_query: str = ""):
+    # Строки и готовые страницы — в общем снимке; в user_data только ключ и номер страницы
+    snapshot = get_pagination_store().put(events, _render_pagination)
+    set_pagination_snapshot(context, snapshot, title, date_info, share_query)
+
+
+def set_pagination_snapshot(context: ContextTypes.DEFAULT_TYPE, snapshot: ResultSnapshot, title: str,
+                            date_info: str | None = None, share_query: str = ""):
+    # Снимок из listing_cache мог быть вытеснен из pagination_store — возвращаем его туда
+    get_pagination_store().add(snapshot)
+    context.user_data["pagination"] = {
+        "snapshot": snapshot.key, "page": 0, "per_page": PER_PAGE,
+        "title": title, "date_info": date_info,
+        "share_query": share_query,
+    }
+
+
+async def load_listing(date_type: str, category: str | None = None) -> tuple[ResultSnapshot, dict]:
+    """Экран today / tomorrow / weekend / upcoming (× категория) из общего кэша.
+
+    Промах — один запрос в БД и один рендер; готовый снимок получают все
+    пользователи до конца корзины времени или до invalidate().
+    """
+    cache = get_listing_cache()
+    now = datetime.now(MINSK_TZ)
+    generation = cache.generation
+    cached = cache.get(date_type, category, now)
+    if cached is not None:
+        return cached.snapshot, cached.meta
+
+    meta = {}
+    if date_type == "today":
+        events = await run_db(get_events_by_date_and_category, now, category)
+    elif date_type == "tomorrow":
+        events = await run_db(get_events_by_date_and_category, now + timedelta(days=1), category)
+    elif date_type == "weekend":
+        events, saturday, sunday = await run_db(get_weekend_events, category=category)
+        meta = {"saturday": saturday, "sunday": sunday}
+    elif date_type == "upcoming":
+        events = await run_db(get_upcoming_events, limit=100, category=category)
+    else:
+        raise ValueError(f"Неизвестный экран: {date_type}")
+
+    snapshot = get_pagination_store().put(events, _render_pagination)
+    cache.put(date_type, category, now, Listing(snapshot, meta), generation)
+    return snapshot, meta
+
+
+def build_page_keyboard(data: dict, snapshot: ResultSnapshot):
+    """Клавиатура: фильтры категорий + навигация ◀ 1/5 ▶."""
+    page = data["page"]
+    per_page = data["per_page"]
+    total = snapshot.total
+    max_page = max(0, (total - 1) // per_page)
+    keyboard = []
+
+    category_counts = snapshot.category_counts
+
     # Кнопки фильтрации по категориям
     if len(category_counts) > 1:
         row = []
@@ -1439,23 +1544,17 @@ def build_page_keyboard(data: dict):
 
 async def show_page(update_or_query, context: ContextTypes.DEFAULT_TYPE):
     data = context.user_data.get("pagination")
-    if not data:
+    snapshot = get_pagination_store().get(data["snapshot"]) if data and data.get("snapshot") else None
+    if snapshot is None:
         msg = "Данные не найдены. Попробуйте запрос заново."
         if isinstance(update_or_query, Update):
             await update_or_query.message.reply_text(msg)
         else:
             await update_or_query.answer(msg, show_alert=True)
         return
-    raw_events = data["events"]
-    # Группируем сырые события; кешируем чтобы не пересчитывать при листании
-    cache_key = len(raw_events)  # простой ключ — количество сырых событий
-    if data.get("_grouped_key") != cache_key or "_grouped" not in data:
-        data["_grouped"] = pre_group_for_pagination(raw_events)
-        data["_grouped_key"] = cache_key
-    events = data["_grouped"]
 
     page, per_page = data["page"], data["per_page"]
-    total = len(events)
+    total = snapshot.total
     if total == 0:
         msg = "😕 Событий не найдено."
         if isinstance(update_or_query, Update):
@@ -1467,7 +1566,8 @@ async def show_page(update_or_query, context: ContextTypes.DEFAULT_TYPE):
     max_page = (total - 1) // per_page
     page = max(0, min(page, max_page))
     data["page"] = page
-    chunk = events[page * per_page:(page + 1) * per_page]
+    # Тексты записей готовы в снимке — листание без группировки и форматирования
+    chunk = snapshot.page_items(page, per_page)
     if isinstance(update_or_query, Update):
         await update_or_query.message.chat.send_action(action="typing")
         send = update_or_query.message.reply_text
@@ -1479,35 +1579,20 @@ async def show_page(update_or_query, context: ContextTypes.DEFAULT_TYPE):
     if data.get("date_info"): lines.append(data["date_info"])
     lines.append(f"Найдено: {total} | Стр. {page + 1}/{max_page + 1}")
     lines.append("")
-    for item in chunk:
-        if item.get("_pre_formatted"):
-            film_url = item.get("url") or "https://afisha.relax.by/kino/minsk/"
-            lines.append(item["text"] + f"\n🔗 <a href=\"{film_url}\">Подробнее</a>")
-        else:
-            url = item.get("source_url", "")
-            suffix = f"\n🔗 <a href=\"{url}\">Подробнее</a>" if url else ""
-            lines.append(format_event_text(item) + suffix)
+    for item_text in chunk:
+        lines.append(item_text)
         lines.append("")
     text = "\n".join(lines).strip()
-    keyboard = build_page_keyboard(data)
+    keyboard = build_page_keyboard(data, snapshot)
     if len(text) <= 4096:
         await send(text, reply_markup=keyboard, parse_mode="HTML", disable_web_page_preview=True)
     else:
         # Текст >4000 — делим на части, склеивая события в блоки до 4000 символов
         header = f"{data.get('title', '')}\nНайдено: {total} | Стр. {page + 1}/{max_page + 1}\n"
-        all_texts = []
-        for item in chunk:
-            if item.get("_pre_formatted"):
-                film_url = item.get("url") or "https://afisha.relax.by/kino/minsk/"
-                all_texts.append(item["text"] + f"\n🔗 <a href=\"{film_url}\">Подробнее</a>")
-            else:
-                url = item.get("source_url", "") or ""
-                suffix = f"\n🔗 <a href=\"{url}\">Подробнее</a>" if url else ""
-                all_texts.append(format_event_text(item) + suffix)
         # Склеиваем в сообщения до 4000 символов
         parts = []
         current = header
-        for t in all_texts:
+        for t in chunk:
             candidate = current + "\n" + t + "\n"
             if len(candidate) > 4096 and current != header:
                 parts.append(current.strip())
@@ -1568,7 +1653,7 @@ async def show_calendar(update_or_query, context: ContextTypes.DEFAULT_TYPE, yea
     now = datetime.now(MINSK_TZ)
     year = year or now.year
     month = month or now.month
-    keyboard = build_calendar_keyboard(year, month, get_available_dates())
+    keyboard = build_calendar_keyboard(year, month, await run_db(get_available_dates))
     text = "🗓 Выберите дату (активны даты с событиями):"
     if isinstance(update_or_query, Update):
         await update_or_query.message.reply_text(text, reply_markup=keyboard)
@@ -1603,7 +1688,7 @@ async def show_main_menu(chat_id: int, context: ContextTypes.DEFAULT_TYPE | None
 
 async def show_categories_menu(query, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
-    counts = get_events_count_by_category()
+    counts = await run_db(get_events_count_by_category)
     # Строим список: сначала категории из CATEGORY_NAMES (в правильном порядке),
     # потом неизвестные категории из БД
     ordered = {}
@@ -1706,8 +1791,8 @@ def _build_subs_keyboard(subs: list, flash_subs: list = None) -> tuple:
 
 async def show_subscriptions(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
-    subs = get_user_subscriptions(user_id)
-    flash_subs = get_user_flash_subscriptions(user_id)
+    subs = await run_db(get_user_subscriptions, user_id)
+    flash_subs = await run_db(get_user_flash_subscriptions, user_id)
     text, keyboard = _build_subs_keyboard(subs, flash_subs)
     await update.message.reply_text(text, reply_markup=keyboard, parse_mode="HTML")
 
@@ -1715,107 +1800,135 @@ async def show_subscriptions(update: Update, context: ContextTypes.DEFAULT_TYPE)
 async def show_subscriptions_query(query, context: ContextTypes.DEFAULT_TYPE):
     """Версия для callback — обновляет то же сообщение."""
     user_id = query.from_user.id
-    subs = get_user_subscriptions(user_id)
-    flash_subs = get_user_flash_subscriptions(user_id)
+    subs = await run_db(get_user_subscriptions, user_id)
+    flash_subs = await run_db(get_user_flash_subscriptions, user_id)
     text, keyboard = _build_subs_keyboard(subs, flash_subs)
     try:
         await query.edit_message_text(text, reply_markup=keyboard, parse_mode="HTML")
     except Exception:
         await query.message.reply_text(text, reply_markup=keyboard, parse_mode="HTML")
-async def send_subscriptions_digest(bot, date_type: str):
-    """Рассылает дайджест подписчикам после обновления парсеров.
-    Каждая категория — отдельное сообщение каждому подписчику.
-    Если событий нет — не отправляем."""
-    logger.info(f"📬 Рассылка дайджеста: {date_type}")
-    subscribers = get_all_subscribers()
-    today = datetime.now(MINSK_TZ)
-    tomorrow = today + timedelta(days=1)
-    sent_count, error_count = 0, 0
+def _digest_events(date_type: str, category: str, now: datetime) -> tuple[list, str] | None:
+    """События и подпись периода для пары (category, date_type); None — тип не поддерживается."""
+    tomorrow = now + timedelta(days=1)
+    if date_type == "today":
+        return get_events_by_date_and_category(now, category), f"сегодня ({now.strftime('%d.%m')})"
+    if date_type == "tomorrow":
+        return get_events_by_date_and_category(tomorrow, category), f"завтра ({tomorrow.strftime('%d.%m')})"
+    if date_type == "upcoming":
+        return get_upcoming_events(limit=20, category=category), "ближайшие дни"
+    if date_type == "weekend":
+        events, saturday, sunday = get_weekend_events(category=category)
+        return events, f"выходные ({saturday.strftime('%d.%m')}–{sunday.strftime('%d.%m')})"
+    return None
 
-    categories_with_subs = {cat for (cat, dt) in subscribers.keys() if dt == date_type}
 
-    for category in categories_with_subs:
-        user_ids = subscribers.get((category, date_type), [])
-        if not user_ids:
-            continue
+def _render_digest_message(category: str, date_type: str, events, period_label: str) -> DigestMessage | None:
+    # Не отправляем если нет событий
+    if not events:
+        return None
 
-        if date_type == "today":
-            events = get_events_by_date_and_category(today, category)
-            period_label = f"сегодня ({today.strftime('%d.%m')})"
-        elif date_type == "tomorrow":
-            events = get_events_by_date_and_category(tomorrow, category)
-            period_label = f"завтра ({tomorrow.strftime('%d.%m')})"
-        elif date_type == "upcoming":
-            events = get_upcoming_events(limit=20, category=category)
-            period_label = "ближайшие дни"
-        elif date_type == "weekend":
-            events, saturday, sunday = get_weekend_events(category=category)
-            period_label = f"выходные ({saturday.strftime('%d.%m')}–{sunday.strftime('%d.%m')})"
-        else:
-            continue
+    display_name = CATEGORY_NAMES.get(category, category)
+    events_list = [dict(e) if not isinstance(e, dict) else e for e in events]
+
+    # Группируем как в боте
+    if category == "cinema":
+        grouped_items = format_grouped_cinema_events(group_cinema_events(events_list[:10]))
+        event_lines = []
+        for text, url in grouped_items[:5]:
+            link = f"\n🔗 <a href=\"{url}\">Подробнее</a>" if url else ""
+            event_lines.append(text + link)
+    else:
+        grouped_items = group_other_events(events_list[:10])
+        event_lines = []
+        for item in grouped_items[:5]:
+            link = f"\n🔗 <a href=\"{item['url']}\">Подробнее</a>" if item.get("url") else ""
+            event_lines.append(item["text"] + link)
 
-        # Не отправляем если нет событий
-        if not events:
-            logger.info(f"  ↩ {category}/{date_type}: нет событий, пропускаем")
-            continue
+    lines = [
+        "🔔 С добрым утром! Пора начинать новый 🌟 Dvizh!\n",
+        f"🔔 <b>{display_name} на {period_label}</b> — {len(events)} событий\n",
+    ] + event_lines
 
-        display_name = CATEGORY_NAMES.get(category, category)
-        events_list = [dict(e) if not isinstance(e, dict) else e for e in events]
+    if len(events) > 5:
+        lines.append(f"\n<i>...и ещё {len(events) - 5} событий. Откройте бот для просмотра всех.</i>")
 
-        # Группируем как в боте
-        if category == "cinema":
-            grouped_items = format_grouped_cinema_events(group_cinema_events(events_list[:10]))
-            event_lines = []
-            for text, url in grouped_items[:5]:
-                link = f"\n🔗 <a href=\"{url}\">Подробнее</a>" if url else ""
-                event_lines.append(text + link)
-        else:
-            grouped_items = group_other_events(events_list[:10])
-            event_lines = []
-            for item in grouped_items[:5]:
-                link = f"\n🔗 <a href=\"{item['url']}\">Подробнее</a>" if item.get("url") else ""
-                event_lines.append(item["text"] + link)
+    message_text = "\n\n".join(lines)
+    if len(message_text) > 4096:
+        message_text = message_text[:4040] + "\n\n<i>...открой бот чтобы увидеть все.</i>"
 
-        lines = [
-            "🔔 С добрым утром! Пора начинать новый 🌟 Dvizh!\n",
-            f"🔔 <b>{display_name} на {period_label}</b> — {len(events)} событий\n",
-        ] + event_lines
+    return DigestMessage(category=category, date_type=date_type, text=message_text, events_total=len(events))
+
+
+def build_digest_snapshot(pairs, generation: int) -> DigestSnapshot:
+    """Собирает снимок дайджеста: сообщения для пар (category, date_type) и посты канала.
 
-        if len(events) > 5:
-            lines.append(f"\n<i>...и ещё {len(events) - 5} событий. Откройте бот для просмотра всех.</i>")
+    Блокирующая — вызывается через run_db, все запросы идут в одном потоке БД.
+    """
+    now = datetime.now(MINSK_TZ)
+    snapshot = DigestSnapshot(day=now.strftime("%Y-%m-%d"), generation=generation)
+    for category, date_type in sorted(pairs):
+        loaded = _digest_events(date_type, category, now)
+        snapshot.messages[(category, date_type)] = (
+            _render_digest_message(category, date_type, *loaded) if loaded else None
+        )
+    for post_type in ("today", "weekend"):
+        # Ошибка поста канала не должна останавливать рассылку дайджеста
+        try:
+            snapshot.channel[post_type] = _render_channel_post(post_type, now)
+        except Exception as e:
+            logger.error(f"Снимок дайджеста: пост канала ({post_type}) не собран: {e}")
+            snapshot.channel[post_type] = None
+    return snapshot
+
+
+async def load_digest_snapshot(pairs=()) -> DigestSnapshot:
+    """Снимок дайджеста из DigestStore; нет, устарел или не хватает пар — сборка заново."""
+    store = get_digest_store()
+    generation = get_listing_cache().generation
+    day = datetime.now(MINSK_TZ).strftime("%Y-%m-%d")
+    snapshot = store.get(day, generation)
+    if snapshot is not None and snapshot.covers(pairs):
+        return snapshot
+    wanted = set(pairs) | (set(snapshot.messages) if snapshot is not None else set())
+    start_time = datetime.now(MINSK_TZ)
+    snapshot = await run_db(build_digest_snapshot, wanted, generation)
+    store.put(snapshot)
+    elapsed = (datetime.now(MINSK_TZ) - start_time).total_seconds()
+    logger.info(f"📰 Снимок дайджеста: {len(wanted)} сообщений и посты канала за {elapsed:.1f} сек")
+    return snapshot
+
+
+async def send_subscriptions_digest(bot, date_type: str):
+    """Рассылает дайджест подписчикам после обновления парсеров.
+    Каждая категория — отдельное сообщение каждому подписчику.
+    Если событий нет — не отправляем. Тексты — из снимка дайджеста (digest_snapshot)."""
+    logger.info(f"📬 Рассылка дайджеста: {date_type}")
+    subscribers = await run_db(get_all_subscribers)
+    snapshot = await load_digest_snapshot(subscribers.keys())
+    messages: list[OutboxMessage] = []
 
-        message_text = "\n\n".join(lines)
-        if len(message_text) > 4096:
-            message_text = message_text[:4040] + "\n\n<i>...открой бот чтобы увидеть все.</i>"
+    for (category, dt), user_ids in subscribers.items():
+        if dt != date_type or not user_ids:
+            continue
+        digest = snapshot.message(category, date_type)
+        if digest is None:
+            logger.info(f"  ↩ {category}/{date_type}: нет событий, пропускаем")
+            continue
 
         unsubscribe_keyboard = InlineKeyboardMarkup([[
             InlineKeyboardButton("🔕 Отписаться", callback_data=f"unsub_{category}_{date_type}")
         ]])
-        from telegram.error import RetryAfter
-        for user_id in user_ids:
-            try:
-                await bot.send_message(chat_id=user_id, text=message_text,
-                                       reply_markup=unsubscribe_keyboard,
-                                       parse_mode="HTML", disable_web_page_preview=True)
-                sent_count += 1
-                await asyncio.sleep(0.1)
-            except RetryAfter as e:
-                logger.warning(f"Дайджест RetryAfter {e.retry_after}с для {user_id}")
-                await asyncio.sleep(e.retry_after + 1)
-                try:
-                    await bot.send_message(chat_id=user_id, text=message_text,
-                                           reply_markup=unsubscribe_keyboard,
-                                           parse_mode="HTML", disable_web_page_preview=True)
-                    sent_count += 1
-                except Exception as retry_e:
-                    error_count += 1
-                    logger.warning(f"Повтор после RetryAfter не удался {user_id}: {retry_e}")
-            except Exception as e:
-                error_count += 1
-                logger.warning(f"Не удалось отправить подписчику {user_id}: {e}")
+        messages.extend(
+            OutboxMessage(chat_id=user_id, text=digest.text, key=f"{category}:{user_id}",
+                          reply_markup=unsubscribe_keyboard)
+            for user_id in user_ids
+        )
 
-    logger.info(f"📬 Рассылка завершена: отправлено {sent_count}, ошибок {error_count}")
-    return sent_count, error_count
+    if not messages:
+        return 0, 0
+    stats = await get_broadcaster().send(bot, new_campaign(f"digest:{date_type}"), messages)
+    logger.info(f"📬 Рассылка завершена: отправлено {stats.sent}, ошибок {stats.failed}")
+    return stats.sent, stats.failed
 
 
 # ---------------------- Статистика ----------------------
@@ -1830,12 +1943,7 @@ async def show_pending_list(update_or_query, context: ContextTypes.DEFAULT_TYPE)
     if uid != ADMIN_ID:
         return
 
-    with get_db_connection() as conn:
-        rows = conn.execute("""
-            SELECT id, title, event_date, place, category, status, first_name, username, created_at
-            FROM pending_events WHERE status IN ('pending','edited')
-            ORDER BY created_at ASC
-        """).fetchall()
+    rows = await run_db(get_pending_list)
 
     if not rows:
         text = "✅ <b>Очередь модерации пуста</b>\n\nНет событий ожидающих проверки."
@@ -1884,10 +1992,7 @@ async def admin_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update.effective_user.id != ADMIN_ID:
         await update.message.reply_text("⛔ Нет доступа.")
         return
-    with get_db_connection() as conn:
-        _pcnt = conn.execute(
-            "SELECT COUNT(*) FROM pending_events WHERE status IN ('pending','edited')"
-        ).fetchone()[0]
+    _pcnt = await run_db(count_pending_events)
     _plabel = f"📋 Модерация ({_pcnt})" if _pcnt else "📋 Модерация"
     keyboard = InlineKeyboardMarkup([
         [InlineKeyboardButton(_plabel, callback_data="adm_pending")],
@@ -1977,6 +2082,17 @@ def _format_stats(stats: dict, title: str) -> str:
         "",
     ]
 
+    # ── Рассылки ──────────────────────────────────────────────────
+    b24 = stats["broadcast_24h"]
+    lines += [
+        "📨 <b>Рассылки (24 ч)</b>",
+        f"  Доставлено: <b>{b24['sent']}</b>  |  Ошибок: <b>{b24['failed']}</b>  |  В очереди: <b>{b24['pending']}</b>",
+    ]
+    for run in list(get_broadcaster().history)[-3:]:
+        lines.append(f"  · {_html.escape(run.campaign.split(':')[0])} {run.finished_at[11:16]}: "
+                     f"{run.sent}/{run.total} за {run.elapsed:.0f} с ({run.rate:.1f}/с)")
+    lines.append("")
+
     # ── Активность за 14 дней ─────────────────────────────────────
     lines.append("📅 <b>Активность (14 дней):</b>")
     for row in list(stats["daily_activity"])[:14]:
@@ -2017,7 +2133,7 @@ async def show_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update.effective_user.id != ADMIN_ID:
         await update.message.reply_text("⛔ Нет доступа.")
         return
-    stats = get_stats_data(exclude_admin=False)
+    stats = await run_db(get_stats_data, exclude_admin=False)
     await update.message.reply_text(_format_stats(stats, "📊 СТАТИСТИКА (все)"), parse_mode="HTML")
 
 
@@ -2026,7 +2142,7 @@ async def show_ustats(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update.effective_user.id != ADMIN_ID:
         await update.message.reply_text("⛔ Нет доступа.")
         return
-    stats = get_stats_data(exclude_admin=True)
+    stats = await run_db(get_stats_data, exclude_admin=True)
     await update.message.reply_text(_format_stats(stats, "📊 СТАТИСТИКА ПОЛЬЗОВАТЕЛЕЙ"), parse_mode="HTML")
 
 
@@ -2064,6 +2180,49 @@ def _find_duplicates(conn) -> list[dict]:
     return result
 
 
+def find_duplicate_groups() -> list[dict]:
+    with get_db_connection() as conn:
+        return _find_duplicates(conn)
+
+
+def delete_duplicates() -> list[dict]:
+    """Удаляет дубликаты, оставляя запись с меньшим id; возвращает удалённые группы."""
+    groups = find_duplicate_groups()
+    all_delete_ids = [i for g in groups for i in g['delete_ids']]
+    if all_delete_ids:
+        with get_db_write_connection() as conn:
+            placeholders = ','.join('?' * len(all_delete_ids))
+            conn.execute(f"DELETE FROM events WHERE id IN ({placeholders})", all_delete_ids)
+            conn.commit()
+        get_listing_cache().invalidate()
+    return groups
+
+
+def preview_events_range(id_from: int, id_to: int) -> tuple[list, int]:
+    """Первые 20 событий диапазона id и общее их число — для подтверждения удаления."""
+    with get_db_connection() as conn:
+        rows = conn.execute(
+            "SELECT id, title, event_date FROM events WHERE id BETWEEN ? AND ? ORDER BY id LIMIT 20",
+            (id_from, id_to)
+        ).fetchall()
+        total = conn.execute(
+            "SELECT COUNT(*) FROM events WHERE id BETWEEN ? AND ?",
+            (id_from, id_to)
+        ).fetchone()[0]
+    return rows, total
+
+
+def delete_events_range(id_from: int, id_to: int) -> int:
+    with get_db_write_connection() as conn:
+        deleted = conn.execute(
+            "DELETE FROM events WHERE id BETWEEN ? AND ?", (id_from, id_to)
+        ).rowcount
+        conn.commit()
+    if deleted:
+        get_listing_cache().invalidate()
+    return deleted
+
+
 async def delete_event_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """/delete_event <id>            — удалить одно событие
     /delete_event <id_from> <id_to>  — удалить диапазон id (включительно)
@@ -2097,16 +2256,8 @@ async def delete_event_command(update: Update, context: ContextTypes.DEFAULT_TYP
         await update.message.reply_text("❌ Диапазон не должен превышать 1000 событий за раз.")
         return
 
-    with get_db_connection() as conn:
-        # Покажем что будет удалено
-        rows = conn.execute(
-            "SELECT id, title, event_date FROM events WHERE id BETWEEN ? AND ? ORDER BY id LIMIT 20",
-            (id_from, id_to)
-        ).fetchall()
-        total = conn.execute(
-            "SELECT COUNT(*) FROM events WHERE id BETWEEN ? AND ?",
-            (id_from, id_to)
-        ).fetchone()[0]
+    # Покажем что будет удалено
+    rows, total = await run_db(preview_events_range, id_from, id_to)
 
     if not total:
         await update.message.reply_text(f"ℹ️ События с id {id_from}–{id_to} не найдены.")
@@ -2143,9 +2294,10 @@ async def dedup_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     confirm = bool(context.args and context.args[0].lower() == 'confirm')
 
-    with get_db_connection() as conn:
-        conn.row_factory = sqlite3.Row
-        groups = _find_duplicates(conn)
+    if confirm:
+        groups = await run_db(delete_duplicates)
+    else:
+        groups = await run_db(find_duplicate_groups)
 
     total_groups = len(groups)
     total_delete = sum(len(g['delete_ids']) for g in groups)
@@ -2169,13 +2321,6 @@ async def dedup_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text('\n'.join(lines), parse_mode="HTML")
         return
 
-    # Выполняем удаление
-    all_delete_ids = [i for g in groups for i in g['delete_ids']]
-    with get_db_connection() as conn:
-        placeholders = ','.join('?' * len(all_delete_ids))
-        conn.execute(f"DELETE FROM events WHERE id IN ({placeholders})", all_delete_ids)
-        conn.commit()
-
     await update.message.reply_text(
         f"🧹 <b>Удалено {total_delete} дубликатов</b> из {total_groups} групп.\n"
         f"База очищена.",
@@ -2215,6 +2360,7 @@ async def update_parsers(update_or_query, context: ContextTypes.DEFAULT_TYPE):
         elapsed = (datetime.now(MINSK_TZ) - message.date.astimezone(MINSK_TZ)).total_seconds()
         
         if process.returncode == 0:
+            get_listing_cache().invalidate()
             output = stdout.decode("utf-8", errors="replace")
             report = _parse_parser_report(output)
             if report:
@@ -2252,6 +2398,7 @@ async def run_parsers_job(bot=None):
         if process.returncode == 0:
             output = stdout.decode()
             logger.info(f"✅ Парсеры завершены за {elapsed:.0f} сек")
+            get_listing_cache().invalidate()
             if bot:
                 report = _parse_parser_report(output)
                 await _send_parser_report(bot, report or [], elapsed)
@@ -2355,6 +2502,16 @@ async def send_digest_job(bot=None):
             logger.info(f"📬 Дайджест [{date_type}]: отправлено {sent} польз., {errors} ошибок")
 
 
+async def resume_broadcasts_job(bot=None):
+    """Досылает pending-сообщения из broadcast_outbox после перезапуска."""
+    if bot:
+        for stats in await get_broadcaster().resume(bot):
+            if stats.campaign.startswith("flash:") and stats.sent_keys:
+                # Ключ флеш-сообщения — id подписки (check_flash_subscriptions)
+                await run_db(mark_flash_notified, [int(key) for key in stats.sent_keys])
+            logger.info(f"📨 Дослано: {stats.summary()}")
+
+
 async def run_daytime_update_job(bot=None):
     """Дневная лёгкая проверка источников + полный парсинг при обнаружении изменений."""
     logger.info("☀️ Запуск дневного обновления...")
@@ -2370,6 +2527,7 @@ async def run_daytime_update_job(bot=None):
         if process.returncode == 0:
             output = stdout.decode()
             logger.info(f"✅ Дневное обновление завершено за {elapsed:.0f} сек")
+            get_listing_cache().invalidate()
             if bot:
                 report = _parse_daytime_report(output)
                 if report:
@@ -2577,6 +2735,23 @@ CATEGORY_KEYBOARD = InlineKeyboardMarkup([
 
 
 
+def get_pending_list() -> list:
+    """События на модерации (status=pending/edited), старые первыми."""
+    with get_db_connection() as conn:
+        return conn.execute("""
+            SELECT id, user_id, title, event_date, place, category, status, first_name, username, created_at
+            FROM pending_events WHERE status IN ('pending','edited')
+            ORDER BY created_at ASC
+        """).fetchall()
+
+
+def count_pending_events() -> int:
+    with get_db_connection() as conn:
+        return conn.execute(
+            "SELECT COUNT(*) FROM pending_events WHERE status IN ('pending','edited')"
+        ).fetchone()[0]
+
+
 def get_pending_event(pending_id: int) -> dict | None:
     with get_db_connection() as conn:
         row = conn.execute("SELECT * FROM pending_events WHERE id=?", (pending_id,)).fetchone()
@@ -2584,7 +2759,7 @@ def get_pending_event(pending_id: int) -> dict | None:
 
 
 def update_pending_event(pending_id: int, data: dict):
-    with get_db_connection() as conn:
+    with get_db_write_connection() as conn:
         # Парсим show_time при сохранении модератором
         raw_t = data.get("show_time", "") or ""
         if "-" in raw_t and raw_t.count(":") == 2:
@@ -2698,7 +2873,7 @@ async def send_promo_to_subscribers(bot, row_data: dict) -> int:
         return 0
 
     # Берём подписчиков всех date_type этой категории — дедупликация по user_id
-    subscribers = get_all_subscribers()
+    subscribers = await run_db(get_all_subscribers)
     user_ids = set()
     for (cat, _dt), ids in subscribers.items():
         if cat == category:
@@ -2714,22 +2889,12 @@ async def send_promo_to_subscribers(bot, row_data: dict) -> int:
         promo_data["price"] = normalize_price(promo_data["price"])
 
     text = format_promo_post(promo_data)
-    sent = 0
-    for user_id in user_ids:
-        try:
-            await bot.send_message(
-                chat_id=user_id,
-                text=text,
-                parse_mode="HTML",
-                disable_web_page_preview=False,
-            )
-            sent += 1
-            await asyncio.sleep(0.1)  # вежливая пауза
-        except Exception as e:
-            logger.warning(f"Промо подписчику {user_id}: {e}")
+    messages = [OutboxMessage(chat_id=user_id, text=text, disable_web_page_preview=False)
+                for user_id in user_ids]
+    stats = await get_broadcaster().send(bot, new_campaign(f"promo:{category}"), messages)
 
-    logger.info(f"📣 Промо разослано {sent} подписчикам категории {category}")
-    return sent
+    logger.info(f"📣 Промо разослано {stats.sent} подписчикам категории {category}")
+    return stats.sent
 
 
 def validate_field(field: str, text: str):
@@ -2806,7 +2971,7 @@ def validate_field(field: str, text: str):
         return True, text
 
 def save_pending_event(user_id, username, first_name, data: dict) -> int:
-    with get_db_connection() as conn:
+    with get_db_write_connection() as conn:
         cursor = conn.cursor()
         # Парсим show_time: "10:00-18:00" → show_time="10:00", end_time="18:00"
         raw_time = data.get("show_time", "") or ""
@@ -2941,7 +3106,7 @@ def approve_pending_event(pending_id: int) -> tuple[bool, dict | None]:
     from datetime import date as _date, timedelta as _td
     from normalizer import normalize_place, normalize_price
     
-    with get_db_connection() as conn:
+    with get_db_write_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM pending_events WHERE id = ?", (pending_id,))
         row = cursor.fetchone()
@@ -3001,6 +3166,7 @@ def approve_pending_event(pending_id: int) -> tuple[bool, dict | None]:
 
         cursor.execute("UPDATE pending_events SET status = 'approved' WHERE id = ?", (pending_id,))
         conn.commit()
+        get_listing_cache().invalidate()
 
         # Возвращаем данные для промо-публикации
         row_data = dict(row)
@@ -3010,7 +3176,7 @@ def approve_pending_event(pending_id: int) -> tuple[bool, dict | None]:
 
 
 def reject_pending_event(pending_id: int):
-    with get_db_connection() as conn:
+    with get_db_write_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("UPDATE pending_events SET status = 'rejected' WHERE id = ?", (pending_id,))
         conn.commit()
@@ -3216,9 +3382,11 @@ def _get_card_font_path(bold: bool = False) -> str | None:
         "Roboto-Bold.ttf":    "https://github.com/google/fonts/raw/main/apache/roboto/static/Roboto-Bold.ttf",
     }
     try:
-        import requests as _req
+        import httpx
         logger.info(f"Downloading font {fname}...")
-        r = _req.get(urls[fname], timeout=30)
+        r = httpx.get(urls[fname], timeout=30, follow_redirects=True)
+        if r.status_code != 200:
+            raise RuntimeError(f"HTTP {r.status_code}")
         with open(fpath, "wb") as f:
             f.write(r.content)
         logger.info(f"Font saved: {fpath}")
@@ -3370,13 +3538,8 @@ def _generate_post_card(events: list[dict], title_line1: str, title_line2: str,
     return buf.getvalue()
 
 
-async def post_to_channel(bot, post_type: str = "today"):
-    """Публикует подборку событий в Telegram канал."""
-    if not CHANNEL_ID:
-        logger.warning("CHANNEL_ID не задан — пропускаем публикацию в канал")
-        return
-
-    now = datetime.now(MINSK_TZ)
+def _render_channel_post(post_type: str, now: datetime) -> ChannelPost | None:
+    """Текст поста в канал (сборка снимка дайджеста, поток БД)."""
     DAY_NAMES = ["Понедельник","Вторник","Среда","Четверг","Пятница","Суббота","Воскресенье"]
     MONTH_NAMES = ["января","февраля","марта","апреля","мая","июня",
                    "июля","августа","сентября","октября","ноября","декабря"]
@@ -3521,7 +3684,7 @@ async def post_to_channel(bot, post_type: str = "today"):
         events_raw = get_events_by_date_and_category(now)
         events = [dict(e) for e in events_raw] if events_raw else []
         if not events:
-            return
+            return None
         day_name   = DAY_NAMES[now.weekday()].lower()
         day_num    = now.day
         month_name = MONTH_NAMES[now.month - 1]
@@ -3549,7 +3712,7 @@ async def post_to_channel(bot, post_type: str = "today"):
         events_sun = [dict(e) for e in (get_events_by_date_and_category(sunday)   or [])]
         all_events = events_sat[:15] + events_sun[:15]
         if not all_events:
-            return
+            return None
         sat_d = saturday.day
         sun_d = sunday.day
         mon   = MONTH_NAMES[saturday.month - 1]
@@ -3582,11 +3745,25 @@ async def post_to_channel(bot, post_type: str = "today"):
         lines.append(f"\n👉 Ищи все события: @Minskdvizh_bot")
         lines.append("#афишаминск #выходныеминск #движ")
     else:
-        return
+        return None
 
     text = "\n".join(lines)
     if len(text) > 4096:
         text = text[:4040] + "...\n\n👉 @Minskdvizh_bot"
+    return ChannelPost(post_type=post_type, text=text)
+
+
+async def post_to_channel(bot, post_type: str = "today"):
+    """Публикует подборку событий в Telegram канал (текст — из снимка дайджеста)."""
+    if not CHANNEL_ID:
+        logger.warning("CHANNEL_ID не задан — пропускаем публикацию в канал")
+        return
+
+    snapshot = await load_digest_snapshot()
+    post = snapshot.channel.get(post_type)
+    if post is None:
+        return
+    text = post.text
 
     from telegram.error import RetryAfter
     try:
@@ -3657,6 +3834,12 @@ def setup_scheduler(application):
         kwargs={"bot": application.bot},
         id="daytime_update_18", replace_existing=True,
     )
+    # Рассылки, прерванные перезапуском, — досылаем сразу после старта
+    scheduler.add_job(
+        resume_broadcasts_job,
+        kwargs={"bot": application.bot},
+        id="broadcast_resume", replace_existing=True,
+    )
     scheduler.start()
     logger.info("⏰ Планировщик: парсеры 6:00, дайджест 8:00, канал 8:05, выходные пятница 11:00, дневные проверки 13:00 и 18:00 (Минск)")
 
@@ -3687,7 +3870,7 @@ DONATE_TEXT = (
 
 async def donate_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
-    log_user_action(user.id, user.username, user.first_name, "donate_menu")
+    await run_db(log_user_action, user.id, user.username, user.first_name, "donate_menu")
     await update.message.reply_text(DONATE_TEXT, reply_markup=InlineKeyboardMarkup(_build_donate_keyboard()), parse_mode=ParseMode.MARKDOWN)
 
 
@@ -3704,7 +3887,7 @@ async def custom_donate(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if amount > 2500:
             await update.message.reply_text("❌ Максимальная сумма — 2500 Stars")
             return
-        log_user_action(user.id, user.username, user.first_name, "donate_custom", str(amount))
+        await run_db(log_user_action, user.id, user.username, user.first_name, "donate_custom", str(amount))
         await send_star_invoice(update, context, amount)
     except ValueError:
         await update.message.reply_text("❌ Введите число. Пример: `/donate 150`", parse_mode=ParseMode.MARKDOWN)
@@ -3736,7 +3919,7 @@ async def precheckout_callback(update: Update, context: ContextTypes.DEFAULT_TYP
 async def successful_payment_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     amount = update.message.successful_payment.total_amount
-    log_user_action(user.id, user.username, user.first_name, "donate_success", str(amount))
+    await run_db(log_user_action, user.id, user.username, user.first_name, "donate_success", str(amount))
     await update.message.reply_text(
         f"*{user.first_name}, спасибо от всего сердца!* 🙏\n\n"
         f"Ваши {amount} ⭐ Stars — это не просто поддержка, это сигнал что проект нужен и важен.\n\n"
@@ -3759,8 +3942,8 @@ async def successful_payment_callback(update: Update, context: ContextTypes.DEFA
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
-    save_user_profile(user.id, user.username, user.first_name)
-    log_user_action(user.id, user.username, user.first_name, "start")
+    await run_db(save_user_profile, user.id, user.username, user.first_name)
+    await run_db(log_user_action, user.id, user.username, user.first_name, "start")
     await update.message.reply_text(
         f"🎉 Привет, {user.first_name}!\n\n"
         "Я — 🌟**MinskDvizh**, твой персональный гид по событиям Минска.\n\n"
@@ -3777,17 +3960,17 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def today_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
-    log_user_action(user.id, user.username, user.first_name, "cmd_today")
+    await run_db(log_user_action, user.id, user.username, user.first_name, "cmd_today")
     today = datetime.now(MINSK_TZ)
-    events = get_events_by_date_and_category(today)
-    set_pagination(context, events, f"<b>События на {today.strftime('%d.%m.%Y')}:</b>",
+    snapshot, _ = await load_listing("today")
+    set_pagination_snapshot(context, snapshot, f"<b>События на {today.strftime('%d.%m.%Y')}:</b>",
                    share_query=f"date:{today.strftime('%Y-%m-%d')}")
     await show_page(update, context)
 
 
 async def app_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
-    log_user_action(user.id, user.username, user.first_name, "open_webapp")
+    await run_db(log_user_action, user.id, user.username, user.first_name, "open_webapp")
     keyboard = InlineKeyboardMarkup([[
         InlineKeyboardButton("🌐 Открыть MinskDvizh", web_app=WebAppInfo(url=WEB_APP_URL))
     ]])
@@ -3865,81 +4048,84 @@ async def inline_query_handler(update: Update, context: ContextTypes.DEFAULT_TYP
         inline_time_clause = f"(event_date > ? OR {_itf})"
         inline_time_params = [today] + _itp
 
-        with get_db_connection() as conn:
-            where = []
-            params = []
-            
-            # 🔧 ОСОБЫЙ СЛУЧАЙ: категория "free" — показываем ВСЕ бесплатные события
-            if cat_filter == "free":
-                where.append("price = 'Бесплатно'")
-                # Даты
-                if date_filter:
-                    where.append("event_date = ?")
-                    params.append(date_filter)
-                    if date_filter == today:
-                        time_filter, time_params = _build_time_filter(date_filter, today, now_time)
-                        where.append(time_filter)
-                        params.extend(time_params)
-                elif date_from_filter and date_to_filter:
-                    where.append("event_date BETWEEN ? AND ?")
-                    params += [date_from_filter, date_to_filter]
-                    if date_from_filter == today:
-                        where.append(inline_time_clause)
-                        params += inline_time_params
-                elif date_from_filter:
-                    where.append("event_date >= ?")
-                    params.append(date_from_filter)
-                    if date_from_filter == today:
-                        where.append(inline_time_clause)
-                        params += inline_time_params
-                else:
-                    where.append("event_date >= ?")
-                    params.append(today)
+        where = []
+        params = []
+        
+        # 🔧 ОСОБЫЙ СЛУЧАЙ: категория "free" — показываем ВСЕ бесплатные события
+        if cat_filter == "free":
+            where.append("price = 'Бесплатно'")
+            # Даты
+            if date_filter:
+                where.append("event_date = ?")
+                params.append(date_filter)
+                if date_filter == today:
+                    time_filter, time_params = _build_time_filter(date_filter, today, now_time)
+                    where.append(time_filter)
+                    params.extend(time_params)
+            elif date_from_filter and date_to_filter:
+                where.append("event_date BETWEEN ? AND ?")
+                params += [date_from_filter, date_to_filter]
+                if date_from_filter == today:
+                    where.append(inline_time_clause)
+                    params += inline_time_params
+            elif date_from_filter:
+                where.append("event_date >= ?")
+                params.append(date_from_filter)
+                if date_from_filter == today:
                     where.append(inline_time_clause)
                     params += inline_time_params
             else:
-                # Обычная категория
-                if date_filter:
-                    where.append("event_date = ?")
-                    params.append(date_filter)
-                    # Для сегодня — исключаем прошедшие сеансы
-                    if date_filter == today:
-                        time_filter, time_params = _build_time_filter(date_filter, today, now_time)
-                        where.append(time_filter)
-                        params.extend(time_params)
-                elif date_from_filter and date_to_filter:
-                    where.append("event_date BETWEEN ? AND ?")
-                    params += [date_from_filter, date_to_filter]
-                    # Если начало диапазона — сегодня, фильтруем время
-                    if date_from_filter == today:
-                        where.append(inline_time_clause)
-                        params += inline_time_params
-                elif date_from_filter:
-                    where.append("event_date >= ?")
-                    params.append(date_from_filter)
-                    if date_from_filter == today:
-                        where.append(inline_time_clause)
-                        params += inline_time_params
-                else:
-                    where.append("event_date >= ?")
-                    params.append(today)
+                where.append("event_date >= ?")
+                params.append(today)
+                where.append(inline_time_clause)
+                params += inline_time_params
+        else:
+            # Обычная категория
+            if date_filter:
+                where.append("event_date = ?")
+                params.append(date_filter)
+                # Для сегодня — исключаем прошедшие сеансы
+                if date_filter == today:
+                    time_filter, time_params = _build_time_filter(date_filter, today, now_time)
+                    where.append(time_filter)
+                    params.extend(time_params)
+            elif date_from_filter and date_to_filter:
+                where.append("event_date BETWEEN ? AND ?")
+                params += [date_from_filter, date_to_filter]
+                # Если начало диапазона — сегодня, фильтруем время
+                if date_from_filter == today:
                     where.append(inline_time_clause)
                     params += inline_time_params
-                if cat_filter == "kids":
-                    where.append("is_kids = 1")
-                elif cat_filter:
-                    where.append("category = ?")
-                    params.append(cat_filter)
-            if text_filter:
-                tl = text_filter.lower()
-                where.append("(pylow(title) LIKE ? OR pylow(place) LIKE ?)")
-                params += [f"%{tl}%", f"%{tl}%"]
-            sql = f"""
-                SELECT DISTINCT title, event_date, show_time, place, price, category, source_url
-                FROM events WHERE {" AND ".join(where)}
-                ORDER BY event_date, show_time LIMIT 10
-            """
-            rows = conn.execute(sql, params).fetchall()
+            elif date_from_filter:
+                where.append("event_date >= ?")
+                params.append(date_from_filter)
+                if date_from_filter == today:
+                    where.append(inline_time_clause)
+                    params += inline_time_params
+            else:
+                where.append("event_date >= ?")
+                params.append(today)
+                where.append(inline_time_clause)
+                params += inline_time_params
+            if cat_filter == "kids":
+                where.append("is_kids = 1")
+            elif cat_filter:
+                where.append("category = ?")
+                params.append(cat_filter)
+        if text_filter:
+            text_clause = search_clause(text_filter, ("title", "place"))
+            if not text_clause:
+                # В запросе нет слов (одна пунктуация) — совпадений нет
+                await update.inline_query.answer([], cache_time=0)
+                return
+            where.append(text_clause[0])
+            params += text_clause[1]
+        sql = f"""
+            SELECT DISTINCT title, event_date, show_time, place, price, category, source_url
+            FROM events WHERE {" AND ".join(where)}
+            ORDER BY event_date, show_time LIMIT 10
+        """
+        rows = await run_db(fetch_rows, sql, params)
 
         results = []
         for row in rows:
@@ -3970,8 +4156,8 @@ async def inline_query_handler(update: Update, context: ContextTypes.DEFAULT_TYP
 
 async def about(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
-    log_user_action(user.id, user.username, user.first_name, "about")
-    counts = get_raw_events_count_by_category()
+    await run_db(log_user_action, user.id, user.username, user.first_name, "about")
+    counts = await run_db(get_raw_events_count_by_category)
     total_events = sum(counts.values())
     cat_lines = [
         f"  {CATEGORY_NAMES[cat]} — {cnt}"
@@ -3980,12 +4166,13 @@ async def about(update: Update, context: ContextTypes.DEFAULT_TYPE):
     ]
     # Бесплатные события — все с price='Бесплатно', независимо от категории
     today = datetime.now(MINSK_TZ).strftime("%Y-%m-%d")
-    with get_db_connection() as conn:
-        free_cnt = conn.execute(
-            "SELECT COUNT(DISTINCT title || '|' || COALESCE(place,'') || '|' || event_date) "
-            "FROM events WHERE event_date >= ? AND price = 'Бесплатно'",
-            (today,)
-        ).fetchone()[0]
+    free_rows = await run_db(
+        fetch_rows,
+        "SELECT COUNT(DISTINCT title || '|' || COALESCE(place,'') || '|' || event_date) "
+        "FROM events WHERE event_date >= ? AND price = 'Бесплатно'",
+        (today,),
+    )
+    free_cnt = free_rows[0][0]
     if free_cnt > 0:
         cat_lines.append(f"  🆓 Бесплатно — {free_cnt}")
     text = (
@@ -4027,10 +4214,10 @@ async def search_by_title(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if len(query) < 3:
         await update.message.reply_text("🔍 Введите минимум 3 символа.")
         return
-    log_user_action(user.id, user.username, user.first_name, "search_title", query)
+    await run_db(log_user_action, user.id, user.username, user.first_name, "search_title", query)
     await update.message.chat.send_action(action="typing")
-    events = search_events_by_title(query)
-    flash_token = create_flash_subscription_request(user.id, query)
+    events = await run_db(search_events_by_title, query)
+    flash_token = await run_db(create_flash_subscription_request, user.id, query)
     if events:
         set_pagination(context, events, f"<b>Результаты: «{query}»</b>",
                        share_query=query)
@@ -4062,8 +4249,8 @@ async def search_by_title(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def search_by_date(update: Update, context: ContextTypes.DEFAULT_TYPE):
     date_text = update.message.text.strip()
     user = update.effective_user
-    log_user_action(user.id, user.username, user.first_name, "search_date", date_text)
-    result, formatted_date, status = search_events_by_date_raw(date_text)
+    await run_db(log_user_action, user.id, user.username, user.first_name, "search_date", date_text)
+    result, formatted_date, status = await run_db(search_events_by_date_raw, date_text)
     if status == "неверный_формат":
         await update.message.reply_text(
             f"📅 Не удалось распознать дату «{date_text}».\nФормат: ДД.ММ или ДД.ММ.ГГГГ",
@@ -4083,52 +4270,53 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
 
     if text == "⭐ Поддержать":
-        log_user_action(user.id, user.username, user.first_name, "donate_menu_button")
+        await run_db(log_user_action, user.id, user.username, user.first_name, "donate_menu_button")
         await donate_command(update, context)
         return
     if text == "ℹ️ О проекте":
-        log_user_action(user.id, user.username, user.first_name, "about_button")
+        await run_db(log_user_action, user.id, user.username, user.first_name, "about_button")
         await about(update, context)
         return
     if text == "📅 Сегодня":
-        log_user_action(user.id, user.username, user.first_name, "menu_today")
+        await run_db(log_user_action, user.id, user.username, user.first_name, "menu_today")
         today = datetime.now(MINSK_TZ)
-        events = get_events_by_date_and_category(today)
-        set_pagination(context, events, f"<b>События на {today.strftime('%d.%m.%Y')}:</b>",
+        snapshot, _ = await load_listing("today")
+        set_pagination_snapshot(context, snapshot, f"<b>События на {today.strftime('%d.%m.%Y')}:</b>",
                        share_query=f"date:{today.strftime('%Y-%m-%d')}")
         await show_page(update, context)
         return
     if text == "📆 Завтра":
-        log_user_action(user.id, user.username, user.first_name, "menu_tomorrow")
+        await run_db(log_user_action, user.id, user.username, user.first_name, "menu_tomorrow")
         tomorrow = datetime.now(MINSK_TZ) + timedelta(days=1)
-        events = get_events_by_date_and_category(tomorrow)
-        set_pagination(context, events, f"<b>События на {tomorrow.strftime('%d.%m.%Y')}:</b>",
+        snapshot, _ = await load_listing("tomorrow")
+        set_pagination_snapshot(context, snapshot, f"<b>События на {tomorrow.strftime('%d.%m.%Y')}:</b>",
                        share_query=f"date:{tomorrow.strftime('%Y-%m-%d')}")
         await show_page(update, context)
         return
     if text == "🎉 Выходные":
-        log_user_action(user.id, user.username, user.first_name, "menu_weekend")
-        events, saturday, sunday = get_weekend_events()
-        set_pagination(context, events, f"<b>Выходные ({saturday.strftime('%d.%m')}–{sunday.strftime('%d.%m')}):</b>",
+        await run_db(log_user_action, user.id, user.username, user.first_name, "menu_weekend")
+        snapshot, meta = await load_listing("weekend")
+        saturday, sunday = meta["saturday"], meta["sunday"]
+        set_pagination_snapshot(context, snapshot, f"<b>Выходные ({saturday.strftime('%d.%m')}–{sunday.strftime('%d.%m')}):</b>",
                        share_query=f"date_from:{saturday.strftime('%Y-%m-%d')} date_to:{sunday.strftime('%Y-%m-%d')}")
         await show_page(update, context)
         return
     if text == "⏰ Ближайшие":
-        log_user_action(user.id, user.username, user.first_name, "menu_upcoming")
-        events = get_upcoming_events(limit=100)
-        if events:
-            set_pagination(context, events, "⏰ <b>Ближайшие события:</b>", share_query="")
+        await run_db(log_user_action, user.id, user.username, user.first_name, "menu_upcoming")
+        snapshot, _ = await load_listing("upcoming")
+        if snapshot.total:
+            set_pagination_snapshot(context, snapshot, "⏰ <b>Ближайшие события:</b>", share_query="")
             await show_page(update, context)
         else:
             await update.message.reply_text("😕 Ближайших событий не найдено.")
         return
     if text == "🗓 Календарь":
-        log_user_action(user.id, user.username, user.first_name, "menu_calendar")
+        await run_db(log_user_action, user.id, user.username, user.first_name, "menu_calendar")
         await show_calendar(update, context)
         return
     if text == "🎯 Категории":
-        log_user_action(user.id, user.username, user.first_name, "menu_categories")
-        counts = get_events_count_by_category()
+        await run_db(log_user_action, user.id, user.username, user.first_name, "menu_categories")
+        counts = await run_db(get_events_count_by_category)
         # Сначала известные категории в нужном порядке,
         # потом любые новые из БД — появляются автоматически
         ordered = {}
@@ -4174,12 +4362,13 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def handle_filter_buttons(query, context: ContextTypes.DEFAULT_TYPE, category: str):
     data = context.user_data.get("pagination")
-    if not data:
+    snapshot = get_pagination_store().get(data["snapshot"]) if data and data.get("snapshot") else None
+    if snapshot is None:
         await query.answer("Устарело. Попробуйте снова.")
         return
     
     user = query.from_user
-    log_user_action(user.id, user.username, user.first_name, "filter_category", category)
+    await run_db(log_user_action, user.id, user.username, user.first_name, "filter_category", category)
     
     # Удаляем клавиатуру с категориями из текущего сообщения
     try:
@@ -4187,11 +4376,8 @@ async def handle_filter_buttons(query, context: ContextTypes.DEFAULT_TYPE, categ
     except Exception as e:
         logger.debug(f"Не удалось убрать клавиатуру: {e}")
     
-    filtered = data["events"] if category == "all" else filter_events_by_category(data["events"], category)
-    
-    # Сбрасываем кеш группировки
-    data.pop("_grouped", None)
-    data.pop("_grouped_key", None)
+    events = snapshot.events()
+    filtered = events if category == "all" else filter_events_by_category(events, category)
     
     # Обновляем share_query
     old_sq = data.get("share_query") or ""
@@ -4208,34 +4394,35 @@ async def handle_filter_buttons(query, context: ContextTypes.DEFAULT_TYPE, categ
 
 async def handle_date_category_buttons(query, context: ContextTypes.DEFAULT_TYPE, date_type: str, category: str):
     user = query.from_user
-    log_user_action(user.id, user.username, user.first_name, f"cat_{category}_{date_type}")
+    await run_db(log_user_action, user.id, user.username, user.first_name, f"cat_{category}_{date_type}")
     display_name = CATEGORY_NAMES.get(category, category)
     if date_type == "today":
         today = datetime.now(MINSK_TZ)
-        events = get_events_by_date_and_category(today, category)
-        set_pagination(context, events, f"<b>{display_name} на {today.strftime('%d.%m.%Y')}:</b>",
+        snapshot, _ = await load_listing("today", category)
+        set_pagination_snapshot(context, snapshot, f"<b>{display_name} на {today.strftime('%d.%m.%Y')}:</b>",
                        share_query=f"cat:{category} date:{today.strftime('%Y-%m-%d')}")
         await show_page(query, context)
         await send_subscription_prompt(query, category, "today")
     elif date_type == "tomorrow":
         tomorrow = datetime.now(MINSK_TZ) + timedelta(days=1)
-        events = get_events_by_date_and_category(tomorrow, category)
-        set_pagination(context, events, f"<b>{display_name} на {tomorrow.strftime('%d.%m.%Y')}:</b>",
+        snapshot, _ = await load_listing("tomorrow", category)
+        set_pagination_snapshot(context, snapshot, f"<b>{display_name} на {tomorrow.strftime('%d.%m.%Y')}:</b>",
                        share_query=f"cat:{category} date:{tomorrow.strftime('%Y-%m-%d')}")
         await show_page(query, context)
         await send_subscription_prompt(query, category, "tomorrow")
     elif date_type == "upcoming":
-        events = get_upcoming_events(limit=100, category=category)
-        if events:
-            set_pagination(context, events, f"<b>Ближайшие {display_name}:</b>",
+        snapshot, _ = await load_listing("upcoming", category)
+        if snapshot.total:
+            set_pagination_snapshot(context, snapshot, f"<b>Ближайшие {display_name}:</b>",
                            share_query=f"cat:{category}")
             await show_page(query, context)
             await send_subscription_prompt(query, category, "upcoming")
         else:
             await query.edit_message_text(f"😕 Ближайших событий в категории {display_name} не найдено.", parse_mode="Markdown")
     elif date_type == "weekend":
-        events, saturday, sunday = get_weekend_events(category=category)
-        set_pagination(context, events, f"<b>{display_name} на выходные ({saturday.strftime('%d.%m')}–{sunday.strftime('%d.%m')}):</b>",
+        snapshot, meta = await load_listing("weekend", category)
+        saturday, sunday = meta["saturday"], meta["sunday"]
+        set_pagination_snapshot(context, snapshot, f"<b>{display_name} на выходные ({saturday.strftime('%d.%m')}–{sunday.strftime('%d.%m')}):</b>",
                        share_query=f"cat:{category} date_from:{saturday.strftime('%Y-%m-%d')} date_to:{sunday.strftime('%Y-%m-%d')}")
         await show_page(query, context)
         await send_subscription_prompt(query, category, "weekend")
@@ -4245,30 +4432,31 @@ async def handle_simple_buttons(query, context: ContextTypes.DEFAULT_TYPE, data:
     chat_id = query.message.chat_id
     user = query.from_user
     if data == "today":
-        log_user_action(user.id, user.username, user.first_name, "btn_today")
+        await run_db(log_user_action, user.id, user.username, user.first_name, "btn_today")
         today = datetime.now(MINSK_TZ)
-        events = get_events_by_date_and_category(today)
-        set_pagination(context, events, f"<b>События на {today.strftime('%d.%m.%Y')}:</b>",
+        snapshot, _ = await load_listing("today")
+        set_pagination_snapshot(context, snapshot, f"<b>События на {today.strftime('%d.%m.%Y')}:</b>",
                        share_query=f"date:{today.strftime('%Y-%m-%d')}")
         await show_page(query, context)
     elif data == "tomorrow":
-        log_user_action(user.id, user.username, user.first_name, "btn_tomorrow")
+        await run_db(log_user_action, user.id, user.username, user.first_name, "btn_tomorrow")
         tomorrow = datetime.now(MINSK_TZ) + timedelta(days=1)
-        events = get_events_by_date_and_category(tomorrow)
-        set_pagination(context, events, f"<b>События на {tomorrow.strftime('%d.%m.%Y')}:</b>",
+        snapshot, _ = await load_listing("tomorrow")
+        set_pagination_snapshot(context, snapshot, f"<b>События на {tomorrow.strftime('%d.%m.%Y')}:</b>",
                        share_query=f"date:{tomorrow.strftime('%Y-%m-%d')}")
         await show_page(query, context)
     elif data == "weekend":
-        log_user_action(user.id, user.username, user.first_name, "btn_weekend")
-        events, saturday, sunday = get_weekend_events()
-        set_pagination(context, events, f"<b>Выходные ({saturday.strftime('%d.%m')}–{sunday.strftime('%d.%m')}):</b>",
+        await run_db(log_user_action, user.id, user.username, user.first_name, "btn_weekend")
+        snapshot, meta = await load_listing("weekend")
+        saturday, sunday = meta["saturday"], meta["sunday"]
+        set_pagination_snapshot(context, snapshot, f"<b>Выходные ({saturday.strftime('%d.%m')}–{sunday.strftime('%d.%m')}):</b>",
                        share_query=f"date_from:{saturday.strftime('%Y-%m-%d')} date_to:{sunday.strftime('%Y-%m-%d')}")
         await show_page(query, context)
     elif data == "soon":
-        log_user_action(user.id, user.username, user.first_name, "btn_upcoming")
-        events = get_upcoming_events(limit=100)
-        if events:
-            set_pagination(context, events, "⏰ <b>Ближайшие события:</b>")
+        await run_db(log_user_action, user.id, user.username, user.first_name, "btn_upcoming")
+        snapshot, _ = await load_listing("upcoming")
+        if snapshot.total:
+            set_pagination_snapshot(context, snapshot, "⏰ <b>Ближайшие события:</b>")
             await show_page(query, context)
         else:
             await query.edit_message_text("😕 Ближайших событий не найдено.", parse_mode="Markdown")
@@ -4280,7 +4468,7 @@ async def handle_simple_buttons(query, context: ContextTypes.DEFAULT_TYPE, data:
         await show_main_menu(chat_id, context, query.message.reply_text)
     elif data.startswith("cat_"):
         category = data.replace("cat_", "")
-        log_user_action(user.id, user.username, user.first_name, "open_category", category)
+        await run_db(log_user_action, user.id, user.username, user.first_name, "open_category", category)
         await show_date_options(query, category)
 
 
@@ -4294,10 +4482,10 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await query.answer()
             cmd = data[4:]
             if cmd == "stats":
-                stats = get_stats_data(exclude_admin=False)
+                stats = await run_db(get_stats_data, exclude_admin=False)
                 await query.message.reply_text(_format_stats(stats, "📊 СТАТИСТИКА (все)"), parse_mode="HTML")
             elif cmd == "ustats":
-                stats = get_stats_data(exclude_admin=True)
+                stats = await run_db(get_stats_data, exclude_admin=True)
                 await query.message.reply_text(_format_stats(stats, "📊 СТАТИСТИКА ПОЛЬЗОВАТЕЛЕЙ"), parse_mode="HTML")
             elif cmd == "update":
                 await update_parsers(query, context)  # передаем query, а не update
@@ -4319,9 +4507,7 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 await post_to_channel(context.bot, "weekend")
                 await query.message.reply_text("✅ Готово!")
             elif cmd == "dedup":
-                with get_db_connection() as conn:
-                    conn.row_factory = sqlite3.Row
-                    groups = _find_duplicates(conn)
+                groups = await run_db(find_duplicate_groups)
                 total_groups = len(groups)
                 total_delete = sum(len(g['delete_ids']) for g in groups)
                 if total_groups == 0:
@@ -4342,16 +4528,8 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     ]])
                     await query.message.reply_text('\n'.join(lines), parse_mode="HTML", reply_markup=confirm_kb)
             elif cmd == "dedup_confirm":
-                with get_db_connection() as conn:
-                    conn.row_factory = sqlite3.Row
-                    groups = _find_duplicates(conn)
+                groups = await run_db(delete_duplicates)
                 total_delete = sum(len(g['delete_ids']) for g in groups)
-                all_delete_ids = [i for g in groups for i in g['delete_ids']]
-                if all_delete_ids:
-                    with get_db_connection() as conn:
-                        placeholders = ','.join('?' * len(all_delete_ids))
-                        conn.execute(f"DELETE FROM events WHERE id IN ({placeholders})", all_delete_ids)
-                        conn.commit()
                 await query.message.reply_text(
                     f"🧹 <b>Удалено {total_delete} дубликатов</b> из {len(groups)} групп. База очищена.",
                     parse_mode="HTML"
@@ -4374,11 +4552,7 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 except ValueError:
                     await query.message.reply_text("❌ Ошибка разбора диапазона.")
                     return
-                with get_db_connection() as conn:
-                    deleted = conn.execute(
-                        "DELETE FROM events WHERE id BETWEEN ? AND ?", (id_from, id_to)
-                    ).rowcount
-                    conn.commit()
+                deleted = await run_db(delete_events_range, id_from, id_to)
                 await query.message.reply_text(
                     f"🗑 <b>Удалено {deleted} событий</b> (id {id_from}–{id_to}).",
                     parse_mode="HTML"
@@ -4396,13 +4570,10 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             elif cmd == "pending":
                 await show_pending_list(query, context)
             elif cmd == "approve_all":
-                with get_db_connection() as conn:
-                    ids = [r["id"] for r in conn.execute(
-                        "SELECT id FROM pending_events WHERE status IN ('pending','edited')"
-                    ).fetchall()]
+                ids = [r["id"] for r in await run_db(get_pending_list)]
                 cnt = 0
                 for pid in ids:
-                    ok, row_data = approve_pending_event(pid)
+                    ok, row_data = await run_db(approve_pending_event, pid)
                     if ok:
                         cnt += 1
                         if row_data:
@@ -4431,12 +4602,9 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 await query.message.reply_text(f"✅ Одобрено событий: <b>{cnt}</b>", parse_mode="HTML")
                 await show_pending_list(query, context)
             elif cmd == "reject_all":
-                with get_db_connection() as conn:
-                    rows = conn.execute(
-                        "SELECT id, user_id, title FROM pending_events WHERE status IN ('pending','edited')"
-                    ).fetchall()
+                rows = await run_db(get_pending_list)
                 for r in rows:
-                    reject_pending_event(r["id"])
+                    await run_db(reject_pending_event, r["id"])
                     try:
                         await context.bot.send_message(
                             chat_id=r["user_id"],
@@ -4516,7 +4684,8 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 return
 
             # ── Проверка дубликата ────────────────────────────────
-            dup = check_duplicate_event(
+            dup = await run_db(
+                check_duplicate_event,
                 title=data_form.get("title", ""),
                 event_date=data_form.get("event_date", ""),
                 place=data_form.get("place", ""),
@@ -4531,12 +4700,12 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     f"Если вы считаете, что это ошибка — свяжитесь с @i354444",
                     parse_mode="HTML"
                 )
-                log_user_action(user.id, user.username, user.first_name, "submit_duplicate",
-                                data_form.get("title"))
+                await run_db(log_user_action, user.id, user.username, user.first_name, "submit_duplicate",
+                             data_form.get("title"))
                 return
             # ─────────────────────────────────────────────────────
 
-            pending_id = save_pending_event(user.id, user.username, user.first_name, data_form)
+            pending_id = await run_db(save_pending_event, user.id, user.username, user.first_name, data_form)
             for k in ["in_submit", "submit", "submit_field"]:
                 context.user_data.pop(k, None)
             await query.answer()
@@ -4544,7 +4713,8 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 "✅ <b>Событие отправлено на модерацию!</b>\n\nМы рассмотрим его в ближайшее время.",
                 parse_mode="HTML"
             )
-            log_user_action(user.id, user.username, user.first_name, "submit_event_sent", data_form.get("title"))
+            await run_db(log_user_action, user.id, user.username, user.first_name, "submit_event_sent",
+                         data_form.get("title"))
             preview = format_pending_preview(data_form, user)
             if data_form.get("is_kids"):
                 preview += "\n\n🧸 <b>Отмечено: событие для детей</b>"
@@ -4580,9 +4750,8 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 return
             pending_id = int(data.split("_")[-1])
             # Сохраняем title до approve (статус изменится)
-            with get_db_connection() as conn:
-                _row = conn.execute("SELECT user_id, title FROM pending_events WHERE id=?", (pending_id,)).fetchone()
-            ok, row_data = approve_pending_event(pending_id)
+            _row = await run_db(get_pending_event, pending_id)
+            ok, row_data = await run_db(approve_pending_event, pending_id)
             if ok:
                 await query.answer("✅ Одобрено!")
                 if _row:
@@ -4627,9 +4796,8 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 await query.answer("⛔ Нет доступа", show_alert=True)
                 return
             pending_id = int(data.split("_")[-1])
-            with get_db_connection() as conn:
-                _row = conn.execute("SELECT user_id, title FROM pending_events WHERE id=?", (pending_id,)).fetchone()
-            reject_pending_event(pending_id)
+            _row = await run_db(get_pending_event, pending_id)
+            await run_db(reject_pending_event, pending_id)
             await query.answer("❌ Отклонено")
             if _row:
                 try:
@@ -4664,7 +4832,7 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 await query.answer("⛔ Нет доступа", show_alert=True)
                 return
             pending_id = int(data.split("_")[-1])
-            event = get_pending_event(pending_id)
+            event = await run_db(get_pending_event, pending_id)
             if not event:
                 await query.answer("Событие не найдено", show_alert=True)
                 return
@@ -4712,7 +4880,7 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 await query.answer("Нет данных", show_alert=True)
                 return
             clean = {k: v for k, v in edit_data.items() if k != "_pending_id"}
-            update_pending_event(pending_id, clean)
+            await run_db(update_pending_event, pending_id, clean)
             await query.answer("📤 Отправлено")
             preview = format_pending_preview(clean)
             try:
@@ -4741,7 +4909,7 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         if data.startswith("user_accept_edit_"):
             pending_id = int(data.split("_")[-1])
-            ok, row_data = approve_pending_event(pending_id)
+            ok, row_data = await run_db(approve_pending_event, pending_id)
             await query.answer()
             if ok:
                 await query.edit_message_text(
@@ -4773,7 +4941,7 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         if data.startswith("user_reject_edit_"):
             pending_id = int(data.split("_")[-1])
-            reject_pending_event(pending_id)
+            await run_db(reject_pending_event, pending_id)
             await query.answer()
             await query.edit_message_text(
                 query.message.text + "\n\n❌ <b>Вы отклонили изменения. Событие не добавлено.</b>",
@@ -4810,7 +4978,7 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         if data == "show_submit":
             user = query.from_user
-            log_user_action(user.id, user.username, user.first_name, "submit_event_start")
+            await run_db(log_user_action, user.id, user.username, user.first_name, "submit_event_start")
             await start_submit(query, context)
             return
 
@@ -4821,14 +4989,14 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if data == "show_batch_template":
             await query.answer()
             user = query.from_user
-            log_user_action(user.id, user.username, user.first_name, "batch_template")
+            await run_db(log_user_action, user.id, user.username, user.first_name, "batch_template")
             await send_batch_template(query.message)
             return
 
         if data == "show_donate":
             await query.answer()
             user = query.from_user
-            log_user_action(user.id, user.username, user.first_name, "donate_menu")
+            await run_db(log_user_action, user.id, user.username, user.first_name, "donate_menu")
             await query.message.reply_text(DONATE_TEXT, reply_markup=InlineKeyboardMarkup(_build_donate_keyboard()), parse_mode=ParseMode.MARKDOWN)
             return
         if data.startswith("donate_"):
@@ -4858,8 +5026,8 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if data.startswith("sub_"):
             _, category, date_type = data.split("_", 2)
             user = query.from_user
-            add_subscription(user.id, category, date_type)
-            log_user_action(user.id, user.username, user.first_name, "subscribe", f"{category}_{date_type}")
+            await run_db(add_subscription, user.id, category, date_type)
+            await run_db(log_user_action, user.id, user.username, user.first_name, "subscribe", f"{category}_{date_type}")
             try:
                 await query.edit_message_reply_markup(reply_markup=InlineKeyboardMarkup([[
                     InlineKeyboardButton("🔕 Отписаться", callback_data=f"unsub_{category}_{date_type}")
@@ -4871,14 +5039,14 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             user = query.from_user
             if data.startswith("fs:"):
                 token = data.split(":", 1)[1]
-                flash_query = get_flash_subscription_request(token, user.id)
+                flash_query = await run_db(get_flash_subscription_request, token, user.id)
                 if not flash_query:
                     await query.answer("Запрос устарел. Повторите поиск.", show_alert=True)
                     return
             else:
                 flash_query = data[len("flash_sub_"):]
-            added = add_flash_subscription(user.id, flash_query)
-            log_user_action(user.id, user.username, user.first_name, "flash_subscribe", flash_query)
+            added = await run_db(add_flash_subscription, user.id, flash_query)
+            await run_db(log_user_action, user.id, user.username, user.first_name, "flash_subscribe", flash_query)
             if added:
                 await query.answer("⚡ Флеш-подписка оформлена!", show_alert=False)
                 try:
@@ -4893,8 +5061,8 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if data.startswith("ff:") or data.startswith("flash_found_"):
             user = query.from_user
             flash_id = int(data.split(":", 1)[1]) if data.startswith("ff:") else int(data[len("flash_found_"):])
-            remove_flash_subscription(flash_id, user.id)
-            log_user_action(user.id, user.username, user.first_name, "flash_found", str(flash_id))
+            await run_db(remove_flash_subscription, flash_id, user.id)
+            await run_db(log_user_action, user.id, user.username, user.first_name, "flash_found", str(flash_id))
             await query.answer("🎉 Отлично! Подписка удалена.", show_alert=False)
             try:
                 await query.edit_message_reply_markup(reply_markup=None)
@@ -4910,8 +5078,9 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             else:
                 flash_id = int(data[len("flash_continue_"):])
                 event_ids = []
-            ignored = ignore_flash_matches(flash_id, user.id, event_ids)
-            log_user_action(user.id, user.username, user.first_name, "flash_continue", f"{flash_id}:{','.join(map(str, event_ids))}")
+            ignored = await run_db(ignore_flash_matches, flash_id, user.id, event_ids)
+            await run_db(log_user_action, user.id, user.username, user.first_name, "flash_continue",
+                         f"{flash_id}:{','.join(map(str, event_ids))}")
             suffix = f" Исключили {ignored} найденн." if ignored else ""
             await query.answer(f"🔄 Продолжаем поиск!{suffix}", show_alert=False)
             try:
@@ -4922,16 +5091,16 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if data.startswith("flash_unsub_"):
             user = query.from_user
             flash_id = int(data[len("flash_unsub_"):])
-            remove_flash_subscription(flash_id, user.id)
-            log_user_action(user.id, user.username, user.first_name, "flash_unsubscribe", str(flash_id))
+            await run_db(remove_flash_subscription, flash_id, user.id)
+            await run_db(log_user_action, user.id, user.username, user.first_name, "flash_unsubscribe", str(flash_id))
             await query.answer("⚡ Флеш-подписка отменена", show_alert=False)
             await show_subscriptions_query(query, context)
             return
         if data.startswith("unsub_"):
             _, category, date_type = data.split("_", 2)
             user = query.from_user
-            remove_subscription(user.id, category, date_type)
-            log_user_action(user.id, user.username, user.first_name, "unsubscribe", f"{category}_{date_type}")
+            await run_db(remove_subscription, user.id, category, date_type)
+            await run_db(log_user_action, user.id, user.username, user.first_name, "unsubscribe", f"{category}_{date_type}")
             await query.answer("Подписка отменена 🔕", show_alert=False)
             # Если открыт экран /subs — обновляем список
             msg_text = (query.message.text or "")
@@ -4959,8 +5128,9 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 day = int(parts[4])
                 date_obj = datetime(year, month, day, tzinfo=MINSK_TZ)
                 user = query.from_user
-                log_user_action(user.id, user.username, user.first_name, "calendar_day", f"{day:02d}.{month:02d}.{year}")
-                events = get_events_by_date_and_category(date_obj)
+                await run_db(log_user_action, user.id, user.username, user.first_name, "calendar_day",
+                             f"{day:02d}.{month:02d}.{year}")
+                events = await run_db(get_events_by_date_and_category, date_obj)
                 if events:
                     set_pagination(context, events, f"📅 События на {day:02d}.{month:02d}.{year}:")
                     await show_page(query, context)
@@ -5173,6 +5343,39 @@ def _read_batch_file(data: bytes, filename: str) -> tuple[list[dict], str]:
         return [], f"Ошибка чтения файла: {e}"
 
 
+def insert_batch_pending_events(user_id: int, username: str | None, first_name: str | None,
+                                items: list[dict], created_at: str) -> tuple[list[int], list[str]]:
+    """Пакетная загрузка в pending_events: проверка дубликатов и вставка по строке.
+    Возвращает id добавленных заявок и причины пропуска."""
+    pending_ids, errors = [], []
+    for item in items:
+        label = f"Строка {item['row_num']} «{item['title'][:25]}»"
+        if check_duplicate_event(item["title"], item["event_date"], item["place"]):
+            errors.append(f"{label}: дубликат (уже есть в афише/очереди)")
+            continue
+        try:
+            with get_db_write_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    INSERT INTO pending_events
+                        (user_id, username, first_name, title, event_date, show_time, end_time,
+                         place, address, category, details, description, price, source_url,
+                         is_promo, status, created_at)
+                    VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,'pending',?)
+                """, (
+                    user_id, username, first_name,
+                    item["title"], item["event_date"], item["show_time"], item["end_time"],
+                    item["place"], item["address"], item["category"],
+                    item["details"], item["description"], item["price"], item["source_url"],
+                    item["is_promo"], created_at,
+                ))
+                conn.commit()
+                pending_ids.append(cursor.lastrowid)
+        except Exception as e:
+            errors.append(f"{label}: ошибка БД — {e}")
+    return pending_ids, errors
+
+
 async def handle_batch_file(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Хендлер документа — принимает xlsx/csv с событиями, парсит, отправляет на модерацию."""
     import html as _html
@@ -5183,7 +5386,7 @@ async def handle_batch_file(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not (fname.lower().endswith(".xlsx") or fname.lower().endswith(".xls") or fname.lower().endswith(".csv")):
         return
 
-    log_user_action(user.id, user.username, user.first_name, "batch_upload", fname)
+    await run_db(log_user_action, user.id, user.username, user.first_name, "batch_upload", fname)
 
     if doc.file_size and doc.file_size > 5 * 1024 * 1024:
         await update.message.reply_text("\u274c Файл слишком большой. Максимум 5 МБ.")
@@ -5215,10 +5418,9 @@ async def handle_batch_file(update: Update, context: ContextTypes.DEFAULT_TYPE):
     def _norm_key(k):
         return (k or "").strip().lower().replace(" ", "_")
 
-    ok_count = 0
     skip_count = 0
     errors = []
-    pending_ids = []
+    items = []
     now_str = datetime.now(MINSK_TZ).strftime("%Y-%m-%d %H:%M:%S")
 
     for row_num, raw_row in enumerate(rows, start=2):
@@ -5258,34 +5460,20 @@ async def handle_batch_file(update: Update, context: ContextTypes.DEFAULT_TYPE):
         promo_raw = (row.get("is_promo", "") or "").strip().lower()
         is_promo = 1 if promo_raw in ("1", "да", "yes", "true", "+") else 0
 
-        dup = check_duplicate_event(title, event_date, place)
-        if dup:
-            errors.append(f"Строка {row_num} «{title[:25]}»: дубликат (уже есть в афише/очереди)")
-            skip_count += 1
-            continue
+        items.append({
+            "row_num": row_num,
+            "title": title, "event_date": event_date, "show_time": show_time, "end_time": end_time,
+            "place": place, "address": address, "category": category,
+            "details": details, "description": description, "price": price,
+            "source_url": source_url, "is_promo": is_promo,
+        })
 
-        try:
-            with get_db_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    INSERT INTO pending_events
-                        (user_id, username, first_name, title, event_date, show_time, end_time,
-                         place, address, category, details, description, price, source_url,
-                         is_promo, status, created_at)
-                    VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,'pending',?)
-                """, (
-                    user.id, user.username, user.first_name,
-                    title, event_date, show_time, end_time,
-                    place, address, category,
-                    details, description, price, source_url,
-                    is_promo, now_str,
-                ))
-                conn.commit()
-                pending_ids.append(cursor.lastrowid)
-                ok_count += 1
-        except Exception as e:
-            errors.append(f"Строка {row_num} «{title[:25]}»: ошибка БД — {e}")
-            skip_count += 1
+    pending_ids, db_errors = await run_db(
+        insert_batch_pending_events, user.id, user.username, user.first_name, items, now_str
+    )
+    ok_count = len(pending_ids)
+    skip_count += len(db_errors)
+    errors.extend(db_errors)
 
     if ok_count > 0:
         reply = (
@@ -5328,7 +5516,7 @@ async def handle_batch_file(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def batch_template_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Команда /template — отправляет шаблон xlsx для пакетной загрузки."""
     user = update.effective_user
-    log_user_action(user.id, user.username, user.first_name, "batch_template")
+    await run_db(log_user_action, user.id, user.username, user.first_name, "batch_template")
     await send_batch_template(update.message)
 
 
@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+Рассылки бота: дайджест подписчикам, флеш-уведомления, промо-анонсы.
+
+Раньше каждая рассылка слала сообщения строго по одному с asyncio.sleep(0.1)
+и своей обработкой RetryAfter — дайджест на N пользователей шёл не меньше
+N/10 секунд, а падение процесса посреди рассылки теряло остаток. Теперь:
+
+  - сообщения кампании сначала пишутся в broadcast_outbox (SQLite, одна
+    транзакция), потом доставляются; строка помечается sent / failed сразу
+    после отправки, до следующего сообщения воркера — после падения
+    повторно уйдёт не больше BROADCAST_CONCURRENCY сообщений.
+    После перезапуска resume() дошлёт pending-строки свежих кампаний
+    (не старше BROADCAST_RESUME_HOURS), старые — помечаются failed;
+  - общий token bucket на бота — BROADCAST_RATE сообщений в секунду
+    (лимит Telegram — около 30), параллельно — до BROADCAST_CONCURRENCY
+    чатов. Сообщения одного чата идут по порядку, не чаще
+    BROADCAST_CHAT_INTERVAL секунд;
+  - RetryAfter (429) приостанавливает весь bucket на retry_after и повторяет
+    сообщение; сетевые ошибки — повтор с backoff, не больше
+    BROADCAST_MAX_ATTEMPTS попыток. Forbidden и BadRequest не повторяются.
+    После Forbidden (бот заблокирован) остальные сообщения этого чата в
+    кампании пропускаются; BadRequest — ошибка самого сообщения, следующие
+    сообщения чата отправляются;
+  - метрики кампании — BroadcastStats (в лог и в /stats).
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from telegram import InlineKeyboardMarkup
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
+
+from config import MINSK_TZ
+from db_pool import read_connection, run_db, write_connection
+
+logger = logging.getLogger(__name__)
+
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "25"))
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", "16"))
+BROADCAST_CHAT_INTERVAL = float(os.getenv("BROADCAST_CHAT_INTERVAL", "1.0"))
+BROADCAST_MAX_ATTEMPTS = int(os.getenv("BROADCAST_MAX_ATTEMPTS", "5"))
+BROADCAST_RESUME_HOURS = int(os.getenv("BROADCAST_RESUME_HOURS", "6"))
+BROADCAST_KEEP_DAYS = 7
+
+OUTBOX_TABLE = "broadcast_outbox"
+
+_OUTBOX_DDL = [
+    f"""
+    CREATE TABLE IF NOT EXISTS {OUTBOX_TABLE} (
+        id         INTEGER PRIMARY KEY AUTOINCREMENT,
+        campaign   TEXT NOT NULL,
+        item_key   TEXT NOT NULL,
+        chat_id    INTEGER NOT NULL,
+        payload    TEXT NOT NULL,           -- JSON параметров send_message
+        status     TEXT NOT NULL DEFAULT 'pending',   -- pending | sent | failed
+        attempts   INTEGER NOT NULL DEFAULT 0,
+        last_error TEXT DEFAULT '',
+        created_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL,
+        UNIQUE (campaign, item_key)
+    )
+    """,
+    f"CREATE INDEX IF NOT EXISTS idx_outbox_pending ON {OUTBOX_TABLE}(campaign) WHERE status = 'pending'",
+    f"CREATE INDEX IF NOT EXISTS idx_outbox_created ON {OUTBOX_TABLE}(created_at)",
+]
+
+
+def _now() -> str:
+    return datetime.now(MINSK_TZ).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def ensure_outbox(conn):
+    """Создаёт broadcast_outbox. Idempotent."""
+    for sql in _OUTBOX_DDL:
+        conn.execute(sql)
+    conn.commit()
+
+
+def new_campaign(kind: str) -> str:
+    """Уникальное имя кампании: digest:today:20260101-080000-1a2b3c."""
+    return f"{kind}:{datetime.now(MINSK_TZ).strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+
+@dataclass
+class OutboxMessage:
+    chat_id: int
+    text: str
+    key: str = ""                   # уникален в кампании; '' — chat_id
+    parse_mode: Optional[str] = "HTML"
+    disable_web_page_preview: bool = True
+    reply_markup: Optional[InlineKeyboardMarkup] = None
+
+    def payload(self) -> str:
+        return json.dumps({
+            "text": self.text,
+            "parse_mode": self.parse_mode,
+            "disable_web_page_preview": self.disable_web_page_preview,
+            "reply_markup": self.reply_markup.to_dict() if self.reply_markup else None,
+        }, ensure_ascii=False)
+
+
+def _send_kwargs(payload: str, bot) -> dict:
+    data = json.loads(payload)
+    markup = data.pop("reply_markup", None)
+    if markup:
+        data["reply_markup"] = InlineKeyboardMarkup.de_json(markup, bot)
+    return data
+
+
+def enqueue(conn, campaign: str, messages: Iterable[OutboxMessage]) -> int:
+    """Пишет сообщения кампании в outbox (в транзакции conn). Возвращает число новых строк."""
+    now = _now()
+    before = conn.total_changes
+    conn.executemany(
+        f"""
+        INSERT OR IGNORE INTO {OUTBOX_TABLE}
+            (campaign, item_key, chat_id, payload, created_at, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        [(campaign, m.key or str(m.chat_id), m.chat_id, m.payload(), now, now) for m in messages],
+    )
+    added = conn.total_changes - before
+    cutoff = (datetime.now(MINSK_TZ) - timedelta(days=BROADCAST_KEEP_DAYS)).strftime("%Y-%m-%d %H:%M:%S")
+    conn.execute(f"DELETE FROM {OUTBOX_TABLE} WHERE created_at < ? AND status != 'pending'", (cutoff,))
+    return added
+
+
+def _enqueue_campaign(campaign: str, messages: list[OutboxMessage]) -> int:
+    with write_connection() as conn:
+        return enqueue(conn, campaign, messages)
+
+
+def _pending_rows(campaign: str) -> list:
+    with read_connection() as conn:
+        return conn.execute(
+            f"""
+            SELECT id, item_key, chat_id, payload, attempts
+            FROM {OUTBOX_TABLE}
+            WHERE campaign = ? AND status = 'pending'
+            ORDER BY id
+            """,
+            (campaign,),
+        ).fetchall()
+
+
+def _mark(results: list[tuple[str, int, str, int]]):
+    """results: (status, attempts, error, id)."""
+    now = _now()
+    with write_connection() as conn:
+        conn.executemany(
+            f"UPDATE {OUTBOX_TABLE} SET status = ?, attempts = ?, last_error = ?, updated_at = ? WHERE id = ?",
+            [(status, attempts, error[:300], now, row_id) for status, attempts, error, row_id in results],
+        )
+
+
+def _resumable_campaigns() -> list[str]:
+    """Кампании с недоставленными сообщениями; слишком старые pending — в failed."""
+    cutoff = (datetime.now(MINSK_TZ) - timedelta(hours=BROADCAST_RESUME_HOURS)).strftime("%Y-%m-%d %H:%M:%S")
+    with write_connection() as conn:
+        conn.execute(
+            f"""
+            UPDATE {OUTBOX_TABLE} SET status = 'failed', last_error = 'expired', updated_at = ?
+            WHERE status = 'pending' AND created_at < ?
+            """,
+            (_now(), cutoff),
+        )
+        rows = conn.execute(
+            f"""
+            SELECT campaign, MIN(id) AS first_id FROM {OUTBOX_TABLE}
+            WHERE status = 'pending' GROUP BY campaign ORDER BY first_id
+            """
+        ).fetchall()
+    return [row["campaign"] for row in rows]
+
+
+def outbox_summary(conn, hours: int = 24) -> dict:
+    """Сообщения outbox за последние hours часов по статусам."""
+    since = (datetime.now(MINSK_TZ) - timedelta(hours=hours)).strftime("%Y-%m-%d %H:%M:%S")
+    rows = conn.execute(
+        f"SELECT status, COUNT(*) AS cnt FROM {OUTBOX_TABLE} WHERE created_at >= ? GROUP BY status",
+        (since,),
+    ).fetchall()
+    summary = {"pending": 0, "sent": 0, "failed": 0}
+    summary.update({row["status"]: row["cnt"] for row in rows})
+    return summary
+
+
+def _seconds(value) -> float:
+    # RetryAfter.retry_after — int в PTB 20, timedelta в новых версиях
+    return value.total_seconds() if hasattr(value, "total_seconds") else float(value)
+
+
+class TokenBucket:
+    """rate токенов в секунду, запас — capacity; pause() останавливает выдачу целиком."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = max(rate, 0.1)
+        self.capacity = capacity if capacity is not None else max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    self._updated = time.monotonic()
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+@dataclass
+class BroadcastStats:
+    campaign: str
+    total: int = 0
+    sent: int = 0
+    failed: int = 0
+    retries: int = 0
+    retry_after: float = 0.0        # суммарная пауза по RetryAfter, с
+    elapsed: float = 0.0
+    finished_at: str = ""
+    sent_keys: list[str] = field(default_factory=list)
+
+    @property
+    def rate(self) -> float:
+        return self.sent / self.elapsed if self.elapsed else 0.0
+
+    def summary(self) -> str:
+        return (f"{self.campaign}: {self.sent}/{self.total} за {self.elapsed:.1f} с "
+                f"({self.rate:.1f}/с), ошибок {self.failed}, повторов {self.retries}")
+
+
+class Broadcaster:
+    def __init__(self, rate: float = BROADCAST_RATE, concurrency: int = BROADCAST_CONCURRENCY,
+                 chat_interval: float = BROADCAST_CHAT_INTERVAL, max_attempts: int = BROADCAST_MAX_ATTEMPTS):
+        self.bucket = TokenBucket(rate)
+        self.concurrency = max(1, concurrency)
+        self.chat_interval = chat_interval
+        self.max_attempts = max(1, max_attempts)
+        self.history: deque[BroadcastStats] = deque(maxlen=20)
+        self._chat_next: dict[int, float] = {}
+
+    async def send(self, bot, campaign: str, messages: list[OutboxMessage]) -> BroadcastStats:
+        """Записывает кампанию в outbox и доставляет её."""
+        await run_db(_enqueue_campaign, campaign, messages)
+        return await self.deliver(bot, campaign)
+
+    async def resume(self, bot) -> list[BroadcastStats]:
+        """Досылает кампании, прерванные перезапуском."""
+        campaigns = await run_db(_resumable_campaigns)
+        results = []
+        for campaign in campaigns:
+            logger.info(f"📨 Досылаем рассылку {campaign}")
+            results.append(await self.deliver(bot, campaign))
+        return results
+
+    async def deliver(self, bot, campaign: str) -> BroadcastStats:
+        """Доставляет pending-сообщения кампании из outbox."""
+        rows = await run_db(_pending_rows, campaign)
+        stats = BroadcastStats(campaign=campaign, total=len(rows))
+        started = time.monotonic()
+
+        by_chat: dict[int, list] = {}
+        for row in rows:
+            by_chat.setdefault(row["chat_id"], []).append(row)
+        chats: asyncio.Queue = asyncio.Queue()
+        for chat_rows in by_chat.values():
+            chats.put_nowait(chat_rows)
+
+        def record(row, status: str, attempts: int, error: str) -> tuple[str, int, str, int]:
+            if status == "sent":
+                stats.sent += 1
+                stats.sent_keys.append(row["item_key"])
+            else:
+                stats.failed += 1
+                logger.warning(f"Рассылка {campaign} → {row['chat_id']}: {error}")
+            return status, attempts, error, row["id"]
+
+        async def worker():
+            # Чат берёт одно сообщение и встаёт в конец очереди: пока он ждёт
+            # BROADCAST_CHAT_INTERVAL, воркеры шлют в другие чаты
+            while True:
+                try:
+                    chat_rows = chats.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                row, rest = chat_rows[0], chat_rows[1:]
+                status, attempts, error = await self._send_one(bot, row, stats)
+                marks = [record(row, status, attempts, error)]
+                if status == "failed" and error.startswith("Forbidden"):
+                    # Бот заблокирован — остальные сообщения чата не дойдут
+                    marks += [record(skipped, "failed", skipped["attempts"], error) for skipped in rest]
+                    rest = []
+                # Статус — в outbox до следующего сообщения: после падения
+                # отправленное не уйдёт повторно
+                await run_db(_mark, marks)
+                if rest:
+                    chats.put_nowait(rest)
+
+        await asyncio.gather(*(worker() for _ in range(min(self.concurrency, len(by_chat)))))
+
+        stats.elapsed = time.monotonic() - started
+        stats.finished_at = _now()
+        self.history.append(stats)
+        if stats.total:
+            logger.info(f"📨 {stats.summary()}")
+        return stats
+
+    async def _wait_chat(self, chat_id: int):
+        now = time.monotonic()
+        ready_at = self._chat_next.get(chat_id, 0.0)
+        if ready_at > now:
+            await asyncio.sleep(ready_at - now)
+        self._chat_next[chat_id] = max(now, ready_at) + self.chat_interval
+        if len(self._chat_next) > 50_000:
+            self._chat_next = {c: t for c, t in self._chat_next.items() if t > now}
+
+    async def _send_one(self, bot, row, stats: BroadcastStats) -> tuple[str, int, str]:
+        """(status, attempts, error) одного сообщения с повторами."""
+        kwargs = _send_kwargs(row["payload"], bot)
+        attempts = row["attempts"]
+        error = ""
+        while attempts < self.max_attempts:
+            await self._wait_chat(row["chat_id"])
+            await self.bucket.acquire()
+            attempts += 1
+            try:
+                await bot.send_message(chat_id=row["chat_id"], **kwargs)
+                return "sent", attempts, ""
+            except RetryAfter as e:
+                delay = _seconds(e.retry_after) + 1
+                stats.retries += 1
+                stats.retry_after += delay
+                error = f"RetryAfter {delay:.0f}s"
+                logger.warning(f"Рассылка: RetryAfter {delay:.0f} с, пауза всей рассылки")
+                self.bucket.pause(delay)
+            except Forbidden as e:
+                return "failed", attempts, f"Forbidden: {e}"
+            except BadRequest as e:
+                return "failed", attempts, f"BadRequest: {e}"
+            except NetworkError as e:
+                stats.retries += 1
+                error = f"{type(e).__name__}: {e}"
+                await asyncio.sleep(min(30, 2 ** attempts))
+            except Exception as e:
+                return "failed", attempts, f"{type(e).__name__}: {e}"
+        return "failed", attempts, error or "max attempts"
+
+
+_broadcaster: Optional[Broadcaster] = None
+_broadcaster_lock = threading.Lock()
+
+
+def get_broadcaster() -> Broadcaster:
+    """Общий движок рассылок процесса бота (один bucket на токен бота)."""
+    global _broadcaster
+    with _broadcaster_lock:
+        if _broadcaster is None:
+            _broadcaster = Broadcaster()
+        return _broadcaster
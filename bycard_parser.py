@@ -12,16 +12,19 @@ import re
 import json
 import sqlite3
 import logging
-import time
 from datetime import datetime
 from typing import Optional
 
-import requests
 from bs4 import BeautifulSoup
+import lxml.html
+from event_fingerprints import load_dedup_index
+from event_upsert import bulk_connection, upsert_events
+from http_fetch import get_fetcher
 from normalizer import (
     normalize_place, normalize_title, is_future_date,
-    is_minsk_event, titles_are_similar,
+    is_minsk_event, DedupIndex,
 )
+from source_parser import BaseSourceParser, SourceResult
 
 # ── БД ───────────────────────────────────────────────────────────────────────
 DB_PATH = os.getenv("DB_PATH", "/data/events_final.db")
@@ -55,70 +58,90 @@ HEADERS = {
     "Accept-Language": "ru-RU,ru;q=0.9",
     "Accept": "text/html,application/xhtml+xml,*/*;q=0.8",
 }
-SESSION = requests.Session()
-SESSION.headers.update(HEADERS)
 
 
 # ── HTTP ──────────────────────────────────────────────────────────────────────
 
 def fetch_page(url: str, retries: int = 3) -> Optional[str]:
-    for attempt in range(retries):
-        try:
-            r = SESSION.get(url, timeout=30)
-            r.raise_for_status()
-            r.encoding = "utf-8"
-            if "hg-security=" in r.text and "<title>Verification</title>" in r.text:
-                m = re.search(r"hg-security=([^;\"']+)", r.text)
-                if m:
-                    SESSION.cookies.set("hg-security", m.group(1), domain="bycard.by", path="/")
-                    logger.info("  bycard verification cookie получен, повторяю запрос")
-                    r = SESSION.get(url, timeout=30)
-                    r.raise_for_status()
-                    r.encoding = "utf-8"
-            logger.info(f"  Загружено {url} ({len(r.text)} симв.)")
-            return r.text
-        except Exception as e:
-            logger.warning(f"  Попытка {attempt+1}/{retries}: {e}")
-            if attempt < retries - 1:
-                time.sleep(2 * (attempt + 1))
-    return None
+    # cookie hg-security (страница Verification) ставит http_fetch.hg_security_hook
+    return get_fetcher().get(url, headers=HEADERS, retries=retries)
 
 
 # ── NUXT декодер ──────────────────────────────────────────────────────────────
 
+# Скрипт страницы целиком: атрибуты и текст (как s.string у BeautifulSoup)
+_SCRIPT_RE = re.compile(r"<script\b([^>]*)>(.*?)</script\s*>", re.IGNORECASE | re.DOTALL)
+_SCRIPT_END_RE = re.compile(r"</script\s*>", re.IGNORECASE)
+_NUXT_PARAMS_RE = re.compile(r"\(function\(([^)]+)\)\{")
+_NUXT_TAIL_RE = re.compile(r"\)\);?\s*$")
+# Токены, на которых меняется разбор аргументов: строка целиком, скобка, запятая.
+# Всё остальное (числа, true/false, имена) regex проскакивает без Python-цикла.
+_NUXT_TOKEN_RE = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"?|[()\[\]{},]', re.DOTALL)
+
+
+def find_nuxt_script(html: str) -> str:
+    """Текст первого <script> с window.__NUXT__ ('' — не найден). Без разбора DOM."""
+    # Быстрый путь: от вхождения __NUXT__ к ближайшим <script ...> и </script>
+    pos = html.find("__NUXT__")
+    while pos >= 0:
+        open_at = html.rfind("<script", 0, pos)
+        body_at = html.find(">", open_at) + 1 if open_at >= 0 else 0
+        end_m = _SCRIPT_END_RE.search(html, pos)
+        if open_at >= 0 and 0 < body_at <= pos and end_m and "</script" not in html[body_at:pos].lower():
+            return html[body_at:end_m.start()]
+        pos = html.find("__NUXT__", pos + 1)
+    # <SCRIPT> в другом регистре и прочая экзотика — полный проход по скриптам
+    if "__NUXT__" not in html:
+        return ""
+    for m in _SCRIPT_RE.finditer(html):
+        if "__NUXT__" in m.group(2):
+            return m.group(2)
+    return ""
+
+
+def split_nuxt_args(vals_raw: str) -> list[str]:
+    """Аргументы вызова NUXT-функции верхнего уровня — исходный текст, без декодирования.
+
+    Один проход regex: запятая делит значения только вне строк и скобок.
+    """
+    vals = []
+    depth = 0
+    start = 0
+    for m in _NUXT_TOKEN_RE.finditer(vals_raw):
+        c = m.group()
+        if c == ",":
+            if depth == 0:
+                vals.append(vals_raw[start:m.start()].strip())
+                start = m.end()
+        elif c in "([{":
+            depth += 1
+        elif c in ")]}":
+            depth -= 1
+    if start < len(vals_raw):
+        vals.append(vals_raw[start:].strip())
+    return vals
+
+
+def decode_nuxt_script(script: str) -> dict:
+    """window.__NUXT__=(function(a,b,...){...}(v1,v2,...)) → {имя_переменной: исходный текст значения}.
+
+    Значения не декодируются — строку разбирает resolve(), и только для тех
+    переменных, которые действительно нужны.
+    """
+    params_m = _NUXT_PARAMS_RE.search(script)
+    if not params_m:
+        return {}
+    tail_m = _NUXT_TAIL_RE.search(script)
+    body_end = script.find("}(")
+    if not tail_m or body_end < 0 or body_end + 2 >= tail_m.start():
+        return {}
+    names = [n.strip() for n in params_m.group(1).split(",")]
+    return dict(zip(names, split_nuxt_args(script[body_end + 2:tail_m.start()])))
+
+
 def decode_nuxt(html: str) -> dict:
     """Декодирует window.__NUXT__ → маппинг {имя_переменной: значение}."""
-    soup = BeautifulSoup(html, "lxml")
-    for s in soup.find_all("script"):
-        t = s.string or ""
-        if "__NUXT__" not in t:
-            continue
-        params_m = re.search(r'\(function\(([^)]+)\)\{', t)
-        vals_m   = re.search(r'\}\((.+)\)\);?\s*$', t, re.DOTALL)
-        if not params_m or not vals_m:
-            continue
-
-        names    = [n.strip() for n in params_m.group(1).split(",")]
-        vals_raw = vals_m.group(1)
-        vals = []
-        depth = 0; in_str = False; cur = []; i = 0
-        while i < len(vals_raw):
-            c = vals_raw[i]
-            if c == '"' and (i == 0 or vals_raw[i-1] != "\\"):
-                in_str = not in_str; cur.append(c)
-            elif not in_str and c in "([{":
-                depth += 1; cur.append(c)
-            elif not in_str and c in ")]}":
-                depth -= 1; cur.append(c)
-            elif not in_str and c == "," and depth == 0:
-                vals.append("".join(cur).strip()); cur = []
-            else:
-                cur.append(c)
-            i += 1
-        if cur:
-            vals.append("".join(cur).strip())
-        return dict(zip(names, vals))
-    return {}
+    return decode_nuxt_script(find_nuxt_script(html))
 
 
 def resolve(var: str, var_map: dict) -> str:
@@ -200,19 +223,24 @@ def parse_theatre_page(html: str, venue_fallback: str) -> list[dict]:
     isSaleOpen=true  → билеты есть
     isSaleOpen=false → нет билетов (всё равно сохраняем, цену ставим из минцены)
     """
-    soup = BeautifulSoup(html, "lxml")
-    var_map = decode_nuxt(html)
+    script = find_nuxt_script(html)
+    var_map = decode_nuxt_script(script)
 
     if not var_map:
         logger.warning(f"  NUXT не декодирован для {venue_fallback!r}")
         return []
 
+    # JSON-LD и canonical — из дерева lxml (C), без BeautifulSoup
+    doc = lxml.html.fromstring(html)
+
     # Venue и адрес из JSON-LD Place
     place    = venue_fallback
     location = "Минск"
-    for s in soup.find_all("script", type="application/ld+json"):
+    for s in doc.iter("script"):
+        if s.get("type") != "application/ld+json":
+            continue
         try:
-            d = json.loads(s.string or "")
+            d = json.loads(s.text or "")
             if d.get("@type") == "Place":
                 ld_name = d.get("name", "")
                 if ld_name:
@@ -227,80 +255,74 @@ def parse_theatre_page(html: str, venue_fallback: str) -> list[dict]:
             continue
 
     # canonical URL
-    canonical = soup.find("link", rel="canonical")
-    page_url = canonical.get("href", "") if canonical else ""
+    canonical = next((link for link in doc.iter("link")
+                      if "canonical" in (link.get("rel") or "").split()), None)
+    page_url = canonical.get("href", "") if canonical is not None else ""
 
     events = []
     seen: set = set()
 
-    for s_tag in soup.find_all("script"):
-        t = s_tag.string or ""
-        if "__NUXT__" not in t:
+    # Более гибкий regex — id может быть числом или сжатой переменной (bs, bl)
+    # timeSpendingStopsale может быть числом или переменной — \w+ покрывает оба
+    sessions_raw = re.findall(
+        r'\{id:(\w+),performanceId:(\w+),name:(\w+),timeSpending:(\w+),'
+        r'timeSpendingStopsale:\w+,isSaleOpen:(\w+),isBooking:\w+,'
+        r'minPrice:(\w+),maxPrice:(\w+)',
+        script
+    )
+
+    for sid, perf_id, name_var, ts_var, sale_var, min_p_var, max_p_var in sessions_raw:
+        title    = resolve(name_var, var_map)
+        ts_raw   = resolve(ts_var, var_map)
+        min_p    = resolve(min_p_var, var_map)
+        max_p    = resolve(max_p_var, var_map)
+        is_sale  = resolve(sale_var, var_map)   # "true" / "false"
+
+        if not title or len(title) < 2:
             continue
 
-        # Более гибкий regex — id может быть числом или сжатой переменной (bs, bl)
-        # timeSpendingStopsale может быть числом или переменной — \w+ покрывает оба
-        sessions_raw = re.findall(
-            r'\{id:(\w+),performanceId:(\w+),name:(\w+),timeSpending:(\w+),'
-            r'timeSpendingStopsale:\w+,isSaleOpen:(\w+),isBooking:\w+,'
-            r'minPrice:(\w+),maxPrice:(\w+)',
-            t
-        )
-
-        for sid, perf_id, name_var, ts_var, sale_var, min_p_var, max_p_var in sessions_raw:
-            title    = resolve(name_var, var_map)
-            ts_raw   = resolve(ts_var, var_map)
-            min_p    = resolve(min_p_var, var_map)
-            max_p    = resolve(max_p_var, var_map)
-            is_sale  = resolve(sale_var, var_map)   # "true" / "false"
-
-            if not title or len(title) < 2:
-                continue
-
-            # Дата и время из unix timestamp
-            try:
-                dt = datetime.fromtimestamp(int(ts_raw))
-                event_date = dt.strftime("%Y-%m-%d")
-                show_time  = dt.strftime("%H:%M")
-            except Exception:
-                continue
-
-            if not is_future_date(event_date, MAX_DAYS):
-                continue
+        # Дата и время из unix timestamp
+        try:
+            dt = datetime.fromtimestamp(int(ts_raw))
+            event_date = dt.strftime("%Y-%m-%d")
+            show_time  = dt.strftime("%H:%M")
+        except Exception:
+            continue
 
-            # Цена: если билетов нет — пишем "Нет билетов"
-            price = _format_price(min_p, max_p)
-            if is_sale != "true":
-                price = "Нет билетов"
+        if not is_future_date(event_date, MAX_DAYS):
+            continue
 
-            # source_url: страница события
-            perf_resolved = resolve(perf_id, var_map)
-            if perf_resolved.isdigit():
-                source_url = f"{BASE_URL}/afisha/minsk/theatre/{perf_resolved}"
-            else:
-                source_url = page_url or THEATRES_URL
+        # Цена: если билетов нет — пишем "Нет билетов"
+        price = _format_price(min_p, max_p)
+        if is_sale != "true":
+            price = "Нет билетов"
 
-            key = (normalize_title(title), event_date, show_time)
-            if key in seen:
-                continue
-            seen.add(key)
+        # source_url: страница события
+        perf_resolved = resolve(perf_id, var_map)
+        if perf_resolved.isdigit():
+            source_url = f"{BASE_URL}/afisha/minsk/theatre/{perf_resolved}"
+        else:
+            source_url = page_url or THEATRES_URL
 
-            events.append({
-                "title":       title,
-                "details":     "",
-                "description": "",
-                "event_date":  event_date,
-                "show_time":   show_time,
-                "place":       place,
-                "location":    location,
-                "price":       price,
-                "category":    "theater",
-                "source_url":  source_url,
-                "source_name": SOURCE_NAME,
-                "_is_sale":    is_sale == "true",
-            })
-
-        break  # обрабатываем только первый NUXT скрипт
+        key = (normalize_title(title), event_date, show_time)
+        if key in seen:
+            continue
+        seen.add(key)
+
+        events.append({
+            "title":       title,
+            "details":     "",
+            "description": "",
+            "event_date":  event_date,
+            "show_time":   show_time,
+            "place":       place,
+            "location":    location,
+            "price":       price,
+            "category":    "theater",
+            "source_url":  source_url,
+            "source_name": SOURCE_NAME,
+            "_is_sale":    is_sale == "true",
+        })
 
     with_tickets    = sum(1 for e in events if e.get("_is_sale"))
     without_tickets = len(events) - with_tickets
@@ -342,93 +364,53 @@ def _format_price(min_p: str, max_p: str) -> str:
 
 # ── БД ────────────────────────────────────────────────────────────────────────
 
-def load_existing_index() -> dict:
-    """Загружает события из других источников для проверки дублей."""
+# Порог Жакара по словам для «похожих» названий из других источников
+SIMILAR_TITLE_THRESHOLD = 0.88
+
+
+def load_existing_index(dates=None) -> DedupIndex:
+    """Ключи событий других источников на даты dates (None — все) для проверки дублей."""
     try:
         conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT title, event_date, place FROM events WHERE source_name != ?",
-            (SOURCE_NAME,)
-        )
-        rows = cursor.fetchall()
-        conn.close()
+        try:
+            index = load_dedup_index(conn, SOURCE_NAME, dates, similarity=SIMILAR_TITLE_THRESHOLD)
+        finally:
+            conn.close()
     except Exception as e:
         logger.warning(f"load_existing_index: {e}")
-        return {}
-
-    index: dict = {}
-    for title, ev_date, place in rows:
-        norm = normalize_title(title)
-        index.setdefault(ev_date, []).append((norm, place or ""))
-    logger.info(f"Индекс: {sum(len(v) for v in index.values())} событий из других источников")
+        index = DedupIndex(similarity=SIMILAR_TITLE_THRESHOLD)
+    logger.info(f"Индекс: {len(index)} событий из других источников")
     return index
 
 
-def is_duplicate(ev: dict, index: dict) -> bool:
-    """True если событие уже есть от другого источника."""
-    candidates = index.get(ev["event_date"], [])
-    if not candidates:
-        return False
-    norm = normalize_title(ev["title"])
-    if not norm:
-        return False
-    for norm_ex, _ in candidates:
-        if norm == norm_ex:
-            return True
-        if norm_ex and titles_are_similar(norm, norm_ex, threshold=0.88):
-            return True
-    return False
+def is_duplicate(ev: dict, index: DedupIndex) -> bool:
+    """True если событие уже есть от другого источника (то же или похожее название)."""
+    match = index.find(ev["title"], ev["event_date"])
+    if match is not None:
+        logger.debug(f"  {match.reason} ({match.score}): {ev['title']!r} ~ {match.title!r}")
+    return match is not None
 
 
 def save_events(events: list[dict]) -> int:
-    """Удаляет старые записи bycard, сохраняет новые уникальные."""
+    """Приводит записи bycard в БД к новому списку: upsert по разнице, без DELETE всех."""
     if not events:
         logger.info("Нет событий для сохранения")
         return 0
 
+    # Дедупликация внутри текущего запуска по (title, date, time, place)
+    seen: set = set()
+    unique_events = []
+    for ev in events:
+        key = (normalize_title(ev["title"]), ev["event_date"], ev["show_time"], ev["place"])
+        if key not in seen:
+            seen.add(key)
+            unique_events.append(ev)
+
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-
-        # Удаляем ВСЕ старые записи bycard (как ticketpro/bezkassira)
-        cursor.execute("DELETE FROM events WHERE source_name = ?", (SOURCE_NAME,))
-        deleted = cursor.rowcount
-        logger.info(f"🗑️ Удалено старых записей bycard: {deleted}")
-
-        # Дедупликация внутри текущего запуска по (title, date, time, place)
-        seen: set = set()
-        unique_events = []
-        for ev in events:
-            key = (normalize_title(ev["title"]), ev["event_date"], ev["show_time"], ev["place"])
-            if key not in seen:
-                seen.add(key)
-                unique_events.append(ev)
-
-        saved = 0
-        for ev in unique_events:
-            try:
-                cursor.execute("""
-                    INSERT INTO events
-                        (title, details, description, event_date, show_time,
-                         place, location, price, category,
-                         source_url, source_name)
-                    VALUES (?,?,?,?,?,?,?,?,?,?,?)
-                """, (
-                    ev["title"], ev["details"], ev["description"],
-                    ev["event_date"], ev["show_time"],
-                    ev["place"], ev["location"],
-                    ev["price"], ev["category"],
-                    ev["source_url"], ev["source_name"],
-                ))
-                saved += 1
-            except Exception as e:
-                logger.error(f"  Ошибка вставки {ev['title']!r}: {e}")
-
-        conn.commit()
-        conn.close()
-        logger.info(f"💾 Сохранено: {saved}")
-        return saved
+        with bulk_connection(DB_PATH) as conn:
+            stats = upsert_events(conn, unique_events, "source_name = ?", (SOURCE_NAME,))
+        logger.info(f"💾 Сохранено: {stats.saved} ({stats})")
+        return stats.saved
 
     except Exception as e:
         logger.error(f"save_events: {e}")
@@ -437,68 +419,84 @@ def save_events(events: list[dict]) -> int:
 
 # ── Главный запуск ─────────────────────────────────────────────────────────────
 
-def run():
-    logger.info("=" * 60)
-    logger.info("🎭 BYCARD парсер запущен")
-    logger.info("=" * 60)
-
-    # Загружаем индекс ДО парсинга — там уже есть relax/ticketpro/bezkassira
-    index = load_existing_index()
-
-    # Шаг 1: список театров
-    logger.info(f"Загружаю список театров: {THEATRES_URL}")
-    theatres_html = fetch_page(THEATRES_URL)
-    if not theatres_html:
-        logger.error("Не удалось загрузить список театров")
-        print("RESULT:Bycard театры:0:0")
-        return 0
+RESULT_LABEL = "Bycard театры"
 
-    theatres = fetch_theatre_list(theatres_html)
-    if not theatres:
-        logger.error("Список театров пуст")
-        print("RESULT:Bycard театры:0:0")
-        return 0
 
-    logger.info(f"Театров для обработки: {len(theatres)}")
+class BycardParser(BaseSourceParser):
+    key = SOURCE_NAME
+    host = "bycard.by"
 
-    # Шаг 2: для каждого театра — парсим сеансы
-    all_events = []
-    for theatre in theatres:
-        logger.info(f"\n▶ {theatre['name']} ({theatre['url']})")
-        html = fetch_page(theatre["url"])
-        if not html:
-            logger.warning("  Не удалось загрузить страницу театра")
-            time.sleep(1)
-            continue
+    def fetch(self) -> SourceResult:
+        logger.info("=" * 60)
+        logger.info("🎭 BYCARD парсер запущен")
+        logger.info("=" * 60)
 
-        events = parse_theatre_page(html, theatre["name"])
-        all_events.extend(events)
-        time.sleep(0.5)
+        result = SourceResult()
+        result.count(RESULT_LABEL)
 
-    total_found = len(all_events)
-    logger.info(f"\nВсего найдено сеансов: {total_found}")
+        # Шаг 1: список театров
+        logger.info(f"Загружаю список театров: {THEATRES_URL}")
+        theatres_html = fetch_page(THEATRES_URL)
+        if not theatres_html:
+            logger.error("Не удалось загрузить список театров")
+            return result
 
-    # Фильтрация дублей с другими источниками
-    unique, dup = [], 0
-    for ev in all_events:
-        if is_duplicate(ev, index):
-            logger.debug(f"  Дубль с другим источником: {ev['title']} {ev['event_date']}")
-            dup += 1
-        else:
-            unique.append(ev)
-            # Добавляем в индекс чтобы следующие театры тоже видели
-            norm = normalize_title(ev["title"])
-            index.setdefault(ev["event_date"], []).append((norm, ev["place"] or ""))
+        theatres = fetch_theatre_list(theatres_html)
+        if not theatres:
+            logger.error("Список театров пуст")
+            return result
 
-    logger.info(f"Дублей с другими источниками: {dup}")
+        logger.info(f"Театров для обработки: {len(theatres)}")
 
-    # Сохраняем (удаляет старые bycard + вставляет новые)
-    saved = save_events(unique)
+        # Шаг 2: страницы театров — параллельно, разбор — по порядку
+        all_events = []
+        pages = get_fetcher().get_many([t["url"] for t in theatres], headers=HEADERS)
+        for theatre, html in zip(theatres, pages):
+            logger.info(f"\n▶ {theatre['name']} ({theatre['url']})")
+            if not html:
+                logger.warning("  Не удалось загрузить страницу театра")
+                continue
+
+            events = parse_theatre_page(html, theatre["name"])
+            all_events.extend(events)
+
+        logger.info(f"\nВсего найдено сеансов: {len(all_events)}")
+        result.batches.append((RESULT_LABEL, all_events))
+        result.count(RESULT_LABEL, found=len(all_events))
+        return result
+
+    def save(self, result: SourceResult) -> SourceResult:
+        all_events = result.events
+        if not all_events:
+            return result
+
+        # Индекс грузим после сохранения relax/ticketpro/bezkassira
+        index = load_existing_index(ev["event_date"] for ev in all_events)
+
+        # Фильтрация дублей с другими источниками
+        unique, dup = [], 0
+        for ev in all_events:
+            if is_duplicate(ev, index):
+                logger.debug(f"  Дубль с другим источником: {ev['title']} {ev['event_date']}")
+                dup += 1
+            else:
+                unique.append(ev)
+                # Добавляем в индекс чтобы следующие театры тоже видели
+                index.add(ev["title"], ev["event_date"], ev["place"] or "")
+
+        logger.info(f"Дублей с другими источниками: {dup} {dict(index.reasons)}")
+
+        # Сохраняем (upsert по разнице с прошлым запуском bycard)
+        saved = save_events(unique)
+        result.count(RESULT_LABEL, saved=saved)
 
-    logger.info(f"Итог: найдено {total_found}, дублей {dup}, сохранено {saved}")
-    logger.info("=" * 60)
-    print(f"RESULT:Bycard театры:{total_found}:{saved}")
-    return saved
+        logger.info(f"Итог: найдено {len(all_events)}, дублей {dup}, сохранено {saved}")
+        logger.info("=" * 60)
+        return result
+
+
+def run():
+    return BycardParser().run().saved
 
 
 # ── Точка входа ────────────────────────────────────────────────────────────────
@@ -535,8 +533,47 @@ if __name__ == "__main__":
             print(f"Театров: {len(theatres)}")
             for t in theatres[:15]:
                 print(f"  {t}")
+            # Страницы театров — входные данные для режима bench
+            for t in theatres[:5]:
+                page = fetch_page(t["url"])
+                if page:
+                    with open(f"dump_bycard_{t['id']}.html", "w", encoding="utf-8") as f:
+                        f.write(page)
         else:
             print("Ошибка загрузки")
 
+    elif len(sys.argv) > 1 and sys.argv[1] == "bench":
+        # python bycard_parser.py bench [файлы...] — скорость NUXT-декодера на сохранённых
+        # страницах театров (по умолчанию dump_bycard_<id>.html из режима dump)
+        import glob
+        import time
+
+        files = sys.argv[2:] or sorted(glob.glob("dump_bycard_[0-9]*.html"))
+        if not files:
+            print("Нет страниц: python bycard_parser.py dump или передайте файлы")
+            sys.exit(1)
+        repeats = 20
+        total_bytes = total_decode = total_parse = 0.0
+        for path in files:
+            with open(path, encoding="utf-8") as f:
+                html = f.read()
+            t0 = time.perf_counter()
+            for _ in range(repeats):
+                var_map = decode_nuxt(html)
+            decode_sec = (time.perf_counter() - t0) / repeats
+            t0 = time.perf_counter()
+            for _ in range(repeats):
+                events = parse_theatre_page(html, path)
+            parse_sec = (time.perf_counter() - t0) / repeats
+            total_bytes += len(html)
+            total_decode += decode_sec
+            total_parse += parse_sec
+            print(f"  {os.path.basename(path):32s} {len(html) / 1024:7.0f} KB  "
+                  f"переменных {len(var_map):5d}  decode {decode_sec * 1000:6.1f} мс  "
+                  f"страница {parse_sec * 1000:6.1f} мс  сеансов {len(events)}")
+        print(f"Итого {len(files)} стр.: decode {total_decode * 1000:.1f} мс "
+              f"({total_bytes / 1e6 / total_decode:.1f} MB/s), "
+              f"разбор страниц {total_parse * 1000:.1f} мс")
+
     else:
         run()
@@ -114,6 +114,129 @@ def _build_overnight_union(
     return sql, params
 
 
+# ── Запросы списков событий ──────────────────────────────────────────────────
+# Один источник SQL для api.py, bot_enhanced.py и db_schema.PLAN_CHECKS:
+# проверка планов прогоняет ровно те запросы, которые уходят в БД.
+
+EVENT_SELECT_COLS = (
+    "id, title, details, description, event_date, show_time, end_time, "
+    "place, location, price, category, source_url, source_name, is_kids"
+)
+
+EVENTS_ORDER_SQL = f"event_date, {TIME_ORDER_SQL}, title"
+
+# Ключ keyset-курсора: (event_date, признак «без времени», show_time, title, id)
+KEYSET_ORDER_SQL = (
+    "event_date, "
+    "CASE WHEN show_time = '' OR show_time IS NULL THEN 1 ELSE 0 END, "
+    "COALESCE(show_time, ''), COALESCE(title, ''), id"
+)
+KEYSET_SEEK_SQL = f"({KEYSET_ORDER_SQL}) > (?, ?, ?, ?, ?)"
+
+
+def _build_category_filter(category: str | None) -> tuple[str, list]:
+    """SQL-условие БЕЗ 'AND' для категории. Возвращает ("", []) без фильтра (None / all).
+
+    free и kids — не поле category, а price = 'Бесплатно' и is_kids = 1 (литералами:
+    так планировщик берёт частичные индексы).
+    """
+    if category == "free":
+        return "price = 'Бесплатно'", []
+    if category == "kids":
+        return "is_kids = 1", []
+    if category and category != "all":
+        return "category = ?", [category]
+    return "", []
+
+
+def _build_upcoming_filter(today: str, now_time: str) -> tuple[str, list]:
+    """SQL-условие БЕЗ 'AND' для диапазона «с сегодня»: сегодняшние события —
+    по тем же правилам, что и _build_time_filter, будущие даты — все."""
+    time_filter, time_params = _build_time_filter(today, today, now_time)
+    return f"(event_date > ? OR {time_filter})", [today, *time_params]
+
+
+def _build_paged_sql(where_clauses: list[str], order: str = EVENTS_ORDER_SQL,
+                     union_sql: str | None = None) -> tuple[str, str]:
+    """(count_sql, page_sql) для OFFSET-пагинации; page_sql заканчивается на LIMIT ? OFFSET ?.
+
+    union_sql — overnight-подзапрос (_build_overnight_union), его параметры идут после where.
+    """
+    where = " AND ".join(where_clauses) if where_clauses else "1=1"
+    if union_sql:
+        combined = f"SELECT {EVENT_SELECT_COLS} FROM events WHERE {where} UNION {union_sql}"
+        return (f"SELECT COUNT(*) FROM ({combined})",
+                f"SELECT * FROM ({combined}) ORDER BY {order} LIMIT ? OFFSET ?")
+    return (f"SELECT COUNT(*) FROM events WHERE {where}",
+            f"SELECT {EVENT_SELECT_COLS} FROM events WHERE {where} ORDER BY {order} LIMIT ? OFFSET ?")
+
+
+def _build_keyset_sql(where_clauses: list[str], union_sql: str | None = None,
+                      seek: bool = False) -> tuple[str, str]:
+    """(count_sql, page_sql) для keyset-пагинации; page_sql заканчивается на LIMIT ?.
+
+    seek — страница после курсора: перед LIMIT добавляются 5 параметров ключа.
+    """
+    where = " AND ".join(where_clauses) if where_clauses else "1=1"
+    if union_sql:
+        source_sql = f"(SELECT {EVENT_SELECT_COLS} FROM events WHERE {where} UNION {union_sql})"
+        count_sql = f"SELECT COUNT(*) FROM {source_sql}"
+        page_sql = f"SELECT * FROM {source_sql}"
+        if seek:
+            page_sql += f" WHERE {KEYSET_SEEK_SQL}"
+    else:
+        count_sql = f"SELECT COUNT(*) FROM events WHERE {where}"
+        page_sql = f"SELECT {EVENT_SELECT_COLS} FROM events WHERE ({where})"
+        if seek:
+            page_sql += f" AND {KEYSET_SEEK_SQL}"
+    return count_sql, f"{page_sql} ORDER BY {KEYSET_ORDER_SQL} LIMIT ?"
+
+
+def _build_category_counts_sql(where_clauses: list[str], union_sql: str | None = None) -> str:
+    """Счётчики по категориям одним запросом: category, total, free, kids."""
+    where = " AND ".join(where_clauses) if where_clauses else "1=1"
+    base_sql = f"SELECT {EVENT_SELECT_COLS} FROM events WHERE {where}"
+    if union_sql:
+        base_sql = f"{base_sql} UNION {union_sql}"
+    return f"""
+        SELECT category,
+               COUNT(*) AS total,
+               SUM(CASE WHEN price = 'Бесплатно' THEN 1 ELSE 0 END) AS free,
+               SUM(CASE WHEN is_kids = 1 THEN 1 ELSE 0 END) AS kids
+        FROM ({base_sql})
+        GROUP BY category
+    """
+
+
+def _build_date_events_sql(date_str: str, today: str, now_time: str,
+                           category: str | None) -> tuple[str, list]:
+    """События одной даты (без overnight) в порядке показа; для сегодня — без прошедших."""
+    where = ["event_date = ?"]
+    params: list = [date_str]
+    category_filter, category_params = _build_category_filter(category)
+    if category_filter:
+        where.append(category_filter)
+        params.extend(category_params)
+    time_filter, time_params = _build_time_filter(date_str, today, now_time)
+    if time_filter:
+        where.append(time_filter)
+        params.extend(time_params)
+    sql = (f"SELECT {EVENT_SELECT_COLS} FROM events WHERE {' AND '.join(where)} "
+           f"ORDER BY {TIME_ORDER_SQL}, title")
+    return sql, params
+
+
+def _build_calendar_dates_sql(date_from: str, date_to: str, category: str | None) -> tuple[str, list]:
+    """Даты с событиями в диапазоне — для подсветки календаря."""
+    where = ["event_date >= ?", "event_date <= ?"]
+    params: list = [date_from, date_to]
+    category_filter, category_params = _build_category_filter(category)
+    if category_filter:
+        where.append(category_filter)
+        params.extend(category_params)
+    return f"SELECT DISTINCT event_date FROM events WHERE {' AND '.join(where)} ORDER BY event_date", params
+
+
 BATCH_CATEGORY_MAP = {
     "кино": "cinema", "cinema": "cinema",
     "концерт": "concert", "концерты": "concert", "concert": "concert",
@@ -12,6 +12,11 @@ Fingerprint quality:
   - relax.by per category: href|date|show_time per seance (listing page only, no detail pages)
   - bycard.by: performanceId|date|time per NUXT session (resolved via decode_nuxt)
 
+Bandwidth:
+  - all pages go through http_fetch with the on-disk conditional-GET cache
+    (http_cache): unchanged pages cost a 304, and a full parse that follows a
+    check within HTTP_CACHE_FRESH_SECONDS reuses the check's download.
+
 Safety rules:
   - last_seen_hash/count updated only on non-error checks with count > MIN_SANE_COUNT
   - last_successful_hash/count updated only when above + parse_ok=True
@@ -25,14 +30,12 @@ import json
 import logging
 import os
 import re
-import subprocess
 import sys
 import time
 from datetime import datetime
 
 import sqlite3
 
-import requests
 from bs4 import BeautifulSoup
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -43,9 +46,12 @@ from parser_state import (  # noqa: E402
     get_parser_source_state,
     update_parser_source_state,
 )
+from source_parser import run_sources  # noqa: E402
+from http_fetch import get_fetcher  # noqa: E402
+from relax_extract import iter_days  # noqa: E402
 
 try:
-    from normalizer import mark_free_duplicates as _mark_free_duplicates
+    from normalizer import apply_free_pass as _apply_free_pass
     from normalizer import apply_kids_pass as _apply_kids_pass
     _NORMALIZER_AVAILABLE = True
 except ImportError:
@@ -74,21 +80,21 @@ if not _NORMALIZER_AVAILABLE:
 # If full parse failed for a given fingerprint, don't retry it more often than this.
 PARSE_ERROR_COOLDOWN_HOURS = 6
 
-# relax.by per-category config: source_key → (listing_url, parser_cmd, human_label)
-# source_key is used as the parser_source_state primary key, so each category
-# has its own independent fingerprint/baseline.
-RELAX_CATEGORIES: dict[str, tuple[str, str, str]] = {
-    "relax.by:theatre":    ("https://afisha.relax.by/theatre/minsk/",  "relax_parser.py theatre",    "🎭 Театр (Relax)"),
-    "relax.by:concert":    ("https://afisha.relax.by/conserts/minsk/", "relax_parser.py concert",    "🎵 Концерты (Relax)"),
-    "relax.by:exhibition": ("https://afisha.relax.by/expo/minsk/",     "relax_parser.py exhibition", "🖼️ Выставки (Relax)"),
-    "relax.by:party":      ("https://afisha.relax.by/clubs/minsk/",    "relax_parser.py party",      "🎉 Вечеринки (Relax)"),
-    "relax.by:kino":       ("https://afisha.relax.by/kino/minsk/",     "relax_parser.py kino",       "🎬 Кино (Relax)"),
-    "relax.by:kids":       ("https://afisha.relax.by/kids/minsk/",     "relax_parser.py kids",       "🧸 Детям (Relax)"),
+# relax.by per-category config: source_key → (listing_url, human_label)
+# source_key is used as the parser_source_state primary key (each category has its
+# own independent fingerprint/baseline) and as the source_parser plugin key.
+RELAX_CATEGORIES: dict[str, tuple[str, str]] = {
+    "relax.by:theatre":    ("https://afisha.relax.by/theatre/minsk/",  "🎭 Театр (Relax)"),
+    "relax.by:concert":    ("https://afisha.relax.by/conserts/minsk/", "🎵 Концерты (Relax)"),
+    "relax.by:exhibition": ("https://afisha.relax.by/expo/minsk/",     "🖼️ Выставки (Relax)"),
+    "relax.by:party":      ("https://afisha.relax.by/clubs/minsk/",    "🎉 Вечеринки (Relax)"),
+    "relax.by:kino":       ("https://afisha.relax.by/kino/minsk/",     "🎬 Кино (Relax)"),
+    "relax.by:kids":       ("https://afisha.relax.by/kids/minsk/",     "🧸 Детям (Relax)"),
 }
 
 # Free-events pass must run after ANY relax category was parsed.
 # It marks free events across all relax categories — skipping it loses "Бесплатно" labels.
-RELAX_FREE_CMD   = "relax_parser.py free"
+RELAX_FREE_KEY   = "relax.by:free"
 RELAX_FREE_LABEL = "🆓 Бесплатно (Relax)"
 
 # Minimum number of items a check must return to be considered sane.
@@ -108,13 +114,13 @@ CHECKABLE_SOURCES = list(RELAX_CATEGORIES.keys()) + ["bycard.by"]
 # Sources that always run full parse (no cheap check implemented)
 ALWAYS_PARSE_SOURCES = ["ticketpro.by", "bezkassira.by"]
 
-# Maps source_key → single parser (cmd, label).
+# Maps source_key (= source_parser plugin key) → report label.
 # Relax free pass is NOT here — it's triggered separately after any category parse.
-SOURCE_PARSERS: dict[str, tuple[str, str]] = {
-    **{key: (cmd, label) for key, (_, cmd, label) in RELAX_CATEGORIES.items()},
-    "bycard.by":    ("bycard_parser.py",    "🎭 Bycard"),
-    "ticketpro.by": ("ticketpro_parser.py", "🎫 Ticketpro"),
-    "bezkassira.by":("bezkassira_parser.py","🎟 BezKassira"),
+SOURCE_LABELS: dict[str, str] = {
+    **{key: label for key, (_, label) in RELAX_CATEGORIES.items()},
+    "bycard.by":     "🎭 Bycard",
+    "ticketpro.by":  "🎫 Ticketpro",
+    "bezkassira.by": "🎟 BezKassira",
 }
 
 HEADERS = {
@@ -125,7 +131,6 @@ HEADERS = {
     ),
     "Accept-Language": "ru-RU,ru;q=0.9",
 }
-REQUEST_TIMEOUT = 25
 
 # ── Fingerprint helpers ───────────────────────────────────────────────────────
 
@@ -188,42 +193,21 @@ def _check_relax_category(source_key: str, url: str) -> dict:
       date      — from schedule__list > h5 (available on listing page)
       show_time — from a/span.schedule__seance-time (available on listing page)
     Together they catch: new events, removed events, rescheduled events.
-    No detail pages fetched.
+    No detail pages fetched. The listing is read with the same streaming
+    extractor as the parser (relax_extract.iter_days).
     """
     cat = source_key.split(":")[-1]
     try:
-        resp = requests.get(url, headers=HEADERS, timeout=REQUEST_TIMEOUT)
-        resp.raise_for_status()
-        soup = BeautifulSoup(resp.text, "html.parser")
-
+        html = get_fetcher().get(url, headers=HEADERS, raise_errors=True)
         keys: list[str] = []
-        for day_block in soup.find_all("div", class_="schedule__list"):
-            h5 = day_block.find("h5")
-            date_str = _parse_text_date(h5.get_text()) if h5 else ""
-
-            for movie_item in day_block.find_all("div", class_="schedule__table--movie__item"):
-                item = movie_item.find("div", class_="schedule__item")
-                if not item:
-                    continue
-                title_a = item.find("a", class_="js-schedule__event-link")
-                if not title_a:
-                    continue
-                href = title_a.get("href", "").strip()
+        for day in iter_days(html):
+            date_str = _parse_text_date(day.date_text) if day.date_text is not None else ""
+            for item in day.items:
+                href = item.href.strip() if item.title is not None else ""
                 if not href:
                     continue
-
-                seances = item.find_all("div", class_="schedule__seance") or [item]
-                for seance in seances:
-                    time_elem = (
-                        seance.find("a", class_="schedule__seance-time")
-                        or seance.find("span", class_="schedule__seance-time")
-                    )
-                    show_time = ""
-                    if time_elem:
-                        raw = time_elem.get_text(strip=True)
-                        if re.match(r"^\d{1,2}:\d{2}$", raw):
-                            show_time = raw
-                    keys.append(f"{href}|{date_str}|{show_time}")
+                for seance in item.seances or [item.fallback]:
+                    keys.append(f"{href}|{date_str}|{seance.show_time}")
 
         count = len(keys)
         log.info(f"  relax/{cat}: {count} seances")
@@ -258,13 +242,18 @@ BYCARD_BASE_URL   = "https://bycard.by"
 BYCARD_LISTING_URL = "https://bycard.by/objects/minsk/1"
 BYCARD_OBJECT_HREF_RE = re.compile(r"/objects/minsk/1/(?:[^\"'?#/\s]+-)?(\d+)(?=[/?#\"'\s]|$)")
 
-# Import decode_nuxt/resolve from bycard_parser (same directory, always available).
+# Import the NUXT decoder (find_nuxt_script/decode_nuxt_script/resolve) from
+# bycard_parser (same directory, always available).
 # No fallback: if import fails, bycard check returns error → skipped_due_to_error.
 # A raw-regex fallback would return NUXT variable names (bs, bl, …) instead of
 # resolved performanceId values — a different key format that causes false "changed"
 # whenever the code switches between paths.
 try:
-    from bycard_parser import decode_nuxt as _decode_nuxt, resolve as _resolve
+    from bycard_parser import (
+        decode_nuxt_script as _decode_nuxt_script,
+        find_nuxt_script as _find_nuxt_script,
+        resolve as _resolve,
+    )
     _BYCARD_NUXT_AVAILABLE = True
 except ImportError:
     _BYCARD_NUXT_AVAILABLE = False
@@ -283,54 +272,36 @@ def _extract_bycard_keys_from_html(html: str) -> list[str]:
     if not _BYCARD_NUXT_AVAILABLE:
         return []
 
-    var_map = _decode_nuxt(html)
+    script = _find_nuxt_script(html)
+    var_map = _decode_nuxt_script(script)
     if not var_map:
         # decode_nuxt failed for this page — return nothing, not a guessed fallback.
         return []
 
     keys: list[str] = []
     seen: set[str] = set()
-    for s_tag in BeautifulSoup(html, "html.parser").find_all("script"):
-        t = s_tag.string or ""
-        if "__NUXT__" not in t:
-            continue
-        sessions_raw = re.findall(
-            r'\{id:(\w+),performanceId:(\w+),name:\w+,timeSpending:(\w+),',
-            t,
-        )
-        for _sid, perf_var, ts_var in sessions_raw:
-            perf_id = _resolve(perf_var, var_map)
-            ts_raw  = _resolve(ts_var, var_map)
-            try:
-                dt = datetime.fromtimestamp(int(ts_raw))
-                date_str = dt.strftime("%Y-%m-%d")
-                time_str = dt.strftime("%H:%M")
-            except (ValueError, TypeError, OSError):
-                date_str = ts_raw
-                time_str = ""
-
-            key = f"{perf_id}|{date_str}|{time_str}"
-            if key not in seen:
-                seen.add(key)
-                keys.append(key)
-        break  # first NUXT script only
+    sessions_raw = re.findall(
+        r'\{id:(\w+),performanceId:(\w+),name:\w+,timeSpending:(\w+),',
+        script,
+    )
+    for _sid, perf_var, ts_var in sessions_raw:
+        perf_id = _resolve(perf_var, var_map)
+        ts_raw  = _resolve(ts_var, var_map)
+        try:
+            dt = datetime.fromtimestamp(int(ts_raw))
+            date_str = dt.strftime("%Y-%m-%d")
+            time_str = dt.strftime("%H:%M")
+        except (ValueError, TypeError, OSError):
+            date_str = ts_raw
+            time_str = ""
+
+        key = f"{perf_id}|{date_str}|{time_str}"
+        if key not in seen:
+            seen.add(key)
+            keys.append(key)
     return keys
 
 
-def _fetch_bycard_html(session: requests.Session, url: str) -> str:
-    resp = session.get(url, timeout=REQUEST_TIMEOUT)
-    resp.raise_for_status()
-    resp.encoding = "utf-8"
-    if "hg-security=" in resp.text and "<title>Verification</title>" in resp.text:
-        m = re.search(r"hg-security=([^;\"']+)", resp.text)
-        if m:
-            session.cookies.set("hg-security", m.group(1), domain="bycard.by", path="/")
-            resp = session.get(url, timeout=REQUEST_TIMEOUT)
-            resp.raise_for_status()
-            resp.encoding = "utf-8"
-    return resp.text
-
-
 def check_bycard_fingerprint() -> dict:
     """
     Fetch bycard venue listing → collect venue hrefs → per venue extract
@@ -345,9 +316,9 @@ def check_bycard_fingerprint() -> dict:
             "status": "error",
         }
     try:
-        session = requests.Session()
-        session.headers.update(HEADERS)
-        listing_html = _fetch_bycard_html(session, BYCARD_LISTING_URL)
+        # Shared fetcher: keep-alive pool, per-host rate limit, hg-security cookie hook
+        fetcher = get_fetcher()
+        listing_html = fetcher.get(BYCARD_LISTING_URL, headers=HEADERS, raise_errors=True)
         soup = BeautifulSoup(listing_html, "html.parser")
 
         venue_hrefs: list[str] = []
@@ -371,11 +342,14 @@ def check_bycard_fingerprint() -> dict:
 
         all_keys: list[str] = []
         venue_errors = 0
-        for href in venue_hrefs:
+        venue_pages = fetcher.get_many([BYCARD_BASE_URL + href for href in venue_hrefs], headers=HEADERS)
+        for href, html in zip(venue_hrefs, venue_pages):
+            if html is None:
+                log.warning(f"  bycard venue {href} error: not fetched")
+                venue_errors += 1
+                continue
             try:
-                url = BYCARD_BASE_URL + href
-                keys = _extract_bycard_keys_from_html(_fetch_bycard_html(session, url))
-                all_keys.extend(keys)
+                all_keys.extend(_extract_bycard_keys_from_html(html))
             except Exception as e:
                 log.warning(f"  bycard venue {href} error: {e}")
                 venue_errors += 1
@@ -408,7 +382,7 @@ def check_bycard_fingerprint() -> dict:
 
 
 CHECK_FNS = {
-    **{key: _make_relax_check(key, url) for key, (url, _, _label) in RELAX_CATEGORIES.items()},
+    **{key: _make_relax_check(key, url) for key, (url, _label) in RELAX_CATEGORIES.items()},
     "bycard.by": check_bycard_fingerprint,
 }
 
@@ -422,37 +396,22 @@ CHECK_FNS = {
 
 # ── Parser runner ─────────────────────────────────────────────────────────────
 
-def run_parser(cmd: str, label: str) -> tuple[bool, list[str]]:
-    """Run one parser script as subprocess. Returns (success, RESULT: lines)."""
-    full_cmd = [sys.executable] + cmd.split()
-    try:
-        result = subprocess.run(
-            full_cmd,
-            capture_output=True,
-            text=True,
-            timeout=900,
-            cwd=os.path.dirname(os.path.abspath(__file__)),
-        )
-        result_lines = [
-            line for line in result.stdout.splitlines()
-            if line.startswith("RESULT:")
-        ]
-        return result.returncode == 0, result_lines
-    except subprocess.TimeoutExpired:
-        log.error(f"Parser {label} timed out")
-        return False, []
-    except Exception as e:
-        log.error(f"Parser {label} exception: {e}")
-        return False, []
+def run_parser(source_key: str, label: str):
+    """Run one parser plugin in-process. Returns (success, SourceResult)."""
+    run = run_sources([source_key])[0]
+    if not run.ok:
+        log.error(f"Parser {label} failed: {run.error}")
+    return run.ok, run.result
 
 
 def run_single_parser(source_key: str) -> dict:
-    """Run the one parser command for source_key. Returns result dict."""
-    cmd, label = SOURCE_PARSERS[source_key]
+    """Run the parser for source_key. Returns result dict."""
+    label = SOURCE_LABELS[source_key]
     t0 = time.time()
-    ok, lines = run_parser(cmd, label)
+    ok, result = run_parser(source_key, label)
     elapsed = round(time.time() - t0, 1)
     log.info(f"  {label}: {'✅' if ok else '❌'} in {elapsed}s")
+    lines = result.result_lines() if ok else []
     return {"label": label, "ok": ok, "results": lines, "elapsed": elapsed}
 
 
@@ -525,171 +484,82 @@ def _record_parse(source_name: str, now_iso: str, fp: dict, parse_ok: bool):
     update_parser_source_state(source_name, **fields)
 
 
-# ── Free-pass post-processing helpers ────────────────────────────────────────
-
-def _load_relax_events_from_db() -> list[dict]:
-    """Load all relax.by events from DB for free-duplicate matching."""
-    try:
-        with sqlite3.connect(DB_PATH) as conn:
-            conn.row_factory = sqlite3.Row
-            rows = conn.execute(
-                "SELECT title, details, description, event_date, show_time, "
-                "place, location, price, category, source_url, source_name "
-                "FROM events WHERE source_name = 'relax.by'"
-            ).fetchall()
-        events = [dict(r) for r in rows]
-        log.info(f"  free-pass: loaded {len(events)} relax.by events from DB")
-        return events
-    except Exception as e:
-        log.error(f"  free-pass: DB load failed: {e}")
-        return []
-
-
-def _update_free_prices_in_db(events: list[dict]) -> int:
-    """Write 'Бесплатно' price for events marked as free by mark_free_duplicates."""
-    if not events:
-        return 0
-    updated = 0
-    try:
-        with sqlite3.connect(DB_PATH) as conn:
-            for ev in events:
-                if ev.get("price") == "Бесплатно" and ev.get("_from_free_section"):
-                    cur = conn.execute(
-                        "UPDATE events SET price = ? WHERE title = ? AND event_date = ? AND place = ?",
-                        ("Бесплатно", ev["title"], ev["event_date"], ev["place"]),
-                    )
-                    updated += cur.rowcount
-            conn.commit()
-        log.info(f"  free-pass: updated {updated} event prices to 'Бесплатно'")
-    except Exception as e:
-        log.error(f"  free-pass: DB update failed: {e}")
-    return updated
-
+# ── Free / kids passes ────────────────────────────────────────────────────────
 
 def run_free_pass() -> dict:
     """
-    Run relax_parser.py free subprocess, capture EVENTS_JSON output,
-    then call mark_free_duplicates + update DB prices.
+    Run the relax free-events parser in-process, then call apply_free_pass()
+    to set 'Бесплатно' on matching events in one set-based DB pass.
 
     Returns result dict (compatible with regular parse_result format) with
     an extra 'free_updated' key for the report.
     """
     t0 = time.time()
-    full_cmd = [sys.executable] + RELAX_FREE_CMD.split()
-    try:
-        proc = subprocess.run(
-            full_cmd,
-            capture_output=True,
-            text=True,
-            timeout=900,
-            cwd=os.path.dirname(os.path.abspath(__file__)),
-        )
-        result_lines: list[str] = []
-        free_events:  list[dict] = []
-
-        for line in proc.stdout.splitlines():
-            s = line.strip()
-            if s.startswith("RESULT:"):
-                result_lines.append(s)
-            elif s.startswith("EVENTS_JSON:"):
-                try:
-                    free_events.extend(json.loads(s[len("EVENTS_JSON:"):]))
-                except Exception as je:
-                    log.error(f"  free-pass: EVENTS_JSON parse error: {je}")
-
-        ok = proc.returncode == 0
-        elapsed = round(time.time() - t0, 1)
-        log.info(f"  {RELAX_FREE_LABEL}: {'✅' if ok else '❌'} in {elapsed}s, "
-                 f"{len(free_events)} free events received")
+    ok, result = run_parser(RELAX_FREE_KEY, RELAX_FREE_LABEL)
+    free_events = result.events
+    elapsed = round(time.time() - t0, 1)
+    log.info(f"  {RELAX_FREE_LABEL}: {'✅' if ok else '❌'} in {elapsed}s, "
+             f"{len(free_events)} free events received")
 
-        free_updated = 0
+    free_updated = 0
+    try:
         if ok and free_events and _NORMALIZER_AVAILABLE:
-            relax_db = _load_relax_events_from_db()
-            if relax_db:
-                merged = _mark_free_duplicates(relax_db, free_events)
-                free_updated = _update_free_prices_in_db(merged)
+            with sqlite3.connect(DB_PATH) as conn:
+                stats = _apply_free_pass(free_events, conn)
+            free_updated = stats["updated"]
+            log.info(f"  free-pass: updated {free_updated} event prices to 'Бесплатно' "
+                     f"{stats['by_category']}")
         elif free_events and not _NORMALIZER_AVAILABLE:
             log.warning("  free-pass: normalizer unavailable — price update skipped")
-
-        return {
-            "label":        RELAX_FREE_LABEL,
-            "ok":           ok,
-            "results":      result_lines,
-            "elapsed":      elapsed,
-            "free_updated": free_updated,
-        }
-    except subprocess.TimeoutExpired:
-        log.error(f"  free-pass: timed out")
-        return {"label": RELAX_FREE_LABEL, "ok": False, "results": [], "elapsed": round(time.time() - t0, 1), "free_updated": 0}
     except Exception as e:
         log.error(f"  free-pass: exception: {e}")
-        return {"label": RELAX_FREE_LABEL, "ok": False, "results": [], "elapsed": round(time.time() - t0, 1), "free_updated": 0}
+
+    return {
+        "label":        RELAX_FREE_LABEL,
+        "ok":           ok,
+        "results":      result.result_lines() if ok else [],
+        "elapsed":      round(time.time() - t0, 1),
+        "free_updated": free_updated,
+    }
 
 
-RELAX_KIDS_CMD   = "relax_parser.py kids"
+RELAX_KIDS_KEY   = "relax.by:kids"
 RELAX_KIDS_LABEL = "🧸 Детям (Relax)"
 
 
 def run_kids_pass() -> dict:
     """
-    Run relax_parser.py kids subprocess, capture EVENTS_JSON output,
-    then call apply_kids_pass() to mark is_kids=1 and save unique kids events.
+    Run the relax kids parser in-process, then call apply_kids_pass()
+    to mark is_kids=1 and save unique kids events.
     """
     t0 = time.time()
-    full_cmd = [sys.executable] + RELAX_KIDS_CMD.split()
-    try:
-        proc = subprocess.run(
-            full_cmd,
-            capture_output=True,
-            text=True,
-            timeout=900,
-            cwd=os.path.dirname(os.path.abspath(__file__)),
-        )
-        kids_events: list[dict] = []
-        result_lines: list[str] = []
-
-        for line in proc.stdout.splitlines():
-            s = line.strip()
-            if s.startswith("RESULT:"):
-                result_lines.append(s)
-            elif s.startswith("EVENTS_JSON:"):
-                try:
-                    kids_events.extend(json.loads(s[len("EVENTS_JSON:"):]))
-                except Exception as je:
-                    log.error(f"  kids-pass: EVENTS_JSON parse error: {je}")
-
-        ok = proc.returncode == 0
-        elapsed = round(time.time() - t0, 1)
-        log.info(f"  {RELAX_KIDS_LABEL}: {'✅' if ok else '❌'} in {elapsed}s, "
-                 f"{len(kids_events)} kids events received")
-
-        kids_marked = 0
-        kids_added = 0
-        if ok and _NORMALIZER_AVAILABLE:
-            try:
-                with sqlite3.connect(DB_PATH) as conn:
-                    stats = _apply_kids_pass(kids_events, conn)
-                    kids_marked = stats.get("marked", 0)
-                    kids_added  = stats.get("added", 0)
-            except Exception as e:
-                log.error(f"  kids-pass: apply_kids_pass failed: {e}")
-        elif not _NORMALIZER_AVAILABLE:
-            log.warning("  kids-pass: normalizer unavailable — is_kids update skipped")
+    ok, result = run_parser(RELAX_KIDS_KEY, RELAX_KIDS_LABEL)
+    kids_events = result.events
+    elapsed = round(time.time() - t0, 1)
+    log.info(f"  {RELAX_KIDS_LABEL}: {'✅' if ok else '❌'} in {elapsed}s, "
+             f"{len(kids_events)} kids events received")
 
-        return {
-            "label":        RELAX_KIDS_LABEL,
-            "ok":           ok,
-            "results":      result_lines,
-            "elapsed":      elapsed,
-            "kids_marked":  kids_marked,
-            "kids_added":   kids_added,
-        }
-    except subprocess.TimeoutExpired:
-        log.error(f"  kids-pass: timed out")
-        return {"label": RELAX_KIDS_LABEL, "ok": False, "results": [], "elapsed": round(time.time() - t0, 1)}
-    except Exception as e:
-        log.error(f"  kids-pass: exception: {e}")
-        return {"label": RELAX_KIDS_LABEL, "ok": False, "results": [], "elapsed": round(time.time() - t0, 1)}
+    kids_marked = 0
+    kids_added = 0
+    if ok and _NORMALIZER_AVAILABLE:
+        try:
+            with sqlite3.connect(DB_PATH) as conn:
+                stats = _apply_kids_pass(kids_events, conn)
+                kids_marked = stats.get("marked", 0)
+                kids_added  = stats.get("added", 0)
+        except Exception as e:
+            log.error(f"  kids-pass: apply_kids_pass failed: {e}")
+    elif not _NORMALIZER_AVAILABLE:
+        log.warning("  kids-pass: normalizer unavailable — is_kids update skipped")
+
+    return {
+        "label":        RELAX_KIDS_LABEL,
+        "ok":           ok,
+        "results":      result.result_lines() if ok else [],
+        "elapsed":      round(time.time() - t0, 1),
+        "kids_marked":  kids_marked,
+        "kids_added":   kids_added,
+    }
 
 
 # ── Main orchestrator ─────────────────────────────────────────────────────────
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Общий пул SQLite-соединений для бота и API.
+
+start.py поднимает webhook-бота и FastAPI в одном процессе, поэтому соединения
+живут на уровне процесса, а не запроса:
+  - читатели — по одному соединению на поток (threading.local), открываются один раз;
+  - писатель — одно соединение на процесс, доступ сериализован RLock'ом,
+    commit на выходе из внешнего блока, rollback при исключении.
+
+Режим WAL позволяет читателям не ждать писателя. Прагмы (synchronous, mmap_size,
+cache_size, busy_timeout) и UDF pylow ставятся один раз при открытии соединения,
+кэш подготовленных выражений sqlite3 переиспользуется между запросами.
+
+Для async-кода (хэндлеры бота, async-эндпоинты API) — run_db(): блокирующая
+функция доступа к БД уходит в отдельный пул потоков, event loop, общий для
+webhook и API, не ждёт SQLite.
+
+Парсеры работают отдельными процессами и по-прежнему открывают свои соединения.
+"""
+import asyncio
+import functools
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from config import DB_PATH
+
+CACHED_STATEMENTS = 256
+BUSY_TIMEOUT_MS = 30_000
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", "8"))
+
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA mmap_size = 268435456",   # 256 MB
+    "PRAGMA cache_size = -65536",     # 64 MB
+    f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}",
+)
+
+
+def _pylow(value):
+    """LOWER() для кириллицы: SQLite складывает регистр только у ASCII."""
+    return value.lower() if value else ""
+
+
+class ConnectionPool:
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._write_lock = threading.RLock()
+        self._writer: sqlite3.Connection | None = None
+        self._writer_depth = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,
+            cached_statements=CACHED_STATEMENTS,
+        )
+        conn.row_factory = sqlite3.Row
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        conn.create_function("pylow", 1, _pylow, deterministic=True)
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            self._local.depth = 0
+        return conn
+
+    @contextmanager
+    def read(self):
+        """Соединение текущего потока. Незакоммиченное на выходе откатывается —
+        как раньше при conn.close(), чтобы не держать открытую транзакцию."""
+        conn = self._reader()
+        self._local.depth += 1
+        try:
+            yield conn
+        finally:
+            self._local.depth -= 1
+            if self._local.depth == 0 and conn.in_transaction:
+                conn.rollback()
+
+    @contextmanager
+    def write(self):
+        """Единственный писатель процесса. Вложенные блоки — одна транзакция."""
+        with self._write_lock:
+            if self._writer is None:
+                self._writer = self._connect()
+            conn = self._writer
+            self._writer_depth += 1
+            try:
+                yield conn
+            except BaseException:
+                if self._writer_depth == 1 and conn.in_transaction:
+                    conn.rollback()
+                raise
+            else:
+                if self._writer_depth == 1 and conn.in_transaction:
+                    conn.commit()
+            finally:
+                self._writer_depth -= 1
+
+    def close(self):
+        """Закрывает соединение текущего потока и писателя (для остановки процесса)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+
+_pools: dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path: str = DB_PATH) -> ConnectionPool:
+    """Пул на файл БД — один на процесс, общий для бота и API."""
+    with _pools_lock:
+        pool = _pools.get(db_path)
+        if pool is None:
+            pool = ConnectionPool(db_path)
+            _pools[db_path] = pool
+        return pool
+
+
+def read_connection(db_path: str = DB_PATH):
+    return get_pool(db_path).read()
+
+
+def write_connection(db_path: str = DB_PATH):
+    return get_pool(db_path).write()
+
+
+# ── Async-доступ ─────────────────────────────────────────────────────────────
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="db",
+            )
+        return _executor
+
+
+async def run_db(fn, *args, **kwargs):
+    """Выполняет блокирующую DB-функцию в пуле потоков БД и ждёт результат.
+
+    Каждый поток пула держит своё read-соединение (ConnectionPool.read),
+    запись по-прежнему сериализована общим писателем.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), functools.partial(fn, *args, **kwargs))
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Каноническая схема таблицы events и её индексов.
+
+Единственное место, где описан DDL events: bot_enhanced.init_db() и
+api._run_migrations() вызывают ensure_events_schema(), парсеры пишут в уже
+готовую таблицу. Заодно создаются производные таблицы с триггерами:
+events_fts (search_index), event_fingerprints (ключи дублей для парсеров) и
+flash_event_queue (изменения для флеш-подписок, flash_matcher).
+
+Индексы версионируются через PRAGMA user_version: каждая версия — список
+statements, применяется один раз и по порядку. Новый индекс = новая версия
+в EVENTS_INDEX_VERSIONS (старые версии не редактируем).
+
+Проверка планов запросов:
+    python db_schema.py check            — на пустой in-memory БД
+    python db_schema.py check <db_path>  — на копии схемы из реальной БД
+"""
+import sqlite3
+import sys
+
+from config import (
+    _build_calendar_dates_sql, _build_category_counts_sql, _build_category_filter,
+    _build_date_events_sql, _build_keyset_sql, _build_overnight_union, _build_paged_sql,
+    _build_time_filter, _build_upcoming_filter,
+)
+from event_fingerprints import refresh_fingerprints
+from flash_matcher import ensure_flash_queue
+from search_index import ensure_search_index
+
+EVENTS_DDL = """
+    CREATE TABLE IF NOT EXISTS events (
+        id          INTEGER PRIMARY KEY AUTOINCREMENT,
+        title       TEXT,
+        details     TEXT    DEFAULT '',
+        description TEXT    DEFAULT '',
+        event_date  TEXT,
+        show_time   TEXT    DEFAULT '',
+        end_time    TEXT    DEFAULT '',
+        place       TEXT    DEFAULT '',
+        location    TEXT    DEFAULT '',
+        price       TEXT    DEFAULT '',
+        category    TEXT    DEFAULT '',
+        source_url  TEXT    DEFAULT '',
+        source_name TEXT    DEFAULT '',
+        is_kids     INTEGER DEFAULT 0,
+        created_at  TEXT    DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+# Колонки, которых может не быть в старых БД (ALTER TABLE ADD COLUMN)
+EVENTS_COLUMN_MIGRATIONS = [
+    ("end_time",   "TEXT DEFAULT ''"),
+    ("is_kids",    "INTEGER DEFAULT 0"),
+    ("created_at", "TEXT"),
+]
+
+# version → statements. Все горячие запросы фильтруют по event_date и сортируют
+# по TIME_ORDER_SQL (show_time), поэтому show_time — хвост составных индексов.
+# free/kids — частичные индексы: условия price = 'Бесплатно' / is_kids = 1
+# пишутся в запросах литералами, планировщик их сопоставляет.
+EVENTS_INDEX_VERSIONS: list[tuple[int, list[str]]] = [
+    (1, [
+        "CREATE INDEX IF NOT EXISTS idx_events_date_cat_time ON events(event_date, category, show_time)",
+        "CREATE INDEX IF NOT EXISTS idx_events_free_date_time ON events(event_date, show_time) "
+        "WHERE price = 'Бесплатно'",
+        "CREATE INDEX IF NOT EXISTS idx_events_kids_date_time ON events(event_date, show_time) "
+        "WHERE is_kids = 1",
+        "CREATE INDEX IF NOT EXISTS idx_events_source_date ON events(source_name, event_date)",
+        "CREATE INDEX IF NOT EXISTS idx_events_source_url ON events(source_url)",
+        "CREATE INDEX IF NOT EXISTS idx_events_title_date ON events(title, event_date)",
+    ]),
+]
+
+EVENTS_SCHEMA_VERSION = EVENTS_INDEX_VERSIONS[-1][0]
+
+
+def _migrate_columns(conn: sqlite3.Connection):
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(events)").fetchall()}
+    for col, definition in EVENTS_COLUMN_MIGRATIONS:
+        if col not in existing:
+            conn.execute(f"ALTER TABLE events ADD COLUMN {col} {definition}")
+
+
+def ensure_events_schema(conn: sqlite3.Connection) -> int:
+    """Создаёт events, докатывает колонки, индексы и FTS-индекс. Idempotent.
+
+    Возвращает версию схемы после применения.
+    """
+    conn.execute(EVENTS_DDL)
+    _migrate_columns(conn)
+
+    current = conn.execute("PRAGMA user_version").fetchone()[0]
+    for version, statements in EVENTS_INDEX_VERSIONS:
+        if version <= current:
+            continue
+        for sql in statements:
+            conn.execute(sql)
+        conn.execute(f"PRAGMA user_version = {int(version)}")
+        current = version
+    conn.commit()
+
+    ensure_search_index(conn)
+    ensure_flash_queue(conn)
+    refresh_fingerprints(conn)
+    conn.commit()
+    return current
+
+
+# ═══════════════════════════════════════════════════════════════
+# ПРОВЕРКА ПЛАНОВ ЗАПРОСОВ
+# ═══════════════════════════════════════════════════════════════
+
+# SQL проверок собирается теми же функциями config, что и запросы api.py /
+# bot_enhanced.py, — меняется запрос, меняется и проверка. Даты и время — любые
+# фиксированные: для плана важны только условия.
+_DAY, _NEXT_DAY, _UNTIL, _NOW = "2026-01-01", "2026-01-02", "2026-01-31", "12:00"
+_SEEK_KEY = (_DAY, 0, "19:00", "", 1)     # ключ keyset-курсора второй страницы
+
+
+def _where_for(where: list[str], params: list, category: str | None) -> tuple[list[str], list]:
+    category_filter, category_params = _build_category_filter(category)
+    if category_filter:
+        return where + [category_filter], params + category_params
+    return where, params
+
+
+def _keyset_check(name: str, where: list[str], params: list, index_name: str) -> tuple[str, str, tuple, str]:
+    """Страница после курсора (fetch_events_keyset): where + ключ + LIMIT."""
+    _, page_sql = _build_keyset_sql(where, seek=True)
+    return name, page_sql, (*params, *_SEEK_KEY, 11), index_name
+
+
+def _paged_check(name: str, where: list[str], params: list, index_name: str) -> tuple[str, str, tuple, str]:
+    """OFFSET-страница (fetch_events_paged): where + LIMIT + OFFSET."""
+    _, page_sql = _build_paged_sql(where)
+    return name, page_sql, (*params, 10, 0), index_name
+
+
+def _build_plan_checks() -> list[tuple[str, str, tuple, str]]:
+    today_filter, today_params = _build_time_filter(_DAY, _DAY, _NOW)
+    upcoming_filter, upcoming_params = _build_upcoming_filter(_DAY, _NOW)
+    overnight_sql, overnight_params = _build_overnight_union(_NEXT_DAY, None, "concert")
+    date_sql, date_params = _build_date_events_sql(_DAY, _DAY, _NOW, "concert")
+    calendar_sql, calendar_params = _build_calendar_dates_sql(_DAY, _UNTIL, "cinema")
+    free_dates_sql, free_dates_params = _build_calendar_dates_sql(_DAY, _UNTIL, "free")
+    return [
+        ("bot: date + category", date_sql, tuple(date_params), "idx_events_date_cat_time"),
+        ("overnight: previous day + category", overnight_sql, tuple(overnight_params),
+         "idx_events_date_cat_time"),
+        _keyset_check("api: today + category",
+                      *_where_for(["event_date = ?", today_filter], [_DAY, *today_params], "concert"),
+                      "idx_events_date_cat_time"),
+        _keyset_check("api: upcoming + category",
+                      *_where_for(["event_date BETWEEN ? AND ?", upcoming_filter],
+                                  [_DAY, _UNTIL, *upcoming_params], "concert"),
+                      "idx_events_date_cat_time"),
+        _paged_check("api: upcoming free",
+                     *_where_for(["event_date BETWEEN ? AND ?", upcoming_filter],
+                                 [_DAY, _UNTIL, *upcoming_params], "free"),
+                     "idx_events_free_date_time"),
+        _keyset_check("api: weekend kids",
+                      *_where_for(["event_date IN (?, ?)"], [_DAY, _NEXT_DAY], "kids"),
+                      "idx_events_kids_date_time"),
+        ("api: counts by category",
+         _build_category_counts_sql(["event_date = ?", today_filter]), (_DAY, *today_params),
+         "idx_events_date_cat_time"),
+        ("api: calendar dates", calendar_sql, tuple(calendar_params), "idx_events_date_cat_time"),
+        ("api: calendar free dates", free_dates_sql, tuple(free_dates_params), "idx_events_free_date_time"),
+    ]
+
+
+# (название, SQL, params, индекс, который обязан быть в плане)
+PLAN_CHECKS: list[tuple[str, str, tuple, str]] = _build_plan_checks() + [
+    (
+        "parsers: delete by source",
+        "SELECT id FROM events WHERE source_name = ?",
+        ("relax.by",),
+        "idx_events_source_date",
+    ),
+    (
+        "parsers: dedup fingerprints by dates",
+        "SELECT title_key, event_date, place_key, show_time FROM event_fingerprints "
+        "WHERE event_date IN (?, ?) AND source_name != ?",
+        ("2026-01-01", "2026-01-02", "bycard.by"),
+        "idx_fp_date_source",
+    ),
+]
+
+
+def check_query_plans(conn: sqlite3.Connection) -> list[str]:
+    """Прогоняет EXPLAIN QUERY PLAN для PLAN_CHECKS. Возвращает список проблем (пусто — всё ок)."""
+    problems: list[str] = []
+    for name, sql, params, index_name in PLAN_CHECKS:
+        plan = " | ".join(row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params))
+        if index_name not in plan:
+            problems.append(f"{name}: ожидался {index_name}, план: {plan}")
+    return problems
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "check":
+        check_conn = sqlite3.connect(":memory:")
+        if len(sys.argv) > 2:
+            # Переносим схему events из реальной БД (без данных) и докатываем индексы
+            with sqlite3.connect(sys.argv[2]) as src:
+                row = src.execute(
+                    "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'events'"
+                ).fetchone()
+            if row:
+                check_conn.execute(row[0])
+        version = ensure_events_schema(check_conn)
+        failures = check_query_plans(check_conn)
+        print(f"schema version: {version}, checks: {len(PLAN_CHECKS)}, failed: {len(failures)}")
+        for failure in failures:
+            print(f"  ❌ {failure}")
+        sys.exit(1 if failures else 0)
+    else:
+        print("Использование: python db_schema.py check [db_path]")
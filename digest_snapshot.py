@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Снимок дайджеста: сообщения подписчикам и посты канала, собранные один раз.
+
+Раньше send_subscriptions_digest на каждую пару (категория, date_type) отдельно
+ходил в БД через run_db и группировал события внутри цикла рассылки, а
+post_to_channel через пять минут заново читал и группировал те же события
+«сегодня». Теперь сборка (bot_enhanced.build_digest_snapshot) за один проход
+в потоке БД материализует DigestSnapshot:
+
+  - DigestMessage на каждую пару (category, date_type), у которой есть
+    подписчики, — готовый HTML (None — событий нет, не отправляем);
+  - ChannelPost для today / weekend — готовый текст поста.
+
+Рассылка и публикация в канал только читают снимок. DigestStore хранит
+последний снимок; он годен, пока не сменился день Минска, не изменились
+данные (поколение listing_cache — сброс после парсеров и модерации) и не
+прошло DIGEST_SNAPSHOT_TTL_MINUTES: «сегодня» отсекает прошедшие сеансы.
+"""
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+DIGEST_SNAPSHOT_TTL_MINUTES = int(os.getenv("DIGEST_SNAPSHOT_TTL_MINUTES", "30"))
+
+
+@dataclass
+class DigestMessage:
+    category: str
+    date_type: str
+    text: str
+    events_total: int
+
+
+@dataclass
+class ChannelPost:
+    post_type: str                  # today | weekend
+    text: str
+
+
+@dataclass
+class DigestSnapshot:
+    day: str                        # дата Минска, YYYY-MM-DD
+    generation: int                 # поколение listing_cache на момент сборки
+    messages: dict[tuple[str, str], Optional[DigestMessage]] = field(default_factory=dict)
+    channel: dict[str, Optional[ChannelPost]] = field(default_factory=dict)
+    built_at: float = field(default_factory=time.monotonic)
+
+    def covers(self, pairs) -> bool:
+        return all(pair in self.messages for pair in pairs)
+
+    def message(self, category: str, date_type: str) -> Optional[DigestMessage]:
+        return self.messages.get((category, date_type))
+
+
+class DigestStore:
+    def __init__(self, ttl_minutes: int = DIGEST_SNAPSHOT_TTL_MINUTES):
+        self.ttl_seconds = ttl_minutes * 60
+        self._snapshot: Optional[DigestSnapshot] = None
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.hits = 0
+
+    def get(self, day: str, generation: int) -> Optional[DigestSnapshot]:
+        """Последний снимок, если он собран сегодня, по текущим данным и не устарел."""
+        with self._lock:
+            snapshot = self._snapshot
+            if (snapshot is None or snapshot.day != day or snapshot.generation != generation
+                    or time.monotonic() - snapshot.built_at > self.ttl_seconds):
+                return None
+            self.hits += 1
+            return snapshot
+
+    def put(self, snapshot: DigestSnapshot):
+        with self._lock:
+            self._snapshot = snapshot
+            self.builds += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"builds": self.builds, "hits": self.hits,
+                    "messages": len(self._snapshot.messages) if self._snapshot else 0}
+
+
+_store: Optional[DigestStore] = None
+_store_lock = threading.Lock()
+
+
+def get_digest_store() -> DigestStore:
+    """Общий снимок дайджеста процесса бота."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = DigestStore()
+        return _store
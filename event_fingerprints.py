@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Постоянный индекс дублей: таблица event_fingerprints.
+
+На каждое событие — строка с ключами сравнения: нормализованное название
+(normalize_title), ключ площадки (normalizer.place_key), время, дата и источник. Парсерам больше не нужно
+перед сохранением читать всю events и заново нормализовать каждое название:
+load_dedup_index() берёт из event_fingerprints только даты своих событий.
+
+Синхронизация с events — триггерами (как events_fts), поэтому строка
+появляется, меняется и удаляется в той же транзакции, что и событие, кто бы
+ни писал в events. normalize_title и place_key — Python, в триггере их нет:
+триггер вставляет строку с title_key = NULL (и сбрасывает его при смене
+названия или места), а refresh_fingerprints() досчитывает оба ключа таких строк. Парсеры вызывают её перед commit своей записи, остальные
+писатели (бот, API) — досчитываются при следующей загрузке индекса.
+
+При изменении normalize_title или place_key поднимаем FINGERPRINT_VERSION —
+все ключи пересчитаются один раз.
+"""
+import logging
+import sqlite3
+from typing import Iterable, Optional
+
+from normalizer import DedupIndex, normalize_titles, place_key
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_TABLE = "event_fingerprints"
+FINGERPRINT_VERSION = 2  # 2: place_key
+
+# Сколько дат в одном IN (...) — ниже лимита переменных SQLite
+_DATES_CHUNK = 500
+
+_FINGERPRINT_DDL = [
+    f"""
+    CREATE TABLE IF NOT EXISTS {FINGERPRINT_TABLE} (
+        event_id    INTEGER PRIMARY KEY,
+        source_name TEXT,
+        event_date  TEXT,
+        place       TEXT DEFAULT '',
+        show_time   TEXT DEFAULT '',
+        title_key   TEXT,           -- normalize_title(title); NULL — ещё не посчитан
+        place_key   TEXT            -- place_key(place); считается вместе с title_key
+    )
+    """,
+    f"CREATE INDEX IF NOT EXISTS idx_fp_date_source ON {FINGERPRINT_TABLE}(event_date, source_name)",
+    f"CREATE INDEX IF NOT EXISTS idx_fp_pending ON {FINGERPRINT_TABLE}(event_id) WHERE title_key IS NULL",
+    f"""
+    CREATE TABLE IF NOT EXISTS {FINGERPRINT_TABLE}_meta (
+        key   TEXT PRIMARY KEY,
+        value TEXT
+    )
+    """,
+]
+
+_FINGERPRINT_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS events_fp_ai AFTER INSERT ON events BEGIN
+        INSERT OR REPLACE INTO {FINGERPRINT_TABLE}
+            (event_id, source_name, event_date, place, show_time, title_key)
+        VALUES (new.id, new.source_name, new.event_date,
+                COALESCE(new.place, ''), COALESCE(new.show_time, ''), NULL);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS events_fp_ad AFTER DELETE ON events BEGIN
+        DELETE FROM {FINGERPRINT_TABLE} WHERE event_id = old.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS events_fp_au
+    AFTER UPDATE OF title, event_date, place, show_time, source_name ON events BEGIN
+        UPDATE {FINGERPRINT_TABLE} SET
+            source_name = new.source_name,
+            event_date  = new.event_date,
+            place       = COALESCE(new.place, ''),
+            show_time   = COALESCE(new.show_time, ''),
+            title_key   = CASE WHEN new.title IS old.title AND new.place IS old.place
+                               THEN title_key ELSE NULL END
+        WHERE event_id = new.id;
+    END
+    """,
+]
+
+_FINGERPRINT_TRIGGER_NAMES = ("events_fp_ai", "events_fp_ad", "events_fp_au")
+
+_BACKFILL_SQL = f"""
+    INSERT OR IGNORE INTO {FINGERPRINT_TABLE}
+        (event_id, source_name, event_date, place, show_time, title_key)
+    SELECT id, source_name, event_date, COALESCE(place, ''), COALESCE(show_time, ''), NULL
+    FROM events
+"""
+
+
+def ensure_fingerprints(conn: sqlite3.Connection) -> bool:
+    """Создаёт event_fingerprints и триггеры синхронизации. Idempotent, без commit.
+
+    При первом создании (или смене FINGERPRINT_VERSION) таблица заполняется
+    из events с title_key = NULL — ключи досчитает refresh_fingerprints();
+    триггеры при смене версии пересоздаются.
+    Возвращает False, если таблицы events ещё нет.
+    """
+    has_events = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'events'"
+    ).fetchone()
+    if not has_events:
+        return False
+    for sql in _FINGERPRINT_DDL:
+        conn.execute(sql)
+    columns = {r[1] for r in conn.execute(f"PRAGMA table_info({FINGERPRINT_TABLE})")}
+    if "place_key" not in columns:
+        conn.execute(f"ALTER TABLE {FINGERPRINT_TABLE} ADD COLUMN place_key TEXT")
+
+    row = conn.execute(
+        f"SELECT value FROM {FINGERPRINT_TABLE}_meta WHERE key = 'version'"
+    ).fetchone()
+    outdated = row is None or row[0] != str(FINGERPRINT_VERSION)
+    if outdated:
+        for name in _FINGERPRINT_TRIGGER_NAMES:
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+    for trigger_sql in _FINGERPRINT_TRIGGERS:
+        conn.execute(trigger_sql)
+
+    if outdated:
+        conn.execute(f"UPDATE {FINGERPRINT_TABLE} SET title_key = NULL")
+        conn.execute(_BACKFILL_SQL)
+        conn.execute(
+            f"INSERT OR REPLACE INTO {FINGERPRINT_TABLE}_meta (key, value) VALUES ('version', ?)",
+            (str(FINGERPRINT_VERSION),),
+        )
+    return True
+
+
+def refresh_fingerprints(conn: sqlite3.Connection) -> int:
+    """Досчитывает title_key и place_key для новых и изменённых событий. Без commit —
+    вызывается внутри транзакции записи, перед её commit.
+
+    Возвращает число обновлённых строк.
+    """
+    if not ensure_fingerprints(conn):
+        return 0
+    rows = conn.execute(f"""
+        SELECT f.event_id, e.title, e.place
+        FROM {FINGERPRINT_TABLE} f JOIN events e ON e.id = f.event_id
+        WHERE f.title_key IS NULL
+    """).fetchall()
+    if not rows:
+        return 0
+    keys = normalize_titles(title or "" for _, title, _ in rows)
+    conn.executemany(
+        f"UPDATE {FINGERPRINT_TABLE} SET title_key = ?, place_key = ? WHERE event_id = ?",
+        [(key, place_key(place or ""), event_id) for key, (event_id, _, place) in zip(keys, rows)],
+    )
+    return len(rows)
+
+
+def load_dedup_index(
+    conn: sqlite3.Connection,
+    exclude_source: str,
+    dates: Optional[Iterable[str]] = None,
+    similarity: Optional[float] = None,
+) -> DedupIndex:
+    """DedupIndex событий других источников только на даты dates (None — все даты).
+
+    Ключи берутся готовыми из event_fingerprints — названия не нормализуются
+    заново. Ключи, не посчитанные другими писателями, досчитываются и
+    коммитятся здесь же.
+    """
+    refreshed = refresh_fingerprints(conn)
+    if conn.in_transaction:
+        conn.commit()
+    if refreshed:
+        logger.info(f"event_fingerprints: досчитано ключей: {refreshed}")
+
+    index = DedupIndex(similarity=similarity)
+    select = f"SELECT title_key, event_date, place_key, show_time FROM {FINGERPRINT_TABLE} WHERE "
+    if dates is None:
+        queries = [(select + "source_name != ?", (exclude_source,))]
+    else:
+        dates = sorted({d for d in dates if d})
+        queries = []
+        for start in range(0, len(dates), _DATES_CHUNK):
+            chunk = dates[start:start + _DATES_CHUNK]
+            marks = ",".join("?" * len(chunk))
+            queries.append((select + f"event_date IN ({marks}) AND source_name != ?", (*chunk, exclude_source)))
+
+    for sql, params in queries:
+        for title_key, event_date, place_norm, show_time in conn.execute(sql, params):
+            index.add("", event_date, show_time=show_time,
+                      norm=title_key or "", place_norm=place_norm or "")
+    return index
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Сохранение событий парсера сравнением с текущими строками (upsert по разнице).
+
+Раньше каждый парсер делал DELETE всех своих строк и INSERT заново: id менялись
+на каждом запуске (ломались ссылки event_attendees.event_id), WAL и свободные
+страницы росли на весь объём источника. upsert_events() сравнивает новый список
+с текущими строками своей области (scope — например, source_name = ?):
+
+  - идентичность события — (source_name, source_url, event_date, show_time);
+    несколько событий с одним ключом сопоставляются сначала по полному
+    совпадению полей, остальные — по порядку;
+  - совпало всё — строку не трогаем;
+  - ключ тот же, поля другие — UPDATE той же строки (id сохраняется);
+  - новых нет в БД — INSERT, строк нет в новом списке — DELETE.
+
+Перед записью события проверяются (validate_event): строки без названия, с
+кривой датой или временем не роняют запись, а возвращаются в UpsertStats.rejected
+с причиной. Изменения применяются executemany пачками по CHUNK_SIZE в одной
+явной транзакции (BEGIN IMMEDIATE — блокировка записи берётся до чтения текущих
+строк) вместе с ключами дублей (event_fingerprints); is_kids, created_at и прочие
+колонки, которые парсеры не пишут, не затрагиваются. bulk_connection() открывает
+соединение с прагмами для пакетной записи.
+"""
+import logging
+import re
+import sqlite3
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import date
+
+from event_fingerprints import refresh_fingerprints
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 500
+
+# Соединение парсера живёт одну запись: WAL-режим уже выставлен ботом,
+# synchronous=NORMAL в WAL не теряет целостность, только последний commit при сбое ОС
+BULK_PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -65536",     # 64 MB
+    "PRAGMA busy_timeout = 30000",
+)
+
+# Колонки events, которые пишут парсеры
+EVENT_FIELDS = (
+    "title", "details", "description", "event_date", "show_time",
+    "place", "location", "price", "category", "source_url", "source_name",
+)
+
+_KEY_FIELDS = ("source_name", "source_url", "event_date", "show_time")
+_KEY_POSITIONS = tuple(EVENT_FIELDS.index(f) for f in _KEY_FIELDS)
+
+_INSERT_SQL = (
+    f"INSERT INTO events ({', '.join(EVENT_FIELDS)}) "
+    f"VALUES ({', '.join('?' * len(EVENT_FIELDS))})"
+)
+_UPDATE_SQL = f"UPDATE events SET {', '.join(f'{f} = ?' for f in EVENT_FIELDS)} WHERE id = ?"
+_DELETE_SQL = "DELETE FROM events WHERE id = ?"
+
+
+_DATE_RE = re.compile(r"\d{4}-\d{2}-\d{2}")
+_TIME_RE = re.compile(r"\d{1,2}:\d{2}")
+
+
+def validate_event(ev: dict) -> str:
+    """Причина, по которой событие нельзя записать; '' — событие в порядке."""
+    for f in EVENT_FIELDS:
+        value = ev.get(f)
+        if value is not None and not isinstance(value, str):
+            return f"{f}: ожидалась строка, получено {type(value).__name__}"
+    if not (ev.get("title") or "").strip():
+        return "нет названия"
+    if not ev.get("source_name"):
+        return "нет source_name"
+    event_date = ev.get("event_date") or ""
+    if not _DATE_RE.fullmatch(event_date):
+        return f"дата {event_date!r} не YYYY-MM-DD"
+    try:
+        date.fromisoformat(event_date)
+    except ValueError:
+        return f"несуществующая дата {event_date!r}"
+    show_time = ev.get("show_time") or ""
+    if show_time and not _TIME_RE.fullmatch(show_time):
+        return f"время {show_time!r} не HH:MM"
+    return ""
+
+
+def validate_events(events: list[dict]) -> tuple[list[dict], list[tuple[dict, str]]]:
+    """Делит события на годные и отбракованные (событие, причина)."""
+    good, bad = [], []
+    for ev in events:
+        reason = validate_event(ev)
+        if reason:
+            bad.append((ev, reason))
+        else:
+            good.append(ev)
+    return good, bad
+
+
+@contextmanager
+def bulk_connection(db_path: str):
+    """Соединение для пакетной записи парсера (BULK_PRAGMAS), закрывается на выходе."""
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        for pragma in BULK_PRAGMAS:
+            conn.execute(pragma)
+        yield conn
+    finally:
+        conn.close()
+
+
+def _executemany(conn: sqlite3.Connection, sql: str, rows: list[tuple]):
+    for start in range(0, len(rows), CHUNK_SIZE):
+        conn.executemany(sql, rows[start:start + CHUNK_SIZE])
+
+
+@dataclass
+class UpsertStats:
+    inserted: int = 0
+    updated: int = 0
+    deleted: int = 0
+    unchanged: int = 0
+    rejected: list[tuple[dict, str]] = field(default_factory=list)  # (событие, причина)
+
+    @property
+    def saved(self) -> int:
+        """Событий источника в БД после записи."""
+        return self.inserted + self.updated + self.unchanged
+
+    def written(self, events: list[dict]) -> list[dict]:
+        """События из events, которые записаны (не отбракованы validate_event)."""
+        rejected = {id(ev) for ev, _ in self.rejected}
+        return [ev for ev in events if id(ev) not in rejected]
+
+    @property
+    def changed(self) -> int:
+        return self.inserted + self.updated + self.deleted
+
+    def __str__(self) -> str:
+        text = (f"+{self.inserted} ~{self.updated} -{self.deleted} "
+                f"(без изменений {self.unchanged})")
+        if self.rejected:
+            text += f", отбраковано {len(self.rejected)}"
+        return text
+
+
+def _comparable(values: tuple) -> tuple:
+    # NULL и '' для парсеров — одно и то же
+    return tuple("" if v is None else v for v in values)
+
+
+def _key(values: tuple) -> tuple:
+    return tuple("" if values[i] is None else values[i] for i in _KEY_POSITIONS)
+
+
+def upsert_events(
+    conn: sqlite3.Connection,
+    events: list[dict],
+    scope: str,
+    params: tuple = (),
+    commit: bool = True,
+) -> UpsertStats:
+    """
+    Приводит строки events в области scope (SQL-условие WHERE с params) к списку
+    events. Возвращает счётчики изменений; события, не прошедшие validate_event,
+    не пишутся и возвращаются в stats.rejected.
+
+    commit=False — без commit (вызывающий продолжает транзакцию сам).
+    """
+    stats = UpsertStats()
+    events, stats.rejected = validate_events(events)
+    for ev, reason in stats.rejected[:10]:
+        logger.warning(f"  отбраковано: {ev.get('title')!r} {ev.get('event_date')!r} — {reason}")
+    if len(stats.rejected) > 10:
+        logger.warning(f"  ... и ещё {len(stats.rejected) - 10} отбракованных событий")
+
+    if not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+
+    existing: dict[tuple, list[tuple[int, tuple]]] = defaultdict(list)
+    rows = conn.execute(
+        f"SELECT id, {', '.join(EVENT_FIELDS)} FROM events WHERE {scope}", params
+    ).fetchall()
+    for row in rows:
+        values = tuple(row[1:])
+        existing[_key(values)].append((row[0], _comparable(values)))
+
+    incoming: dict[tuple, list[tuple]] = defaultdict(list)
+    for ev in events:
+        values = tuple(ev.get(f) for f in EVENT_FIELDS)
+        incoming[_key(values)].append(values)
+
+    inserts: list[tuple] = []
+    updates: list[tuple] = []
+    deletes: list[tuple] = []
+
+    for key, new_rows in incoming.items():
+        old_rows = existing.pop(key, [])
+        # 1. Полные совпадения — без записи
+        by_values: dict[tuple, list[int]] = defaultdict(list)
+        for i, values in enumerate(new_rows):
+            by_values[_comparable(values)].append(i)
+        stale_ids = []
+        for row_id, values in old_rows:
+            same = by_values.get(values)
+            if same:
+                same.pop()
+                stats.unchanged += 1
+            else:
+                stale_ids.append(row_id)
+        pending = [new_rows[i] for i in sorted(i for idxs in by_values.values() for i in idxs)]
+        # 2. Тот же ключ, другие поля — UPDATE строки; остаток — INSERT / DELETE
+        for row_id, values in zip(stale_ids, pending):
+            updates.append((*values, row_id))
+        inserts.extend(pending[len(stale_ids):])
+        deletes.extend((row_id,) for row_id in stale_ids[len(pending):])
+
+    for old_rows in existing.values():
+        deletes.extend((row_id,) for row_id, _ in old_rows)
+
+    try:
+        _executemany(conn, _DELETE_SQL, deletes)
+        _executemany(conn, _UPDATE_SQL, updates)
+        _executemany(conn, _INSERT_SQL, inserts)
+        if inserts or updates:
+            refresh_fingerprints(conn)
+        if commit:
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    stats.inserted, stats.updated, stats.deleted = len(inserts), len(updates), len(deletes)
+    return stats
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Инкрементальная проверка флеш-подписок.
+
+Раньше check_flash_subscriptions после каждого парсинга на каждую подписку
+отдельно читал last_notified_at и гонял полнотекстовый поиск по всем
+актуальным событиям с NOT EXISTS по flash_ignored_matches — O(подписки ×
+события). Теперь:
+
+  - очередь изменений flash_event_queue заполняется триггерами на events
+    (как events_fts и event_fingerprints — кто бы ни писал в events):
+    новое событие или изменённые title / details. Для изменённого события
+    в очереди остаются title и details до первого изменения — подписка,
+    которой событие уже подходило, повторно не уведомляется;
+  - QueryIndex — префиксное дерево слов всех запросов: слова события один раз
+    проходят по дереву, подписка совпала, если нашлись все её слова.
+    Семантика та же, что у поиска (search_index): каждое слово запроса —
+    префикс какого-то слова в title или details, регистр и диакритики — как
+    у events_fts (fold_tokens);
+  - совпадения собираются в FlashBatch — по одному на пользователя, внутри
+    подписки со списком событий.
+
+Подписка, которую матчер ещё не видел (checked_at пуст), один раз проверяется
+полным поиском у вызывающего — дальше ей приходят только изменения из очереди.
+"""
+import sqlite3
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+from search_index import fold_tokens
+
+FLASH_QUEUE_TABLE = "flash_event_queue"
+
+_FLASH_QUEUE_DDL = f"""
+    CREATE TABLE IF NOT EXISTS {FLASH_QUEUE_TABLE} (
+        event_id    INTEGER PRIMARY KEY,
+        seq         INTEGER NOT NULL,
+        old_title   TEXT,           -- NULL — событие новое
+        old_details TEXT
+    )
+"""
+
+# seq — номер изменения: ack_changes() удаляет строку, только если после
+# чтения событие не менялось ещё раз
+_NEXT_SEQ = f"(SELECT COALESCE(MAX(seq), 0) + 1 FROM {FLASH_QUEUE_TABLE})"
+
+_FLASH_QUEUE_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS events_flash_ai AFTER INSERT ON events BEGIN
+        INSERT OR REPLACE INTO {FLASH_QUEUE_TABLE} (event_id, seq, old_title, old_details)
+        VALUES (new.id, {_NEXT_SEQ}, NULL, NULL);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS events_flash_ad AFTER DELETE ON events BEGIN
+        DELETE FROM {FLASH_QUEUE_TABLE} WHERE event_id = old.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS events_flash_au
+    AFTER UPDATE OF title, details ON events
+    WHEN new.title IS NOT old.title OR new.details IS NOT old.details BEGIN
+        INSERT INTO {FLASH_QUEUE_TABLE} (event_id, seq, old_title, old_details)
+        VALUES (new.id, {_NEXT_SEQ}, COALESCE(old.title, ''), COALESCE(old.details, ''))
+        ON CONFLICT(event_id) DO UPDATE SET seq = excluded.seq;
+    END
+    """,
+]
+
+_CHANGES_SQL = f"""
+    SELECT q.event_id, q.seq, q.old_title, q.old_details,
+           e.id, e.title, e.details, e.event_date, e.show_time, e.place,
+           e.price, e.category, e.source_url
+    FROM {FLASH_QUEUE_TABLE} q
+    LEFT JOIN events e ON e.id = q.event_id
+"""
+
+
+def ensure_flash_queue(conn: sqlite3.Connection):
+    """Создаёт flash_event_queue и триггеры на events. Idempotent."""
+    conn.execute(_FLASH_QUEUE_DDL)
+    for trigger_sql in _FLASH_QUEUE_TRIGGERS:
+        conn.execute(trigger_sql)
+    conn.commit()
+
+
+@dataclass
+class EventChange:
+    event: dict                        # поля события для сообщения
+    old_text: Optional[str] = None     # title + details до изменения; None — новое событие
+
+
+def read_changes(conn: sqlite3.Connection, today: str) -> tuple[list[EventChange], list[tuple[int, int]]]:
+    """Изменения актуальных событий из очереди и (event_id, seq) всех прочитанных строк для ack."""
+    changes, acks = [], []
+    for row in conn.execute(_CHANGES_SQL).fetchall():
+        acks.append((row["event_id"], row["seq"]))
+        if row["id"] is None or (row["event_date"] or "") < today:
+            continue
+        event = {k: row[k] for k in ("id", "title", "details", "event_date", "show_time",
+                                     "place", "price", "category", "source_url")}
+        old_text = None
+        if row["old_title"] is not None:
+            old_text = f"{row['old_title']} {row['old_details'] or ''}"
+        changes.append(EventChange(event=event, old_text=old_text))
+    return changes, acks
+
+
+def ack_changes(conn: sqlite3.Connection, acks: Iterable[tuple[int, int]]):
+    """Убирает из очереди обработанные изменения (событие, изменённое ещё раз, остаётся)."""
+    conn.executemany(
+        f"DELETE FROM {FLASH_QUEUE_TABLE} WHERE event_id = ? AND seq = ?",
+        list(acks),
+    )
+
+
+class QueryIndex:
+    """Префиксное дерево слов всех запросов подписок."""
+
+    _END = ""   # ключ узла со словами, которые на нём заканчиваются
+
+    def __init__(self, subs: Iterable):
+        self._root: dict = {}
+        self._token_subs: dict[str, list[int]] = defaultdict(list)
+        self._need: dict[int, int] = {}       # sub_id → сколько разных слов в запросе
+        for sub in subs:
+            tokens = set(fold_tokens(sub["query"]))
+            if not tokens:
+                continue
+            self._need[sub["id"]] = len(tokens)
+            for token in tokens:
+                if token not in self._token_subs:
+                    node = self._root
+                    for ch in token:
+                        node = node.setdefault(ch, {})
+                    node[self._END] = token
+                self._token_subs[token].append(sub["id"])
+
+    def __len__(self) -> int:
+        return len(self._need)
+
+    def _query_tokens_in(self, words: set[str]) -> set[str]:
+        """Слова запросов, которые — префикс хотя бы одного из words."""
+        found: set[str] = set()
+        for word in words:
+            node = self._root
+            for ch in word:
+                node = node.get(ch)
+                if node is None:
+                    break
+                token = node.get(self._END)
+                if token is not None:
+                    found.add(token)
+        return found
+
+    def match(self, text: str) -> set[int]:
+        """id подписок, все слова которых нашлись в text."""
+        counts: dict[int, int] = defaultdict(int)
+        for token in self._query_tokens_in(set(fold_tokens(text))):
+            for sub_id in self._token_subs[token]:
+                counts[sub_id] += 1
+        return {sub_id for sub_id, n in counts.items() if n == self._need[sub_id]}
+
+
+def match_changes(index: QueryIndex, changes: Iterable[EventChange]) -> dict[int, list[dict]]:
+    """sub_id → события, которые начали подходить подписке (новые или изменённые)."""
+    matched: dict[int, list[dict]] = defaultdict(list)
+    for change in changes:
+        event = change.event
+        subs = index.match(f"{event['title'] or ''} {event['details'] or ''}")
+        if subs and change.old_text is not None:
+            subs -= index.match(change.old_text)
+        for sub_id in subs:
+            matched[sub_id].append(event)
+    return matched
+
+
+@dataclass
+class FlashMatch:
+    subscription_id: int
+    query: str
+    events: list[dict]
+
+
+@dataclass
+class FlashBatch:
+    user_id: int
+    matches: list[FlashMatch] = field(default_factory=list)
+
+
+def group_batches(subs: Iterable, matched: dict[int, list[dict]]) -> list[FlashBatch]:
+    """Совпадения по пользователям — в порядке подписок."""
+    batches: dict[int, FlashBatch] = {}
+    for sub in subs:
+        events = matched.get(sub["id"])
+        if not events:
+            continue
+        batch = batches.setdefault(sub["user_id"], FlashBatch(user_id=sub["user_id"]))
+        batch.matches.append(FlashMatch(subscription_id=sub["id"], query=sub["query"], events=events))
+    return list(batches.values())
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Дисковый кэш HTTP-ответов для парсеров (conditional GET).
+
+На каждый URL — два файла в HTTP_CACHE_DIR: <sha1(url)>.body (тело как есть) и
+<sha1(url)>.json (ETag, Last-Modified, sha256 тела, кодировка, время загрузки).
+
+http_fetch использует кэш так:
+  - запись моложе FRESH_SECONDS отдаётся без запроса — дневная проверка
+    (daytime_update) и следующий за ней полный парс качают страницу один раз;
+  - запись старше — запрос с If-None-Match / If-Modified-Since, на 304 отдаётся
+    тело из кэша;
+  - записи старше MAX_AGE_DAYS удаляются при первом обращении к кэшу в процессе.
+
+Запись атомарная (tmp + os.replace): кэш общий для бота, cron-парсеров и daytime.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from config import DB_PATH
+
+logger = logging.getLogger(__name__)
+
+HTTP_CACHE_DIR = os.getenv(
+    "HTTP_CACHE_DIR",
+    os.path.join(os.path.dirname(DB_PATH) or ".", "http_cache"),
+)
+FRESH_SECONDS = int(os.getenv("HTTP_CACHE_FRESH_SECONDS", "600"))
+MAX_AGE_DAYS = 7
+
+
+@dataclass
+class CacheEntry:
+    url: str
+    body: bytes
+    body_sha256: str
+    etag: str = ""
+    last_modified: str = ""
+    encoding: str = ""
+    fetched_at: float = 0.0
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+
+class HttpCache:
+    def __init__(self, directory: str = HTTP_CACHE_DIR, fresh_seconds: int = FRESH_SECONDS):
+        self.directory = directory
+        self.fresh_seconds = fresh_seconds
+        self._pruned = False
+        self._lock = threading.Lock()
+
+    def _paths(self, url: str) -> tuple[str, str]:
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.directory, key)
+        return base + ".json", base + ".body"
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes):
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def load(self, url: str) -> Optional[CacheEntry]:
+        self._prune_once()
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        if meta.get("url") != url or hashlib.sha256(body).hexdigest() != meta.get("body_sha256"):
+            return None  # коллизия имени или недописанный файл
+        return CacheEntry(
+            url=url,
+            body=body,
+            body_sha256=meta["body_sha256"],
+            etag=meta.get("etag", ""),
+            last_modified=meta.get("last_modified", ""),
+            encoding=meta.get("encoding", ""),
+            fetched_at=meta.get("fetched_at", 0.0),
+        )
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        return entry.age < self.fresh_seconds
+
+    @staticmethod
+    def validators(entry: CacheEntry) -> dict:
+        """Заголовки conditional GET для записи (пусто — сервер не дал валидаторов)."""
+        headers = {}
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def store(self, url: str, body: bytes, etag: str = "", last_modified: str = "",
+              encoding: str = "") -> CacheEntry:
+        entry = CacheEntry(
+            url=url,
+            body=body,
+            body_sha256=hashlib.sha256(body).hexdigest(),
+            etag=etag or "",
+            last_modified=last_modified or "",
+            encoding=encoding or "",
+            fetched_at=time.time(),
+        )
+        self._save(entry, with_body=True)
+        return entry
+
+    def touch(self, entry: CacheEntry) -> CacheEntry:
+        """Ответ 304: тело прежнее, обновляем только время проверки."""
+        entry.fetched_at = time.time()
+        self._save(entry, with_body=False)
+        return entry
+
+    def _save(self, entry: CacheEntry, with_body: bool):
+        meta_path, body_path = self._paths(entry.url)
+        meta = {
+            "url": entry.url,
+            "etag": entry.etag,
+            "last_modified": entry.last_modified,
+            "body_sha256": entry.body_sha256,
+            "encoding": entry.encoding,
+            "fetched_at": entry.fetched_at,
+        }
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            if with_body:
+                self._write_atomic(body_path, entry.body)
+            else:
+                os.utime(body_path)  # чтобы _prune_once не удалил тело живой записи
+            self._write_atomic(meta_path, json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+        except OSError as e:
+            logger.warning(f"http_cache: не удалось записать {entry.url}: {e}")
+
+    def _prune_once(self):
+        with self._lock:
+            if self._pruned:
+                return
+            self._pruned = True
+        cutoff = time.time() - MAX_AGE_DAYS * 86400
+        removed = 0
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                pass
+        if removed:
+            logger.info(f"http_cache: удалено устаревших файлов: {removed}")
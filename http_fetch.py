@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Общий HTTP-слой парсеров на httpx.
+
+Один httpx.AsyncClient на процесс живёт в отдельном потоке с event loop'ом:
+  - keep-alive соединения переиспользуются между запросами к одному хосту;
+  - одновременных запросов не больше MAX_CONNECTIONS всего и MAX_PER_HOST на хост;
+  - вежливость — token bucket на домен (HOST_RATES), а не фиксированный time.sleep;
+  - повтор при сетевых ошибках и 429/5xx с экспоненциальной задержкой и jitter;
+  - хуки ответа на хост: например, bycard отдаёт страницу Verification с cookie
+    hg-security, hg_security_hook ставит cookie и запрос повторяется;
+  - дисковый кэш (http_cache): свежая запись отдаётся без запроса, иначе —
+    conditional GET (If-None-Match / If-Modified-Since), на 304 — тело из кэша.
+
+Парсеры синхронные (работают в потоках run_sources), поэтому наружу — get() и
+get_many(): корутины выполняются в общем loop'е, вызывающий поток ждёт результат.
+get_many() грузит список URL параллельно и возвращает тексты в том же порядке
+(None — страница не загрузилась).
+"""
+import asyncio
+import logging
+import os
+import random
+import re
+import threading
+import time
+from typing import Awaitable, Callable, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from http_cache import HTTP_CACHE_DIR, HttpCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/120.0.0.0 Safari/537.36"
+    ),
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7",
+}
+
+REQUEST_TIMEOUT = 30
+MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "16"))
+MAX_PER_HOST = int(os.getenv("HTTP_MAX_PER_HOST", "4"))
+
+RETRIES = 3
+RETRY_BASE_DELAY = 1.0          # сек, удваивается с каждой попыткой, ±50% jitter
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# host → (запросов в секунду, burst)
+HOST_RATES: dict[str, tuple[float, int]] = {
+    "afisha.relax.by":  (3.0, 3),
+    "www.ticketpro.by": (2.0, 2),
+    "bezkassira.by":    (1.0, 2),
+    "bycard.by":        (3.0, 3),
+}
+DEFAULT_RATE = (2.0, 2)
+
+# (client, response) → True, если запрос нужно повторить (хук поправил состояние клиента)
+ResponseHook = Callable[[httpx.AsyncClient, httpx.Response], Awaitable[bool]]
+
+
+class FetchError(Exception):
+    pass
+
+
+class TokenBucket:
+    """Token bucket: rate токенов в секунду, не больше burst в запасе."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+_HG_SECURITY_RE = re.compile(r"hg-security=([^;\"']+)")
+
+
+async def hg_security_hook(client: httpx.AsyncClient, response: httpx.Response) -> bool:
+    """bycard.by: вместо страницы отдаётся Verification, где JS ставит cookie
+    hg-security. Ставим её сами — повторный запрос проходит."""
+    text = response.text
+    if "hg-security=" not in text or "<title>Verification</title>" not in text:
+        return False
+    m = _HG_SECURITY_RE.search(text)
+    if not m:
+        return False
+    client.cookies.set("hg-security", m.group(1), domain=response.url.host, path="/")
+    logger.info(f"  {response.url.host}: verification cookie получен, повторяю запрос")
+    return True
+
+
+class HttpFetcher:
+    def __init__(
+        self,
+        headers: Optional[dict] = None,
+        timeout: float = REQUEST_TIMEOUT,
+        max_connections: int = MAX_CONNECTIONS,
+        max_per_host: int = MAX_PER_HOST,
+        host_rates: Optional[dict[str, tuple[float, int]]] = None,
+        cache: Optional[HttpCache] = None,
+    ):
+        self.headers = dict(headers or DEFAULT_HEADERS)
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_per_host = max_per_host
+        self.host_rates = dict(HOST_RATES if host_rates is None else host_rates)
+        self.cache = cache
+        self._hooks: dict[str, list[ResponseHook]] = {}
+        self._buckets: dict[str, TokenBucket] = {}
+        self._host_slots: dict[str, asyncio.Semaphore] = {}
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._start_lock = threading.Lock()
+
+    def add_hook(self, host: str, hook: ResponseHook):
+        self._hooks.setdefault(host, []).append(hook)
+
+    # ── loop / client ──
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="http-fetch", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # Вызывается только из потока loop'а — без блокировки
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                headers=self.headers,
+                timeout=httpx.Timeout(self.timeout, pool=None),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                follow_redirects=True,
+            )
+        return self._client
+
+    def _bucket(self, host: str) -> TokenBucket:
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = TokenBucket(*self.host_rates.get(host, DEFAULT_RATE))
+            self._buckets[host] = bucket
+        return bucket
+
+    def _slot(self, host: str) -> asyncio.Semaphore:
+        slot = self._host_slots.get(host)
+        if slot is None:
+            slot = asyncio.Semaphore(max(1, self.max_per_host))
+            self._host_slots[host] = slot
+        return slot
+
+    # ── async API ──
+
+    async def fetch(
+        self,
+        url: str,
+        *,
+        headers: Optional[dict] = None,
+        retries: int = RETRIES,
+        encoding: Optional[str] = "utf-8",
+        use_cache: bool = True,
+    ) -> str:
+        """Текст страницы или FetchError после всех попыток.
+
+        encoding=None — кодировка из заголовков ответа (httpx).
+        use_cache=False — мимо дискового кэша.
+        """
+        host = urlsplit(url).hostname or ""
+        cache = self.cache if use_cache else None
+        entry = cache.load(url) if cache else None
+        if entry and cache.is_fresh(entry):
+            logger.info(f"Из кэша {url} ({entry.age:.0f} сек назад)")
+            return self._decode(entry.body, encoding, entry.encoding)
+
+        request_headers = dict(headers or {})
+        if entry:
+            request_headers.update(cache.validators(entry))
+
+        client = self._get_client()
+        last_error: Optional[FetchError] = None
+
+        for attempt in range(retries):
+            retry_after = 0.0
+            try:
+                async with self._slot(host):
+                    await self._bucket(host).acquire()
+                    resp = await client.get(url, headers=request_headers)
+                    for hook in self._hooks.get(host, ()):
+                        if await hook(client, resp):
+                            await self._bucket(host).acquire()
+                            resp = await client.get(url, headers=request_headers)
+
+                if resp.status_code == 304 and entry:
+                    cache.touch(entry)
+                    logger.info(f"Не изменилась (304) {url}")
+                    return self._decode(entry.body, encoding, entry.encoding)
+
+                if resp.status_code == 200:
+                    body = resp.content
+                    if cache:
+                        stored = cache.store(
+                            url, body,
+                            etag=resp.headers.get("ETag", ""),
+                            last_modified=resp.headers.get("Last-Modified", ""),
+                            encoding=resp.encoding or "",
+                        )
+                        if entry and stored.body_sha256 == entry.body_sha256:
+                            logger.info(f"Не изменилась (hash) {url}")
+                    text = self._decode(body, encoding, resp.encoding)
+                    logger.info(f"Загружено {url} ({len(text)} символов)")
+                    return text
+
+                last_error = FetchError(f"HTTP {resp.status_code}: {url}")
+                if resp.status_code not in RETRY_STATUSES:
+                    break
+                try:
+                    retry_after = float(resp.headers.get("Retry-After", 0))
+                except ValueError:
+                    retry_after = 0.0
+            except httpx.HTTPError as e:
+                last_error = FetchError(f"{type(e).__name__}: {url} — {e}")
+
+            if attempt < retries - 1:
+                delay = max(retry_after, RETRY_BASE_DELAY * 2 ** attempt * random.uniform(0.5, 1.5))
+                logger.warning(f"Попытка {attempt + 1}/{retries}: {last_error}; повтор через {delay:.1f} сек")
+                await asyncio.sleep(delay)
+
+        raise last_error or FetchError(f"не загружено: {url}")
+
+    @staticmethod
+    def _decode(body: bytes, encoding: Optional[str], response_encoding: Optional[str]) -> str:
+        return body.decode(encoding or response_encoding or "utf-8", errors="replace")
+
+    async def fetch_many(self, urls: list[str], **kwargs) -> list:
+        """Параллельно; в результате — текст или исключение на месте каждого URL."""
+        return await asyncio.gather(*(self.fetch(url, **kwargs) for url in urls), return_exceptions=True)
+
+    # ── sync API (для парсеров в потоках) ──
+
+    def get(self, url: str, *, raise_errors: bool = False, **kwargs) -> Optional[str]:
+        future = asyncio.run_coroutine_threadsafe(self.fetch(url, **kwargs), self._ensure_loop())
+        try:
+            return future.result()
+        except Exception as e:
+            if raise_errors:
+                raise
+            logger.warning(f"Не удалось загрузить {url}: {e}")
+            return None
+
+    def get_many(self, urls: list[str], **kwargs) -> list[Optional[str]]:
+        if not urls:
+            return []
+        future = asyncio.run_coroutine_threadsafe(self.fetch_many(list(urls), **kwargs), self._ensure_loop())
+        pages: list[Optional[str]] = []
+        for url, result in zip(urls, future.result()):
+            if isinstance(result, BaseException):
+                logger.warning(f"Не удалось загрузить {url}: {result}")
+                pages.append(None)
+            else:
+                pages.append(result)
+        return pages
+
+
+_fetcher: Optional[HttpFetcher] = None
+_fetcher_lock = threading.Lock()
+
+
+def get_fetcher() -> HttpFetcher:
+    """Общий fetcher процесса (пулы соединений и token bucket'ы — общие для всех парсеров)."""
+    global _fetcher
+    with _fetcher_lock:
+        if _fetcher is None:
+            _fetcher = HttpFetcher(cache=HttpCache(HTTP_CACHE_DIR) if HTTP_CACHE_DIR else None)
+            _fetcher.add_hook("bycard.by", hg_security_hook)
+        return _fetcher
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Общий кэш частых экранов бота: сегодня / завтра / выходные / ближайшие × категория.
+
+Почти все пользователи открывают одни и те же десятки экранов, а каждый
+/today и каждая кнопка даты или категории заново шли в SQL, группировали
+события и форматировали HTML. ListingCache хранит готовый ResultSnapshot
+(pagination_store — строки, тексты записей, счётчики категорий) по ключу
+(date_type, category, time bucket):
+
+  - time bucket — время Минска, округлённое вниз до LISTING_BUCKET_MINUTES:
+    «сегодня» отсекает прошедшие сеансы, поэтому экран живёт не дольше
+    корзины; смена даты всегда даёт новый ключ;
+  - invalidate() — после парсеров (полный прогон и дневное обновление) и
+    одобрения события из модерации; поколение (generation) не даёт положить
+    в кэш результат запроса, начатого до сброса.
+"""
+import os
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional
+
+from pagination_store import ResultSnapshot
+
+LISTING_BUCKET_MINUTES = int(os.getenv("LISTING_BUCKET_MINUTES", "10"))
+
+
+@dataclass
+class Listing:
+    snapshot: ResultSnapshot
+    meta: dict = field(default_factory=dict)   # например, saturday/sunday для выходных
+
+
+def time_bucket(now: datetime, minutes: int = LISTING_BUCKET_MINUTES) -> str:
+    minutes = max(1, minutes)
+    minute_of_day = now.hour * 60 + now.minute
+    start = minute_of_day - minute_of_day % minutes
+    return f"{now.strftime('%Y-%m-%d')} {start // 60:02d}:{start % 60:02d}"
+
+
+class ListingCache:
+    def __init__(self, bucket_minutes: int = LISTING_BUCKET_MINUTES):
+        self.bucket_minutes = bucket_minutes
+        self._entries: dict[tuple, Listing] = {}
+        self._lock = threading.Lock()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, date_type: str, category: Optional[str], now: datetime) -> tuple:
+        return date_type, category or "all", time_bucket(now, self.bucket_minutes)
+
+    def get(self, date_type: str, category: Optional[str], now: datetime) -> Optional[Listing]:
+        with self._lock:
+            listing = self._entries.get(self._key(date_type, category, now))
+            if listing is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return listing
+
+    def put(self, date_type: str, category: Optional[str], now: datetime,
+            listing: Listing, generation: int) -> bool:
+        """Кладёт экран, если с начала его загрузки (generation) не было invalidate()."""
+        key = self._key(date_type, category, now)
+        with self._lock:
+            if generation != self.generation:
+                return False
+            # Экраны прошлых корзин больше не запросят — не держим их
+            for stale in [k for k in self._entries if k[2] != key[2]]:
+                del self._entries[stale]
+            self._entries[key] = listing
+            return True
+
+    def invalidate(self) -> int:
+        """Сбрасывает все экраны (данные в events изменились). Возвращает их число."""
+        with self._lock:
+            dropped = len(self._entries)
+            self._entries.clear()
+            self.generation += 1
+            return dropped
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"screens": len(self._entries), "hits": self.hits,
+                    "misses": self.misses, "generation": self.generation}
+
+
+_cache: Optional[ListingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_listing_cache() -> ListingCache:
+    """Общий кэш экранов процесса бота."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ListingCache()
+        return _cache
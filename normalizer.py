@@ -2,8 +2,12 @@
 # normalizer.py
 # Единая нормализация для всех парсеров: ticketpro, bezkassira, relax
 
+import math
 import re
+from collections import Counter
+from dataclasses import dataclass
 from datetime import datetime
+from functools import lru_cache
 from typing import Optional, Tuple
 import logging
 
@@ -278,6 +282,99 @@ MONTHS_RU_INT: dict[str, int] = {k: int(v) for k, v in MONTHS_RU.items()}
 #  МЕСТО
 # ═══════════════════════════════════════════════════════════════════════════════
 
+_QUOTES_RE = re.compile(r'[«»"„"]')
+_MINSK_PREFIX_RE = re.compile(r"^Минск,\s*")
+_G_MINSK_PREFIX_RE = re.compile(r"^г\.\s*Минск,\s*")
+# Паттерны требуют пробел после сокращения чтобы не зацепить «культуры», «переулок» и т.п.
+_ADDRESS_RES = (
+    re.compile(r"\bул\.\s+\w+"),
+    re.compile(r"\bпр-?т\.\s+\w+"),
+    re.compile(r"\bпл\.\s+\w+"),
+    re.compile(r"\bпер\.\s+\w+"),
+)
+_SPACES_RE = re.compile(r"\s+")
+
+
+class _SubstringMatcher:
+    """
+    Автомат Ахо–Корасик по списку строк.
+
+    first(text) — индекс самой ранней (по порядку в списке) строки, которая
+    входит в text как подстрока, или None. Один проход по text вместо
+    `for p in patterns: if p in text` — результат тот же.
+    """
+
+    def __init__(self, patterns: list[str]):
+        none = len(patterns)
+        self._none = none
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._best: list[int] = [none]   # мин. индекс паттерна, оканчивающегося в узле (с учётом fail)
+
+        for i, pattern in enumerate(patterns):
+            node = 0
+            for ch in pattern:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._best.append(none)
+                node = nxt
+            self._best[node] = min(self._best[node], i)
+
+        queue = list(self._goto[0].values())
+        for node in queue:
+            for ch, nxt in self._goto[node].items():
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                target = self._goto[f].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._best[nxt] = min(self._best[nxt], self._best[self._fail[nxt]])
+                queue.append(nxt)
+
+    def first(self, text: str) -> int | None:
+        goto, fail, best_at = self._goto, self._fail, self._best
+        best = best_at[0]
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if best_at[node] < best:
+                best = best_at[node]
+                if best == 0:
+                    break
+        return best if best < self._none else None
+
+
+def _clean_alias(alias: str) -> str:
+    return _QUOTES_RE.sub("", alias).strip().lower()
+
+
+# PLACE_ALIASES компилируется один раз при импорте: очищенные ключи,
+# точный словарь (первый алиас с таким ключом) и автомат подстрок.
+_ALIAS_KEYS: list[str] = [_clean_alias(alias) for alias in PLACE_ALIASES]
+_ALIAS_CANONICAL: list[str] = list(PLACE_ALIASES.values())
+_ALIAS_EXACT: dict[str, str] = {}
+for _key, _canonical in zip(_ALIAS_KEYS, _ALIAS_CANONICAL):
+    _ALIAS_EXACT.setdefault(_key, _canonical)
+_ALIAS_MATCHER = _SubstringMatcher(_ALIAS_KEYS)
+
+
+def _alias_in(text_lower: str) -> str | None:
+    """Канонич. название первого алиаса, входящего в text_lower."""
+    i = _ALIAS_MATCHER.first(text_lower)
+    return _ALIAS_CANONICAL[i] if i is not None else None
+
+
+@lru_cache(maxsize=64)
+def _venues_matcher(venues_lower: tuple[str, ...]) -> _SubstringMatcher:
+    return _SubstringMatcher(list(venues_lower))
+
+
 def normalize_place(place: str, known_venues: list | None = None) -> str:
     """
     Приводит название площадки к каноническому виду.
@@ -288,66 +385,54 @@ def normalize_place(place: str, known_venues: list | None = None) -> str:
     3. Убирает кавычки всех видов.
     4. Ищет совпадение в PLACE_ALIASES (точное → подстрока alias→cleaned).
     5. Если не нашёл — возвращает очищенную строку.
+
+    Результаты кэшируются (LRU): парсеры вызывают функцию на каждый сеанс,
+    а площадок — десятки.
     """
     if not place:
         return ""
+    return _normalize_place_cached(place, tuple(known_venues) if known_venues else ())
 
+
+@lru_cache(maxsize=8192)
+def _normalize_place_cached(place: str, known_venues: tuple[str, ...]) -> str:
     # Проверяем known_venues до любой очистки — relax передаёт канонические имена напрямую.
     # После матча прогоняем через PLACE_ALIASES чтобы получить канонический вариант
     # (например "Филармония" → "Белорусская государственная филармония").
     if known_venues:
-        place_lower = place.lower()
-        for venue in known_venues:
-            if venue.lower() in place_lower:
-                # Ищем канонический вариант в PLACE_ALIASES
-                venue_lower = venue.lower()
-                for alias, canonical in PLACE_ALIASES.items():
-                    alias_clean = re.sub(r'[«»"„"]', "", alias).strip()
-                    if alias_clean == venue_lower or alias_clean in venue_lower:
-                        return canonical
-                # Не нашли в словаре — возвращаем как есть из known_venues
-                return venue
+        i = _venues_matcher(tuple(v.lower() for v in known_venues)).first(place.lower())
+        if i is not None:
+            venue = known_venues[i]
+            # Не нашли в словаре — возвращаем как есть из known_venues
+            return _alias_in(venue.lower()) or venue
 
     # Убираем «Минск,» в начале
-    cleaned = re.sub(r"^Минск,\s*", "", place)
-    cleaned = re.sub(r"^г\.\s*Минск,\s*", "", cleaned)
+    cleaned = _MINSK_PREFIX_RE.sub("", place)
+    cleaned = _G_MINSK_PREFIX_RE.sub("", cleaned)
 
     # Убираем адресные части (для relax-стиля)
-    # Паттерны требуют пробел после сокращения чтобы не зацепить «культуры», «переулок» и т.п.
-    cleaned = re.sub(r"\bул\.\s+\w+", "", cleaned)
-    cleaned = re.sub(r"\bпр-?т\.\s+\w+", "", cleaned)
-    cleaned = re.sub(r"\bпл\.\s+\w+", "", cleaned)
-    cleaned = re.sub(r"\bпер\.\s+\w+", "", cleaned)
-
-    # Убираем кавычки
-    cleaned = re.sub(r'[«»"„"]', "", cleaned)
+    for address_re in _ADDRESS_RES:
+        cleaned = address_re.sub("", cleaned)
 
-    # Убираем лишние пробелы
-    cleaned = re.sub(r"\s+", " ", cleaned).strip()
+    # Убираем кавычки и лишние пробелы
+    cleaned = _QUOTES_RE.sub("", cleaned)
+    cleaned = _SPACES_RE.sub(" ", cleaned).strip()
 
     if not cleaned or len(cleaned) < 3:
         return place.strip()
 
-    # Ищем в словаре по очищенной строке (без кавычек)
-    # Два прохода: сначала точное совпадение, потом подстрока alias→cleaned.
+    # Сначала точное совпадение, потом алиас как подстрока входной строки
+    # (например, "мкск минск-арена" найдёт "мкск минск-арена, трибуна б").
     # Обратное вхождение (cleaned→alias) намеренно исключено:
     # "Большой театр" не должен матчить алиас "большой театр беларуси".
     cleaned_lower = cleaned.lower()
+    return _ALIAS_EXACT.get(cleaned_lower) or _alias_in(cleaned_lower) or cleaned
 
-    # Проход 1: точное совпадение
-    for alias, canonical in PLACE_ALIASES.items():
-        alias_clean = re.sub(r'[«»"„"]', "", alias).strip()
-        if alias_clean == cleaned_lower:
-            return canonical
 
-    # Проход 2: алиас является подстрокой входной строки
-    # (например, "мкск минск-арена" найдёт "мкск минск-арена, трибуна б")
-    for alias, canonical in PLACE_ALIASES.items():
-        alias_clean = re.sub(r'[«»"„"]', "", alias).strip()
-        if alias_clean in cleaned_lower:
-            return canonical
-
-    return cleaned
+def place_key(place: str) -> str:
+    """Ключ площадки для проверки дублей: normalize_place в нижнем регистре.
+    Хранится готовым в event_fingerprints.place_key."""
+    return normalize_place(place).lower() if place else ""
 
 
 def is_minsk_event(place_text: str) -> bool:
@@ -365,47 +450,74 @@ def is_minsk_event(place_text: str) -> bool:
 #  ЗАГОЛОВОК
 # ═══════════════════════════════════════════════════════════════════════════════
 
+_TITLE_PREFIX_RE = re.compile(
+    r"^(концертная\s+программа|юбилейный\s+концерт|сольный\s+концерт|гала-концерт|"
+    r"праздничный\s+концерт|отчетный\s+концерт|эстрадный\s+караоке-спектакль|"
+    r"концерт\s+группы|концерт|спектакль|шоу|выступление|группа)\s+"
+)
+_TITLE_SUFFIX_RE = re.compile(r"\s+(концерт|спектакль|шоу|программа|фестиваль)$")
+# Кавычки удаляются, тире → дефис: один str.translate вместо двух re.sub
+# (шаги между ними в исходной цепочке не трогают ни кавычки, ни тире).
+_TITLE_CHARS = str.maketrans({**{ch: None for ch in "«»\"'`„”“’‘′"}, "—": "-", "–": "-"})
+_TITLE_TRAILING_DOTS_RE = re.compile(r"\.+$")
+_TITLE_ELLIPSIS_RE = re.compile(r"\.{2,}")
+_TITLE_AND_RE = re.compile(r"\s+и\s+")
+_TITLE_JUNK_RE = re.compile(r"[^\w\s\-&]")
+
+TITLE_CACHE_SIZE = 65536
+
+
 def normalize_title(title: str) -> str:
     """
     Нормализует название события для сравнения дублей.
     Убирает вводные слова, кавычки, знаки препинания.
+
+    Результаты кэшируются (LRU, TITLE_CACHE_SIZE): одни и те же названия
+    нормализуются в индексах дублей, titles_are_similar и mark_free_duplicates.
     """
     if not title:
         return ""
+    return _normalize_title_cached(title)
 
+
+@lru_cache(maxsize=TITLE_CACHE_SIZE)
+def _normalize_title_cached(title: str) -> str:
     norm = title.lower()
 
-    # Убираем типичные вводные слова в начале
-    norm = re.sub(
-        r"^(концертная\s+программа|юбилейный\s+концерт|сольный\s+концерт|гала-концерт|"
-        r"праздничный\s+концерт|отчетный\s+концерт|эстрадный\s+караоке-спектакль|"
-        r"концерт\s+группы|концерт|спектакль|шоу|выступление|группа)\s+",
-        "", norm,
-    )
-    # Убираем в конце
-    norm = re.sub(r"\s+(концерт|спектакль|шоу|программа|фестиваль)$", "", norm)
+    # Вводные слова в начале и в конце
+    norm = _TITLE_PREFIX_RE.sub("", norm)
+    norm = _TITLE_SUFFIX_RE.sub("", norm)
 
-    # Кавычки
-    norm = re.sub(r'[«»"\'`„”“’‘′]', "", norm)
+    # Кавычки, тире
+    norm = norm.translate(_TITLE_CHARS)
 
     # Точки в конце / многоточия
-    norm = re.sub(r"\.+$", "", norm)
-    norm = re.sub(r"\.{2,}", "", norm)
+    norm = _TITLE_TRAILING_DOTS_RE.sub("", norm)
+    norm = _TITLE_ELLIPSIS_RE.sub("", norm)
 
     # «и» / «&» → единый разделитель
-    norm = re.sub(r"\s+и\s+", " & ", norm)
-    norm = re.sub(r"&", " & ", norm)
+    norm = _TITLE_AND_RE.sub(" & ", norm)
+    norm = norm.replace("&", " & ")
 
-    # Дефисы и тире
-    norm = re.sub(r"[—–-]", "-", norm)
+    # Оставляем только буквы, цифры, пробелы, дефис, амперсанд; лишние пробелы
+    norm = _TITLE_JUNK_RE.sub("", norm)
+    return " ".join(norm.split())
 
-    # Оставляем только буквы, цифры, пробелы, дефис, амперсанд
-    norm = re.sub(r"[^\w\s\-&]", "", norm)
 
-    # Лишние пробелы
-    norm = re.sub(r"\s+", " ", norm).strip()
-
-    return norm
+def normalize_titles(titles) -> list[str]:
+    """
+    Пакетная normalize_title для колонки названий (индексы дублей по всей events).
+    Каждое уникальное название нормализуется один раз; порядок сохраняется.
+    """
+    seen: dict[str, str] = {}
+    result = []
+    for title in titles:
+        norm = seen.get(title)
+        if norm is None:
+            norm = normalize_title(title)
+            seen[title] = norm
+        result.append(norm)
+    return result
 
 
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -559,6 +671,102 @@ def mark_free_duplicates(relax_events: list, free_events: list) -> list:
     return result
 
 
+_FREE_PASS_DDL = """
+    CREATE TEMP TABLE IF NOT EXISTS free_pass (
+        event_date TEXT,
+        title_key  TEXT,
+        place_key  TEXT,
+        PRIMARY KEY (event_date, title_key, place_key)
+    ) WITHOUT ROWID
+"""
+
+
+def _free_title_key(title):
+    return normalize_title(title or "")
+
+
+def _free_place_key(place):
+    return normalize_place(place or "")
+
+
+def apply_free_pass(free_events: list, conn) -> dict:
+    """
+    Проставляет "Бесплатно" событиям в БД, у которых есть пара во free-секции
+    relax.by — то же, что mark_free_duplicates + UPDATE по каждому событию,
+    но set-based, в одной транзакции:
+    - ключи free-событий (normalize_title, дата, normalize_place) считаются один
+      раз и кладутся во временную таблицу free_pass;
+    - relax.by-события тех же дат находятся join'ом по idx_events_source_date,
+      их ключи считаются в SQL (UDF поверх тех же lru_cache-функций);
+    - цена обновляется одним UPDATE по (title, event_date, place) найденных
+      событий — как и раньше, вместе с такими же строками других источников.
+    Returns: {'matched': relax-событий с парой, 'updated': строк с новой ценой,
+              'by_category': {категория: обновлено}}
+    """
+    stats = {"matched": 0, "updated": 0, "by_category": {}}
+    if not free_events:
+        return stats
+
+    keys = {
+        ((fe.get("event_date") or ""), _free_title_key(fe.get("title")), _free_place_key(fe.get("place")))
+        for fe in free_events
+    }
+    conn.create_function("free_title_key", 1, _free_title_key, deterministic=True)
+    conn.create_function("free_place_key", 1, _free_place_key, deterministic=True)
+
+    conn.execute(_FREE_PASS_DDL)
+    conn.execute("DELETE FROM temp.free_pass")
+    conn.executemany("INSERT INTO temp.free_pass (event_date, title_key, place_key) VALUES (?, ?, ?)", keys)
+    conn.execute("DROP TABLE IF EXISTS temp.free_matched")
+    conn.execute("""
+        CREATE TEMP TABLE free_matched AS
+        SELECT e.title, e.event_date, COALESCE(e.place, '') AS place
+        FROM temp.free_pass f
+        JOIN events e ON e.source_name = 'relax.by' AND e.event_date = f.event_date
+        WHERE free_title_key(e.title) = f.title_key
+          AND free_place_key(e.place) = f.place_key
+    """)
+    stats["matched"] = conn.execute("SELECT COUNT(*) FROM temp.free_matched").fetchone()[0]
+
+    changed = """
+        COALESCE(price, '') != 'Бесплатно'
+        AND (title, event_date, COALESCE(place, '')) IN (SELECT title, event_date, place FROM temp.free_matched)
+    """
+    stats["by_category"] = dict(conn.execute(
+        f"SELECT COALESCE(category, ''), COUNT(*) FROM events WHERE {changed} GROUP BY 1"
+    ).fetchall())
+    stats["updated"] = conn.execute(f"UPDATE events SET price = 'Бесплатно' WHERE {changed}").rowcount
+
+    conn.commit()
+    conn.execute("DROP TABLE IF EXISTS temp.free_matched")
+    conn.execute("DROP TABLE IF EXISTS temp.free_pass")
+
+    logger.info(f"🏷️ Free pass: найдено {stats['matched']} событий из free-секции, "
+                f"обновлено цен: {stats['updated']} {stats['by_category']}")
+    unmatched = len(free_events) - stats["matched"]
+    if unmatched > 0:
+        logger.info(f"ℹ️ {unmatched} бесплатных событий не нашли дубликатов (пропущены)")
+    return stats
+
+
+_KIDS_PASS_DDL = """
+    CREATE TEMP TABLE IF NOT EXISTS kids_pass (
+        seq         INTEGER PRIMARY KEY,
+        source_url  TEXT,
+        title       TEXT,
+        event_date  TEXT,
+        show_time   TEXT,
+        end_time    TEXT,
+        place       TEXT,
+        details     TEXT,
+        description TEXT,
+        location    TEXT,
+        price       TEXT,
+        matched     INTEGER DEFAULT 0   -- 0 нет, 1 по source_url, 2 по (title, event_date)
+    )
+"""
+
+
 def apply_kids_pass(kids_events: list, conn) -> dict:
     """
     Обрабатывает события из relax.by/kids/:
@@ -567,6 +775,10 @@ def apply_kids_pass(kids_events: list, conn) -> dict:
       Нашли → UPDATE is_kids=1.
       Не нашли → INSERT как уникальное детское событие (category='kids', is_kids=1).
     Returns: {'marked': int, 'added': int}
+
+    Всё — несколькими set-based запросами в одной транзакции: kids-события
+    кладутся во временную таблицу kids_pass, совпадения ищутся join'ами по
+    индексам idx_events_source_url и idx_events_title_date.
     """
     # Always clean up stale state regardless of whether kids_events is empty:
     # - remove synthetic rows inserted by a previous kids pass (unique circus/zoo events)
@@ -578,65 +790,71 @@ def apply_kids_pass(kids_events: list, conn) -> dict:
         conn.commit()
         return {"marked": 0, "added": 0}
 
-    # Снимаем snapshot ID существующих событий ДО нашего цикла INSERT,
-    # чтобы не матчить строки, вставленные в этом же проходе (баг: квест с
-    # несколькими временами находил свою же только что вставленную запись и
-    # не добавлял остальные тайм-слоты).
-    existing_ids: set = {r[0] for r in conn.execute("SELECT id FROM events").fetchall()}
-
-    matched = 0  # уникальных kids-событий найдено в БД (не строк)
-    added = 0
-
-    for ev in kids_events:
-        source_url = (ev.get("source_url") or "").strip()
-        title = (ev.get("title") or "").strip()
-        event_date = (ev.get("event_date") or "").strip()
-        place = (ev.get("place") or "").strip()
-
-        found_ids = []
-
-        if source_url:
-            rows = conn.execute(
-                "SELECT id FROM events WHERE source_url = ?", (source_url,)
-            ).fetchall()
-            found_ids = [r[0] for r in rows if r[0] in existing_ids]
-
-        if not found_ids and title and event_date:
-            rows = conn.execute(
-                "SELECT id FROM events WHERE title = ? AND event_date = ?",
-                (title, event_date)
-            ).fetchall()
-            found_ids = [r[0] for r in rows if r[0] in existing_ids]
-
-        if found_ids:
-            placeholders = ",".join("?" * len(found_ids))
-            conn.execute(
-                f"UPDATE events SET is_kids = 1 WHERE id IN ({placeholders})",
-                found_ids,
+    conn.execute(_KIDS_PASS_DDL)
+    conn.execute("DELETE FROM temp.kids_pass")
+    conn.executemany(
+        """INSERT INTO temp.kids_pass
+           (seq, source_url, title, event_date, show_time, end_time,
+            place, details, description, location, price)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        [
+            (
+                seq,
+                (ev.get("source_url") or "").strip(),
+                (ev.get("title") or "").strip(),
+                (ev.get("event_date") or "").strip(),
+                ev.get("show_time") or "",
+                ev.get("end_time") or "",
+                (ev.get("place") or "").strip(),
+                ev.get("details") or "",
+                ev.get("description") or "",
+                ev.get("location") or "Минск",
+                ev.get("price") or "",
             )
-            matched += 1  # считаем уникальные kids-события, а не строки в БД
-        elif title and event_date:
-            conn.execute(
-                """INSERT INTO events
-                   (title, details, description, event_date, show_time, end_time,
-                    place, location, price, category, source_url, source_name, is_kids)
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'kids', ?, 'relax.by', 1)""",
-                (
-                    title,
-                    ev.get("details") or "",
-                    ev.get("description") or "",
-                    event_date,
-                    ev.get("show_time") or "",
-                    ev.get("end_time") or "",
-                    place,
-                    ev.get("location") or "Минск",
-                    ev.get("price") or "",
-                    source_url,
-                ),
-            )
-            added += 1
+            for seq, ev in enumerate(kids_events)
+        ],
+    )
+
+    # Совпадения ищем до INSERT — вставленные в этом же проходе строки не матчатся
+    # (баг: квест с несколькими временами находил свою же только что вставленную
+    # запись и не добавлял остальные тайм-слоты).
+    conn.execute("""
+        UPDATE temp.kids_pass SET matched = 1
+        WHERE source_url != ''
+          AND EXISTS (SELECT 1 FROM events e WHERE e.source_url = kids_pass.source_url)
+    """)
+    conn.execute("""
+        UPDATE temp.kids_pass SET matched = 2
+        WHERE matched = 0 AND title != '' AND event_date != ''
+          AND EXISTS (SELECT 1 FROM events e
+                      WHERE e.title = kids_pass.title AND e.event_date = kids_pass.event_date)
+    """)
+    # считаем уникальные kids-события, а не строки в БД
+    matched = conn.execute("SELECT COUNT(*) FROM temp.kids_pass WHERE matched > 0").fetchone()[0]
+
+    conn.execute("""
+        UPDATE events SET is_kids = 1 WHERE id IN (
+            SELECT e.id FROM temp.kids_pass k JOIN events e ON e.source_url = k.source_url
+            WHERE k.matched = 1
+            UNION
+            SELECT e.id FROM temp.kids_pass k
+            JOIN events e ON e.title = k.title AND e.event_date = k.event_date
+            WHERE k.matched = 2
+        )
+    """)
+    added = conn.execute("""
+        INSERT INTO events
+            (title, details, description, event_date, show_time, end_time,
+             place, location, price, category, source_url, source_name, is_kids)
+        SELECT title, details, description, event_date, show_time, end_time,
+               place, location, price, 'kids', source_url, 'relax.by', 1
+        FROM temp.kids_pass
+        WHERE matched = 0 AND title != '' AND event_date != ''
+        ORDER BY seq
+    """).rowcount
 
     conn.commit()
+    conn.execute("DROP TABLE IF EXISTS temp.kids_pass")
     logger.info(f"🧸 Kids pass: is_kids=1 проставлено для {matched} событий, добавлено уникальных: {added}")
     return {"marked": matched, "added": added}
 
@@ -780,3 +998,131 @@ def titles_are_similar(title_a: str, title_b: str, threshold: float = 0.82) -> b
     if union == 0:
         return False
     return (intersection / union) >= threshold
+
+
+# ── Индекс дублей между источниками ──────────────────────────────────────────
+# Вместо перебора всех событий даты — блоки: (дата, название), (дата, место, время)
+# и (дата, слово) для похожих названий. Похожие ищутся prefix-фильтрацией: при
+# Жакаре >= t у двух множеств слов обязательно есть общее слово среди первых
+# n - ceil(t·n) + 1 слов каждого (в общем порядке — сначала длинные, они реже).
+# Поэтому в индекс по словам кладётся только префикс, а Жакар считается лишь
+# для событий, попавших в те же блоки.
+
+def _dedup_token_key(token: str) -> tuple[int, str]:
+    return -len(token), token
+
+
+def _dedup_prefix(tokens: frozenset, threshold: float) -> list[str]:
+    n = len(tokens)
+    size = n - math.ceil(threshold * n - 1e-9) + 1
+    return sorted(tokens, key=_dedup_token_key)[:size]
+
+
+@dataclass(frozen=True)
+class DedupMatch:
+    """Найденный дубль и причина: place_time | title | similar."""
+    reason: str
+    title: str          # нормализованное название существующего события
+    place: str = ""     # place_key существующего события
+    show_time: str = ""
+    score: float = 1.0  # Жакар по словам для similar
+
+
+class DedupIndex:
+    """
+    Индекс существующих событий для проверки дублей.
+
+    find() проверяет по порядку:
+      place_time — то же место и время в ту же дату (если оба известны);
+      title      — то же нормализованное название в ту же дату;
+      similar    — Жакар по словам названия >= similarity (если задан).
+    Статистика найденных причин — в self.reasons.
+    """
+
+    def __init__(self, similarity: Optional[float] = None):
+        self.similarity = similarity
+        self.reasons: Counter = Counter()
+        self._entries: list[tuple[str, frozenset, str, str]] = []  # (норм. название, слова, место, время)
+        self._by_title: dict[tuple[str, str], int] = {}
+        self._by_place_time: dict[tuple[str, str, str], int] = {}
+        self._by_token: dict[tuple[str, str], list[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, title: str, event_date: str, place: str = "", show_time: str = "",
+            norm: Optional[str] = None, place_norm: Optional[str] = None):
+        """Добавляет событие. norm / place_norm — уже посчитанные normalize_title
+        и place_key (если есть)."""
+        if not event_date:
+            return
+        norm = normalize_title(title) if norm is None else norm
+        place = place_key(place) if place_norm is None else place_norm
+        show_time = show_time or ""
+        tokens = frozenset(norm.split())
+        idx = len(self._entries)
+        self._entries.append((norm, tokens, place, show_time))
+        if norm:
+            self._by_title.setdefault((event_date, norm), idx)
+        if place and show_time:
+            self._by_place_time.setdefault((event_date, place, show_time), idx)
+        if self.similarity is not None and tokens:
+            for token in _dedup_prefix(tokens, self.similarity):
+                self._by_token.setdefault((event_date, token), []).append(idx)
+
+    def add_rows(self, rows):
+        """Пакетно: rows — (title, event_date[, place[, show_time]])."""
+        rows = list(rows)
+        for norm, row in zip(normalize_titles(r[0] for r in rows), rows):
+            self.add(*row, norm=norm)
+
+    def find(self, title: str, event_date: str, place: str = "", show_time: str = "",
+             norm: Optional[str] = None) -> Optional[DedupMatch]:
+        if not title or not event_date:
+            return None
+        norm = normalize_title(title) if norm is None else norm
+        place = place_key(place)
+        match = None
+
+        if place and show_time:
+            idx = self._by_place_time.get((event_date, place, show_time))
+            if idx is not None:
+                match = self._match("place_time", idx)
+
+        if match is None and norm:
+            idx = self._by_title.get((event_date, norm))
+            if idx is not None:
+                match = self._match("title", idx)
+
+        if match is None and norm and self.similarity is not None:
+            match = self._find_similar(norm, event_date)
+
+        if match is not None:
+            self.reasons[match.reason] += 1
+        return match
+
+    def _match(self, reason: str, idx: int, score: float = 1.0) -> DedupMatch:
+        norm, _, place, show_time = self._entries[idx]
+        return DedupMatch(reason, norm, place, show_time, score)
+
+    def _find_similar(self, norm: str, event_date: str) -> Optional[DedupMatch]:
+        tokens = frozenset(norm.split())
+        n = len(tokens)
+        seen: set[int] = set()
+        best_idx, best_score = -1, 0.0
+        for token in _dedup_prefix(tokens, self.similarity):
+            for idx in self._by_token.get((event_date, token), ()):
+                if idx in seen:
+                    continue
+                seen.add(idx)
+                other = self._entries[idx][1]
+                # Жакар не больше отношения размеров — не считаем заведомо далёкие
+                if min(n, len(other)) < self.similarity * max(n, len(other)):
+                    continue
+                inter = len(tokens & other)
+                score = inter / (n + len(other) - inter)
+                if score > best_score:
+                    best_idx, best_score = idx, score
+        if best_idx >= 0 and best_score >= self.similarity:
+            return self._match("similar", best_idx, round(best_score, 3))
+        return None
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Общие снимки результатов для пагинации бота.
+
+Раньше set_pagination копировал все строки результата в user_data каждого
+пользователя, а show_page кешировал группировку по len(events) — другой
+результат той же длины получал чужие страницы. Теперь:
+
+  - результат запроса — ResultSnapshot: строки кортежами (колонки одни на
+    снимок), готовые тексты сгруппированных записей и счётчики категорий
+    для клавиатуры; считается один раз;
+  - ключ снимка — hash содержимого (колонки + значения строк): одинаковый
+    результат у разных пользователей — один снимок, изменился хоть один
+    сеанс — новый ключ;
+  - в user_data остаётся только ключ, номер страницы и заголовок;
+    листание — срез готового списка, без группировки и форматирования;
+  - снимков не больше PAGINATION_MAX_SNAPSHOTS (вытесняется давно не
+    открывавшийся, LRU), снимок без обращений дольше PAGINATION_TTL_SECONDS
+    удаляется. Вытесненный снимок — «попробуйте запрос заново».
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+PAGINATION_MAX_SNAPSHOTS = int(os.getenv("PAGINATION_MAX_SNAPSHOTS", "500"))
+PAGINATION_TTL_SECONDS = int(os.getenv("PAGINATION_TTL_SECONDS", "3600"))
+
+# events → (тексты записей по порядку, счётчики категорий)
+RenderFn = Callable[[list[dict]], tuple[list[str], dict[str, int]]]
+
+
+@dataclass
+class ResultSnapshot:
+    key: str
+    columns: tuple[str, ...]
+    rows: tuple[tuple, ...]
+    items: list[str]                  # тексты сгруппированных записей
+    category_counts: dict[str, int]
+    used_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def total(self) -> int:
+        return len(self.items)
+
+    @property
+    def event_ids(self) -> list:
+        if "id" not in self.columns:
+            return []
+        pos = self.columns.index("id")
+        return [row[pos] for row in self.rows]
+
+    def events(self) -> list[dict]:
+        """Строки результата словарями (для фильтров — новый снимок)."""
+        return [dict(zip(self.columns, row)) for row in self.rows]
+
+    def page_items(self, page: int, per_page: int) -> list[str]:
+        return self.items[page * per_page:(page + 1) * per_page]
+
+
+def _compact(events) -> tuple[tuple[str, ...], tuple[tuple, ...]]:
+    """sqlite3.Row / dict → (колонки, кортежи значений). Строки одного запроса —
+    колонки берутся у первой."""
+    if not events:
+        return (), ()
+    columns = tuple(events[0].keys())
+    rows = tuple(
+        tuple(e[c] for c in columns) if not isinstance(e, dict) else tuple(e.get(c) for c in columns)
+        for e in events
+    )
+    return columns, rows
+
+
+def result_key(columns: tuple, rows: tuple) -> str:
+    return hashlib.sha1(repr((columns, rows)).encode("utf-8")).hexdigest()
+
+
+class PaginationStore:
+    def __init__(self, max_snapshots: int = PAGINATION_MAX_SNAPSHOTS,
+                 ttl_seconds: int = PAGINATION_TTL_SECONDS):
+        self.max_snapshots = max(1, max_snapshots)
+        self.ttl_seconds = ttl_seconds
+        self._snapshots: OrderedDict[str, ResultSnapshot] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._snapshots)
+
+    def _expired(self, snapshot: ResultSnapshot, now: float) -> bool:
+        return now - snapshot.used_at > self.ttl_seconds
+
+    def get(self, key: str) -> Optional[ResultSnapshot]:
+        """Снимок по ключу (None — вытеснен или устарел); обращение продлевает TTL."""
+        now = time.monotonic()
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+            if snapshot is None:
+                return None
+            if self._expired(snapshot, now):
+                del self._snapshots[key]
+                self.evicted += 1
+                return None
+            snapshot.used_at = now
+            self._snapshots.move_to_end(key)
+            return snapshot
+
+    def put(self, events, render: RenderFn) -> ResultSnapshot:
+        """Снимок результата events: готовый — если такой уже есть, иначе render()."""
+        columns, rows = _compact(events)
+        key = result_key(columns, rows)
+        snapshot = self.get(key)
+        if snapshot is not None:
+            self.hits += 1
+            return snapshot
+
+        self.misses += 1
+        items, counts = render([dict(zip(columns, row)) for row in rows])
+        return self.add(ResultSnapshot(key=key, columns=columns, rows=rows,
+                                       items=items, category_counts=counts))
+
+    def add(self, snapshot: ResultSnapshot) -> ResultSnapshot:
+        """Кладёт (или возвращает в хранилище) готовый снимок — например, из listing_cache."""
+        now = time.monotonic()
+        with self._lock:
+            snapshot.used_at = now
+            self._snapshots[snapshot.key] = snapshot
+            self._snapshots.move_to_end(snapshot.key)
+            self._evict(now)
+        return snapshot
+
+    def _evict(self, now: float):
+        # Самые давние — в начале OrderedDict
+        while self._snapshots:
+            key, oldest = next(iter(self._snapshots.items()))
+            if len(self._snapshots) <= self.max_snapshots and not self._expired(oldest, now):
+                break
+            del self._snapshots[key]
+            self.evicted += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "snapshots": len(self._snapshots),
+                "rows": sum(len(s.rows) for s in self._snapshots.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evicted": self.evicted,
+            }
+
+
+_store: Optional[PaginationStore] = None
+_store_lock = threading.Lock()
+
+
+def get_pagination_store() -> PaginationStore:
+    """Общее хранилище снимков процесса бота."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = PaginationStore()
+        return _store
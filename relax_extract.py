@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Потоковое извлечение расписания со страниц-листингов afisha.relax.by.
+
+Листинг relax.by — schedule__list (день, дата в h5) > schedule__table--movie >
+schedule__table--movie__item (FILL — новое место, EMPTY — то же место) >
+schedule__item (событие) > schedule__seance (сеанс). Страница кино весит
+несколько МБ; раньше парсер строил по ней полное дерево BeautifulSoup, а дневная
+проверка (daytime_update) — ещё одно, на медленном html.parser.
+
+iter_days() разбирает страницу lxml-парсером потоково (HTMLPullParser, кусками
+по FEED_CHUNK): каждый день разбирается, как только закрылся его div, и сразу
+удаляется из дерева — в памяти не больше одного дня. Наружу — простые
+структуры (RelaxDay / RelaxItem / RelaxSeance) без ссылок на дерево; правила
+конкретного источника (какие места брать, цена, пропуск /kino/) — у вызывающего.
+
+Семантика поиска повторяет прежний код на BeautifulSoup: первый потомок с
+нужным тегом и классом (класс — одно из слов атрибута class), текст —
+get_text(strip=True).
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Iterator, Optional
+
+from lxml import etree
+
+FEED_CHUNK = 64 * 1024
+
+_TIME_RE = re.compile(r"^\d{1,2}:\d{2}$")
+
+
+@dataclass
+class RelaxSeance:
+    show_time: str = ""             # HH:MM или '' (нет времени / не время)
+    tickets: str = ""               # buy | timeout | '' (касса, онлайн-продажи нет)
+    price: Optional[str] = None     # текст span.seance-price; None — span нет
+    data_summ: str = ""             # data-summ div.schedule__seance ('' у item без сеансов)
+
+
+@dataclass
+class RelaxItem:
+    table: int = -1                 # номер schedule__table--movie в дне; -1 — вне таблицы
+    place_fill: bool = False        # FILL: место задаётся заново
+    place: Optional[str] = None     # текст ссылки места (только при FILL)
+    location: str = "Минск"         # адрес места (только при FILL)
+    title: Optional[str] = None     # None — нет schedule__item или ссылки на событие
+    href: str = ""
+    details: str = ""
+    details_href: str = ""
+    seances: list[RelaxSeance] = field(default_factory=list)
+    fallback: Optional[RelaxSeance] = None  # item без div.schedule__seance — время из item
+
+
+@dataclass
+class RelaxDay:
+    date_text: Optional[str]        # текст h5 как есть; None — h5 нет
+    items: list[RelaxItem] = field(default_factory=list)
+
+
+# ---------------------- Поиск по дереву ----------------------
+
+def _has_class(el, cls: str) -> bool:
+    return cls in (el.get("class") or "").split()
+
+
+def _find_all(el, tag: str, cls: str) -> list:
+    return [d for d in el.iterdescendants(tag) if _has_class(d, cls)]
+
+
+def _find(el, tag: str, cls: str):
+    for d in el.iterdescendants(tag):
+        if _has_class(d, cls):
+            return d
+    return None
+
+
+def _text(el) -> str:
+    """get_text(strip=True)."""
+    return "".join(s.strip() for s in el.itertext())
+
+
+def _first_tag(el, tag: str):
+    for d in el.iterdescendants(tag):
+        return d
+    return None
+
+
+# ---------------------- Разбор блоков ----------------------
+
+def _seance(el, is_seance_div: bool) -> RelaxSeance:
+    # Время начала — <a> для активных, <span> для закрытых
+    time_a = _find(el, "a", "schedule__seance-time")
+    time_span = _find(el, "span", "schedule__seance-time")
+    time_elem = time_a if time_a is not None else time_span
+
+    seance = RelaxSeance()
+    if time_elem is not None:
+        raw_time = _text(time_elem)
+        seance.show_time = raw_time if _TIME_RE.match(raw_time) else ""
+
+    # schedule__seance--buy → онлайн-покупка; --buy-timeout / --timeout → продажа закрыта;
+    # span без timeout — онлайн-продажи нет (касса)
+    if time_a is not None:
+        cls = (time_a.get("class") or "").split()
+        if "schedule__seance--buy" in cls and "schedule__seance--buy-timeout" not in cls:
+            seance.tickets = "buy"
+        else:
+            seance.tickets = "timeout"
+    elif time_span is not None:
+        cls = (time_span.get("class") or "").split()
+        if "schedule__seance--timeout" in cls or "schedule__seance--buy-timeout" in cls:
+            seance.tickets = "timeout"
+
+    price_span = _find(el, "span", "seance-price")
+    if price_span is not None:
+        seance.price = _text(price_span)
+    if is_seance_div:
+        seance.data_summ = (el.get("data-summ") or "").strip()
+    return seance
+
+
+def _item(movie_item, table: int) -> RelaxItem:
+    item = RelaxItem(table=table)
+
+    place_div = _find(movie_item, "div", "schedule__place--fill")
+    if place_div is not None:
+        item.place_fill = True
+        place_a = _find(place_div, "a", "js-schedule__place-link")
+        if place_a is not None:
+            item.place = _text(place_a)
+        addr_span = _find(place_div, "span", "schedule__place-link")
+        item.location = _text(addr_span) if addr_span is not None else "Минск"
+
+    event_div = _find(movie_item, "div", "schedule__item")
+    if event_div is None:
+        return item
+    title_a = _find(event_div, "a", "js-schedule__event-link")
+    if title_a is None:
+        return item
+    item.title = _text(title_a)
+    item.href = title_a.get("href") or ""
+
+    details_a = _find(event_div, "a", "schedule__event-dscr")
+    if details_a is not None:
+        item.details = _text(details_a)
+        item.details_href = details_a.get("href") or ""
+
+    item.seances = [_seance(s, True) for s in _find_all(event_div, "div", "schedule__seance")]
+    if not item.seances:
+        item.fallback = _seance(event_div, False)
+    return item
+
+
+def _day(day_block) -> RelaxDay:
+    h5 = _first_tag(day_block, "h5")
+    day = RelaxDay(date_text="".join(h5.itertext()) if h5 is not None else None)
+
+    tables = {t: i for i, t in enumerate(_find_all(day_block, "div", "schedule__table--movie"))}
+    for movie_item in _find_all(day_block, "div", "schedule__table--movie__item"):
+        table = -1
+        for ancestor in movie_item.iterancestors("div"):
+            if ancestor is day_block:
+                break
+            if ancestor in tables:
+                table = tables[ancestor]
+                break
+        day.items.append(_item(movie_item, table))
+    return day
+
+
+def iter_days(html: str) -> Iterator[RelaxDay]:
+    """Дни листинга (div.schedule__list) в порядке страницы."""
+    parser = etree.HTMLPullParser(events=("end",), tag="div", encoding="utf-8")
+    data = html.encode("utf-8") if isinstance(html, str) else html
+    if not data:
+        return
+
+    def ready() -> Iterator[RelaxDay]:
+        for _, el in parser.read_events():
+            if not _has_class(el, "schedule__list"):
+                continue
+            yield _day(el)
+            # День разобран — освобождаем его и всё, что было до него
+            el.clear(keep_tail=True)
+            parent = el.getparent()
+            if parent is not None:
+                while el.getprevious() is not None:
+                    del parent[0]
+
+    for start in range(0, len(data), FEED_CHUNK):
+        parser.feed(data[start:start + FEED_CHUNK])
+        yield from ready()
+    parser.close()
+    yield from ready()
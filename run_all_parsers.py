@@ -1,10 +1,12 @@
 #!/usr/bin/env python3
 # run_all_parsers.py
-# Последовательный запуск всех парсеров с обработкой бесплатных событий
+# Параллельный запуск всех парсеров с обработкой бесплатных событий.
+# Парсеры — плагины source_parser.BaseSourceParser, работают в этом же процессе:
+# загрузка страниц идёт одновременно (PARSER_WORKERS, лимиты на хост),
+# запись в БД — по порядку PARSERS, free/kids pass — после всех парсеров.
 
 import os
 import sys
-import subprocess
 import logging
 import json
 import sqlite3
@@ -12,12 +14,12 @@ from datetime import datetime
 
 # Импортируем функцию из обновлённого нормализатора
 try:
-    from normalizer import mark_free_duplicates, apply_kids_pass
+    from normalizer import apply_free_pass, apply_kids_pass
     _NORMALIZER_OK = True
 except ImportError:
     _NORMALIZER_OK = False
-    def mark_free_duplicates(relax_events, free_events):
-        return relax_events + free_events
+    def apply_free_pass(free_events, conn):
+        return {"matched": 0, "updated": 0, "by_category": {}}
     def apply_kids_pass(kids_events, conn):
         return {"marked": 0, "added": 0}
 
@@ -27,6 +29,7 @@ from parser_state import (
     record_successful_parse,
     record_always_parse_success,
 )
+from source_parser import run_sources
 
 try:
     from daytime_update import CHECK_FNS, MIN_SANE_COUNT
@@ -47,19 +50,6 @@ logger = logging.getLogger(__name__)
 if not _DAYTIME_AVAILABLE:
     logger.warning("daytime_update unavailable — parser_source_state will NOT be synced after nightly parse")
 
-# Mapping: parser command → source_key for parser_source_state sync.
-# relax_parser.py free is intentionally omitted — free pass is not a baseline source.
-CMD_TO_SOURCE_KEY: dict[str, str] = {
-    "relax_parser.py theatre":    "relax.by:theatre",
-    "relax_parser.py concert":    "relax.by:concert",
-    "relax_parser.py exhibition": "relax.by:exhibition",
-    "relax_parser.py party":      "relax.by:party",
-    "relax_parser.py kino":       "relax.by:kino",
-    "bycard_parser.py":           "bycard.by",
-    "ticketpro_parser.py":        "ticketpro.by",
-    "bezkassira_parser.py":       "bezkassira.by",
-}
-
 # These sources have no fingerprint check — only metadata is written to state.
 ALWAYS_PARSE_KEYS = {"ticketpro.by", "bezkassira.by"}
 
@@ -106,167 +96,35 @@ def _sync_parser_state(source_key: str, now_iso: str):
         )
 
 
-# Категории парсеров с указанием, относятся ли они к бесплатным событиям
+# Параллельность: сколько парсеров одновременно грузят страницы и сколько
+# из них может ходить на один хост.
+PARSER_WORKERS = int(os.getenv("PARSER_WORKERS", "4"))
+HOST_LIMITS: dict[str, int] = {
+    "afisha.relax.by": int(os.getenv("PARSER_RELAX_CONCURRENCY", "2")),
+}
+
+
+# Категории парсеров с указанием, относятся ли они к бесплатным событиям.
+# Порядок = порядок записи в БД: ticketpro дедуплицирует против relax,
+# bezkassira и bycard — против всех предыдущих.
+# Ключ = source_parser.SOURCE_PARSERS и parser_source_state.source_name.
 PARSERS = [
     # Обычные парсеры
-    ("relax_parser.py theatre",     "🎭 Театр (Relax)",      False,  False),
-    ("relax_parser.py concert",     "🎵 Концерты (Relax)",   False,  False),
-    ("relax_parser.py exhibition",  "🖼️ Выставки (Relax)",   False,  False),
-    ("relax_parser.py party",       "🎉 Вечеринки (Relax)",  False,  False),
-    ("relax_parser.py kino",        "🎬 Кино (Relax)",       False,  False),
-    ("ticketpro_parser.py",         "🎫 Ticketpro",          False,  False),
-    ("bezkassira_parser.py",        "🎟 BezKassira",         False,  False),
-    ("bycard_parser.py",            "🎭 Bycard",             False,  False),
-
-    # JSON-парсеры (возвращают EVENTS_JSON, не сохраняют напрямую)
-    ("relax_parser.py free",        "🆓 Бесплатно (Relax)",  True,   False),
-    ("relax_parser.py kids",        "🧸 Детям (Relax)",      False,  True),   # is_kids pass
+    ("relax.by:theatre",     "🎭 Театр (Relax)",      False,  False),
+    ("relax.by:concert",     "🎵 Концерты (Relax)",   False,  False),
+    ("relax.by:exhibition",  "🖼️ Выставки (Relax)",   False,  False),
+    ("relax.by:party",       "🎉 Вечеринки (Relax)",  False,  False),
+    ("relax.by:kino",        "🎬 Кино (Relax)",       False,  False),
+    ("ticketpro.by",         "🎫 Ticketpro",          False,  False),
+    ("bezkassira.by",        "🎟 BezKassira",         False,  False),
+    ("bycard.by",            "🎭 Bycard",             False,  False),
+
+    # Парсеры без записи в БД — события возвращаются оркестратору
+    ("relax.by:free",        "🆓 Бесплатно (Relax)",  True,   False),
+    ("relax.by:kids",        "🧸 Детям (Relax)",      False,  True),   # is_kids pass
 ]
 
 
-def run_parser(cmd: str, parser_name: str) -> tuple[bool, list[str], list[dict]]:
-    """
-    Запускает парсер и возвращает:
-        success: bool - успешно ли завершился
-        result_lines: list[str] - строки RESULT:... для отчёта
-        events: list[dict] - спарсенные события (только от free-парсеров)
-    """
-    events = []
-    try:
-        logger.info(f"▶️ Запуск {parser_name} ({cmd})...")
-        result = subprocess.run(
-            [sys.executable] + cmd.split(),
-            capture_output=True, text=True, timeout=900,  # Увеличил таймаут до 15 минут
-        )
-        
-        if result.returncode == 0:
-            logger.info(f"✅ {parser_name} завершён успешно")
-            result_lines = []
-            
-            if result.stdout:
-                for line in result.stdout.strip().split("\n"):
-                    stripped = line.strip()
-                    
-                    # Логируем информационные строки
-                    if any(w in stripped for w in ["✅", "❌", "📊", "🧹", "⚠️", "Добавлено", "Найдено"]):
-                        logger.info(f"   {stripped}")
-                    
-                    # Собираем RESULT строки для отчёта
-                    if stripped.startswith("RESULT:"):
-                        result_lines.append(stripped)
-                    
-                    # Собираем JSON с бесплатными событиями
-                    if stripped.startswith("EVENTS_JSON:"):
-                        try:
-                            events_json = stripped[len("EVENTS_JSON:"):]
-                            events_data = json.loads(events_json)
-                            events.extend(events_data)
-                            logger.info(f"   📦 Получено {len(events_data)} событий")
-                        except Exception as e:
-                            logger.error(f"   ❌ Ошибка парсинга JSON событий: {e}")
-            
-            return True, result_lines, events
-        else:
-            logger.error(f"❌ {parser_name} завершился с ошибкой (код {result.returncode})")
-            if result.stderr:
-                for line in result.stderr.strip().split("\n")[-5:]:
-                    if line.strip():
-                        logger.error(f"   {line}")
-            return False, [], []
-            
-    except subprocess.TimeoutExpired:
-        logger.error(f"⏰ {parser_name} превысил время ожидания (15 мин)")
-        return False, [], []
-    except Exception as e:
-        logger.error(f"💥 Ошибка при запуске {parser_name}: {e}")
-        return False, [], []
-
-
-def load_events_from_db() -> list:
-    """
-    Загружает все события из БД для обработки бесплатных дубликатов.
-    """
-    events = []
-    try:
-        if not os.path.exists(DB_PATH):
-            logger.warning(f"⚠️ БД {DB_PATH} не найдена")
-            return []
-        
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        # Загружаем все события
-        cursor.execute("""
-            SELECT title, details, description, event_date, show_time,
-                   place, location, price, category, source_url, source_name
-            FROM events
-            WHERE source_name = 'relax.by'
-        """)
-        
-        rows = cursor.fetchall()
-        for row in rows:
-            events.append({
-                "title": row["title"],
-                "details": row["details"] or "",
-                "description": row["description"] or "",
-                "event_date": row["event_date"],
-                "show_time": row["show_time"] or "",
-                "place": row["place"] or "",
-                "location": row["location"] or "Минск",
-                "price": row["price"] or "",
-                "category": row["category"] or "other",
-                "source_url": row["source_url"] or "",
-                "source_name": row["source_name"] or "",
-            })
-        
-        conn.close()
-        logger.info(f"📚 Загружено {len(events)} событий из БД")
-        
-    except Exception as e:
-        logger.error(f"❌ Ошибка загрузки из БД: {e}")
-    
-    return events
-
-
-def update_events_in_db(events: list) -> int:
-    """
-    Обновляет цены событий в БД (только для бесплатных).
-    """
-    if not events:
-        return 0
-    
-    updated = 0
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        for event in events:
-            # Обновляем только если цена изменилась на "Бесплатно"
-            if event.get("price") == "Бесплатно" and event.get("_from_free_section"):
-                cursor.execute("""
-                    UPDATE events 
-                    SET price = ?
-                    WHERE title = ? AND event_date = ? AND place = ?
-                """, (
-                    "Бесплатно",
-                    event["title"],
-                    event["event_date"],
-                    event["place"]
-                ))
-                if cursor.rowcount > 0:
-                    updated += 1
-        
-        conn.commit()
-        conn.close()
-        logger.info(f"🔄 Обновлено цен в БД: {updated}")
-        
-    except Exception as e:
-        logger.error(f"❌ Ошибка обновления БД: {e}")
-    
-    return updated
-
-
 def main():
     start_time = datetime.now()
     now_iso = datetime.now(MINSK_TZ).isoformat()
@@ -287,49 +145,42 @@ def main():
     kids_parser_ok = False  # True только если kids-парсер отработал без ошибок
 
     # Запускаем все парсеры
-    for cmd, name, is_free, is_kids in PARSERS:
-        logger.info("-" * 40)
-        ok, result_lines, events = run_parser(cmd, name)
+    runs = run_sources([key for key, *_ in PARSERS], workers=PARSER_WORKERS, host_limits=HOST_LIMITS)
 
+    for (key, name, is_free, is_kids), run in zip(PARSERS, runs):
+        ok = run.ok
+        result_lines = run.result.result_lines() if ok else []
+        events = run.result.events
         if ok:
             success += 1
             if is_free:
                 free_events.extend(events)
-                logger.info(f"   📦 Бесплатных событий получено: {len(events)}")
+                logger.info(f"   📦 {name}: бесплатных событий получено: {len(events)}")
             elif is_kids:
                 kids_events.extend(events)
                 kids_parser_ok = True
-                logger.info(f"   📦 Kids событий получено: {len(events)}")
+                logger.info(f"   📦 {name}: kids событий получено: {len(events)}")
             else:
-                source_key = CMD_TO_SOURCE_KEY.get(cmd)
-                if source_key:
-                    _sync_parser_state(source_key, now_iso)
+                _sync_parser_state(key, now_iso)
         else:
             failed += 1
 
         all_results.extend(result_lines)
         parser_status.append((name, ok, result_lines))
-        logger.info("-" * 40)
 
-    # Загружаем все события из БД
-    logger.info("=" * 40)
-    logger.info("📚 ЗАГРУЗКА СОБЫТИЙ ИЗ БД")
-    relax_events = load_events_from_db()
-    
-    logger.info(f"📊 Загружено из БД: {len(relax_events)}")
-    logger.info(f"🆓 Бесплатных событий из JSON: {len(free_events)}")
-
-    # Обрабатываем бесплатные события
+    # Обрабатываем бесплатные события — цены проставляются прямо в БД
     logger.info("=" * 40)
     logger.info("🔄 ОБРАБОТКА БЕСПЛАТНЫХ СОБЫТИЙ")
-    
+    logger.info(f"🆓 Бесплатных событий из free-секции: {len(free_events)}")
+    free_stats: dict = {"matched": 0, "updated": 0, "by_category": {}}
+
     if free_events:
-        final_events = mark_free_duplicates(relax_events, free_events)
-        logger.info(f"📦 Событий после обработки: {len(final_events)}")
-        free_count = sum(1 for e in final_events if e.get("price") == "Бесплатно")
-        logger.info(f"🆓 Из них бесплатных: {free_count}")
-        updated = update_events_in_db(final_events)
-        logger.info(f"💾 Обновлено в БД: {updated}")
+        try:
+            with sqlite3.connect(DB_PATH) as conn:
+                free_stats = apply_free_pass(free_events, conn)
+            logger.info(f"💾 Обновлено в БД: {free_stats['updated']} {free_stats['by_category']}")
+        except Exception as e:
+            logger.error(f"❌ Ошибка обработки бесплатных: {e}")
     else:
         logger.info("ℹ️ Нет бесплатных событий для обработки")
 
@@ -363,6 +214,7 @@ def main():
         "success": success,
         "failed": failed,
         "duration": round(duration, 1),
+        "free_stats": free_stats,
         "kids_stats": kids_stats,
         "parsers": [
             {
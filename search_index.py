@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Полнотекстовый поиск по событиям (SQLite FTS5).
+
+events_fts — external-content FTS5-таблица поверх events(title, details, place, description).
+Токенайзер unicode61 складывает регистр по всей Unicode-таблице, включая кириллицу,
+чего не умеют LOWER() и LIKE в SQLite. Синхронизация — триггерами на events, поэтому
+индекс обновляется при любой записи парсеров (отдельные процессы, сырой sqlite3)
+без изменений в их коде.
+
+Запрос пользователя превращается в prefix-запрос по словам: «концерт джаз» →
+"концерт"* "джаз"* (все слова должны встретиться). Если SQLite собран без FTS5,
+search_clause() отдаёт прежний LIKE-фильтр с вариантами регистра.
+"""
+import re
+import sqlite3
+import unicodedata
+
+FTS_TABLE = "events_fts"
+FTS_COLUMNS = ("title", "details", "place", "description")
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+# Символы токена unicode61: буквы и цифры; '_' — разделитель
+_WORD_RE = re.compile(r"[^\W_]+", re.UNICODE)
+
+_FTS_DDL = f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, details, place, description,
+        content='events', content_rowid='id',
+        tokenize="unicode61 remove_diacritics 2"
+    )
+"""
+
+_FTS_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS events_fts_ai AFTER INSERT ON events BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, details, place, description)
+        VALUES (new.id, new.title, new.details, new.place, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS events_fts_ad AFTER DELETE ON events BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, details, place, description)
+        VALUES ('delete', old.id, old.title, old.details, old.place, old.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS events_fts_au
+    AFTER UPDATE OF title, details, place, description ON events BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, details, place, description)
+        VALUES ('delete', old.id, old.title, old.details, old.place, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, title, details, place, description)
+        VALUES (new.id, new.title, new.details, new.place, new.description);
+    END
+    """,
+]
+
+
+def _detect_fts5() -> bool:
+    try:
+        conn = sqlite3.connect(":memory:")
+        try:
+            conn.execute("CREATE VIRTUAL TABLE _fts5_probe USING fts5(x)")
+        finally:
+            conn.close()
+        return True
+    except sqlite3.Error:
+        return False
+
+
+FTS5_AVAILABLE = _detect_fts5()
+
+
+def ensure_search_index(conn: sqlite3.Connection) -> bool:
+    """Создаёт events_fts и триггеры синхронизации. Idempotent.
+
+    При первом создании индекс заполняется из events ('rebuild').
+    Возвращает True, если FTS-индекс готов к использованию.
+    """
+    if not FTS5_AVAILABLE:
+        return False
+    has_events = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'events'"
+    ).fetchone()
+    if not has_events:
+        return False
+    existed = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,)
+    ).fetchone()
+    conn.execute(_FTS_DDL)
+    for trigger_sql in _FTS_TRIGGERS:
+        conn.execute(trigger_sql)
+    if not existed:
+        conn.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    conn.commit()
+    return True
+
+
+def build_match_query(text: str, columns: tuple[str, ...] | None = None) -> str | None:
+    """Строка для MATCH: каждое слово — prefix-токен, слова через AND.
+
+    columns ограничивает поиск частью колонок ({title place} : ...).
+    None — в запросе нет ни одного слова (только пунктуация).
+    """
+    tokens = _TOKEN_RE.findall((text or "").lower())
+    if not tokens:
+        return None
+    expr = " ".join(f'"{token}"*' for token in tokens)
+    if columns and tuple(columns) != FTS_COLUMNS:
+        return "{" + " ".join(columns) + "} : (" + expr + ")"
+    return expr
+
+
+def fold_tokens(text: str) -> list[str]:
+    """Слова текста так, как их видит токенайзер events_fts (для сравнения в Python).
+
+    Нижний регистр, у латиницы сняты диакритики (remove_diacritics 2: é → e),
+    кириллица не трогается (ё и й — отдельные буквы).
+    """
+    decomposed = unicodedata.normalize("NFD", (text or "").lower())
+    chars: list[str] = []
+    for ch in decomposed:
+        if unicodedata.combining(ch) and chars and chars[-1] < "\u0250":
+            continue
+        chars.append(ch)
+    return _WORD_RE.findall(unicodedata.normalize("NFC", "".join(chars)))
+
+
+def _like_fallback(text: str, columns: tuple[str, ...]) -> tuple[str, list]:
+    """Прежний LIKE-поиск: SQLite LOWER() не работает с кириллицей — варианты регистра через Python."""
+    ql = text.lower()
+    qc = (ql[0].upper() + ql[1:]) if ql else ql
+    qu = text.upper()
+    variants = [f"%{ql}%", f"%{qc}%", f"%{qu}%"]
+    parts: list[str] = []
+    params: list = []
+    for col in columns:
+        parts.extend([f"{col} LIKE ?"] * len(variants))
+        params.extend(variants)
+    return "(" + " OR ".join(parts) + ")", params
+
+
+def search_clause(
+    text: str,
+    columns: tuple[str, ...] = FTS_COLUMNS,
+    id_column: str = "id",
+) -> tuple[str, list] | None:
+    """SQL-условие (без 'AND') для поиска событий по тексту.
+
+    Возвращает (sql, params) или None, если искать нечего.
+    id_column — как в запросе называется events.id (например 'events.id').
+    """
+    text = (text or "").strip()
+    if not text:
+        return None
+    if not FTS5_AVAILABLE:
+        return _like_fallback(text, columns)
+    match = build_match_query(text, columns)
+    if match is None:
+        return None
+    return (
+        f"{id_column} IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH ?)",
+        [match],
+    )
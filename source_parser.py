@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Плагинный интерфейс парсеров источников.
+
+Каждый парсер — наследник BaseSourceParser с двумя фазами:
+  fetch() — только сеть: загружает и разбирает страницы, возвращает SourceResult;
+  save()  — только БД: дедупликация с другими источниками и запись.
+
+run_all_parsers.py и daytime_update.py вызывают парсеры в своём процессе через
+run_sources(): fetch всех источников идёт параллельно в потоках (лимит на число
+воркеров и на хост), save — строго в порядке переданных ключей, поэтому
+дедупликация видит ту же БД, что и при последовательном запуске. События
+free/kids возвращаются оркестратору объектами Python — без stdout и JSON.
+
+Ручной запуск отдельного парсера (python relax_parser.py theatre и т.п.) по-прежнему
+работает через BaseSourceParser.run() и печатает строки RESULT:.
+"""
+import importlib
+import logging
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+# ключ источника → "модуль:класс". Ключи совпадают с parser_source_state.source_name.
+SOURCE_PARSERS: dict[str, str] = {
+    "relax.by:theatre":    "relax_parser:RelaxTheatreParser",
+    "relax.by:concert":    "relax_parser:RelaxConcertParser",
+    "relax.by:exhibition": "relax_parser:RelaxExhibitionParser",
+    "relax.by:party":      "relax_parser:RelaxPartyParser",
+    "relax.by:kino":       "relax_parser:RelaxKinoParser",
+    "relax.by:kids":       "relax_parser:RelaxKidsParser",
+    "relax.by:free":       "relax_parser:RelaxFreeParser",
+    "ticketpro.by":        "ticketpro_parser:TicketproParser",
+    "bezkassira.by":       "bezkassira_parser:BezkassiraParser",
+    "bycard.by":           "bycard_parser:BycardParser",
+}
+
+
+@dataclass
+class SourceResult:
+    """Результат парсера: события по группам и счётчики для отчёта."""
+    batches: list[tuple[str, list[dict]]] = field(default_factory=list)  # (метка, события)
+    counts: dict[str, list[int]] = field(default_factory=dict)           # метка → [найдено, сохранено]
+
+    @property
+    def events(self) -> list[dict]:
+        return [ev for _, events in self.batches for ev in events]
+
+    @property
+    def saved(self) -> int:
+        return sum(saved for _, saved in self.counts.values())
+
+    def count(self, label: str, found: int = 0, saved: int = 0):
+        entry = self.counts.setdefault(label, [0, 0])
+        entry[0] += found
+        entry[1] += saved
+
+    def result_lines(self) -> list[str]:
+        """Строки RESULT:метка:найдено:сохранено — формат отчётов для бота."""
+        return [f"RESULT:{label}:{found}:{saved}" for label, (found, saved) in self.counts.items()]
+
+
+class BaseSourceParser:
+    """Базовый класс парсера источника."""
+
+    key = ""             # ключ из SOURCE_PARSERS
+    host = ""            # хост для лимита параллельности
+    saves_to_db = True   # False — события только возвращаются (free/kids pass)
+
+    def fetch(self) -> SourceResult:
+        raise NotImplementedError
+
+    def save(self, result: SourceResult) -> SourceResult:
+        return result
+
+    def run(self) -> SourceResult:
+        """fetch + save в одном вызове (ручной запуск из консоли)."""
+        result = self.save(self.fetch())
+        for line in result.result_lines():
+            print(line)
+        return result
+
+
+@dataclass
+class SourceRun:
+    key: str
+    ok: bool
+    result: SourceResult
+    elapsed: float
+    error: str = ""
+
+
+def parser_class(key: str) -> type[BaseSourceParser]:
+    module_name, class_name = SOURCE_PARSERS[key].split(":")
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def load_parser(key: str) -> BaseSourceParser:
+    return parser_class(key)()
+
+
+def run_sources(
+    keys: list[str],
+    workers: int = 1,
+    host_limits: dict[str, int] | None = None,
+) -> list[SourceRun]:
+    """
+    Запускает парсеры keys в текущем процессе. Возвращает SourceRun в порядке keys.
+
+    fetch() идут параллельно: не больше workers одновременно и не больше
+    host_limits[host] (по умолчанию 1) на один хост. save() выполняются в
+    вызывающем потоке по порядку keys, каждый — сразу как только готов его fetch
+    и сохранены все предыдущие.
+    """
+    host_limits = host_limits or {}
+    worker_slots = threading.Semaphore(max(1, workers))
+    host_slots: dict[str, threading.Semaphore] = {}
+    parsers: dict[str, BaseSourceParser] = {}
+    load_errors: dict[str, str] = {}
+
+    for key in keys:
+        try:
+            parser = load_parser(key)
+        except Exception as e:
+            logger.error(f"💥 {key}: не удалось загрузить парсер: {e}")
+            load_errors[key] = str(e)
+            continue
+        parsers[key] = parser
+        if parser.host not in host_slots:
+            host_slots[parser.host] = threading.Semaphore(max(1, host_limits.get(parser.host, 1)))
+
+    def fetch(key: str) -> tuple[SourceResult | None, float, str]:
+        parser = parsers[key]
+        with host_slots[parser.host], worker_slots:
+            t0 = time.time()
+            logger.info(f"▶️ {key}: загрузка...")
+            try:
+                return parser.fetch(), time.time() - t0, ""
+            except Exception as e:
+                logger.error(f"💥 {key}: ошибка загрузки: {e}\n{traceback.format_exc()}")
+                return None, time.time() - t0, str(e)
+
+    runs: list[SourceRun] = []
+    # Поток на каждый источник: ожидание слота хоста не занимает воркер у других хостов
+    with ThreadPoolExecutor(max_workers=max(1, len(parsers)), thread_name_prefix="fetch") as pool:
+        futures = {key: pool.submit(fetch, key) for key in parsers}
+        for key in keys:
+            if key in load_errors:
+                runs.append(SourceRun(key, False, SourceResult(), 0.0, load_errors[key]))
+                continue
+
+            result, elapsed, error = futures[key].result()
+            if result is None:
+                runs.append(SourceRun(key, False, SourceResult(), round(elapsed, 1), error))
+                continue
+
+            t0 = time.time()
+            try:
+                result = parsers[key].save(result)
+                ok = True
+            except Exception as e:
+                logger.error(f"💥 {key}: ошибка сохранения: {e}\n{traceback.format_exc()}")
+                ok, error = False, str(e)
+            elapsed += time.time() - t0
+            logger.info(f"{'✅' if ok else '❌'} {key}: {len(result.events)} событий за {elapsed:.1f} сек")
+            runs.append(SourceRun(key, ok, result, round(elapsed, 1), error))
+
+    return runs
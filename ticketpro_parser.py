@@ -7,13 +7,16 @@ import json
 import re
 import sqlite3
 import logging
-import time
+from collections import defaultdict
 from datetime import datetime
 from typing import List, Dict, Optional
 
-import requests
 from bs4 import BeautifulSoup
-from normalizer import normalize_place, normalize_title, is_minsk_event, format_price_from_offers, normalize_price
+from event_fingerprints import load_dedup_index
+from event_upsert import bulk_connection, upsert_events
+from http_fetch import get_fetcher
+from normalizer import normalize_place, DedupIndex, is_minsk_event, format_price_from_offers, normalize_price
+from source_parser import BaseSourceParser, SourceResult
 # Определяем путь к БД (локально или на Railway)
 if os.path.exists('/data'):
     DB_PATH = '/data/events_final.db'  # Railway volume
@@ -31,8 +34,13 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+PAGE_WINDOW = 4  # сколько страниц категории грузить параллельно
+
+
+class TicketproParser(BaseSourceParser):
+    key = "ticketpro.by"
+    host = "www.ticketpro.by"
 
-class TicketproParser:
     def __init__(self, DB_PATH=os.getenv("DB_PATH", "/data/events_final.db")):
         DB_PATH = DB_PATH
         self.base_url = 'https://www.ticketpro.by'
@@ -45,10 +53,9 @@ class TicketproParser:
             ('/bilety-na-shou/yumor/', 'concert', 'Концерты'),
         ]
         
-        self.session = requests.Session()
-        self.session.headers.update({
+        self.headers = {
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-        })
+        }
         
         self.stats = {
             'total_pages': 0,
@@ -61,57 +68,31 @@ class TicketproParser:
         }
 
     def fetch_page(self, url: str) -> Optional[str]:
-        try:
-            logger.info(f"Загрузка {url}")
-            response = self.session.get(url, timeout=30)
-            response.encoding = 'utf-8'
-            if response.status_code == 200:
-                return response.text
-        except Exception as e:
-            logger.error(f"Ошибка загрузки: {e}")
-        return None
+        logger.info(f"Загрузка {url}")
+        return get_fetcher().get(url, headers=self.headers)
 
 
 
 
-    def load_relax_index(self) -> dict:
-        """Загружает все non-Ticketpro события одним запросом в память."""
+    def load_relax_index(self, dates=None) -> DedupIndex:
+        """Ключи non-Ticketpro событий на даты dates из event_fingerprints."""
         conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT title, event_date, place, show_time
-            FROM events WHERE source_name != 'ticketpro.by'
-        """)
-        rows = cursor.fetchall()
-        conn.close()
-        index = {}
-        for title, date, place, show_time in rows:
-            norm = normalize_title(title)
-            index.setdefault(date, []).append((norm, place or "", show_time or ""))
-        logger.info(f"📋 Загружено {sum(len(v) for v in index.values())} событий из БД для проверки дублей")
+        try:
+            index = load_dedup_index(conn, 'ticketpro.by', dates)
+        finally:
+            conn.close()
+        logger.info(f"📋 Загружено {len(index)} событий из БД для проверки дублей")
         return index
 
     def is_duplicate(self, title: str, event_date: str, place: str,
-                     show_time: str, relax_index: dict) -> bool:
+                     show_time: str, relax_index: DedupIndex) -> bool:
         """Проверяет дубликат по индексу в памяти — без запросов к БД."""
-        if not title or not event_date:
+        if relax_index.find(title, event_date, place, show_time) is None:
             return False
-        candidates = relax_index.get(event_date, [])
-        if not candidates:
-            return False
-        norm_title = normalize_title(title)
-        place = place or ""
-        show_time = show_time or ""
-        for norm_existing, ex_place, ex_time in candidates:
-            if place and show_time and ex_place == place and ex_time == show_time:
-                self.stats['duplicates_with_relax'] += 1
-                return True
-            if norm_title == norm_existing:
-                self.stats['duplicates_with_relax'] += 1
-                return True
-        return False
-
-    def parse_event_from_html(self, event_html, category: str, display_name: str, relax_index: dict = None) -> Optional[Dict]:
+        self.stats['duplicates_with_relax'] += 1
+        return True
+
+    def parse_event_from_html(self, event_html, category: str, display_name: str, relax_index: Optional[DedupIndex] = None) -> Optional[Dict]:
         try:
             title_tag = event_html.find('div', class_='event-box__title')
             if not title_tag:
@@ -239,8 +220,6 @@ class TicketproParser:
             if price:
                 description += f"\n💰 {price}"
 
-            self.stats['minsk_events'] += 1
-            self.stats['by_category'][display_name] = self.stats['by_category'].get(display_name, 0) + 1
             logger.info(f"✅ {display_name}: {title[:40]} | {place[:25]} | {price}")
 
             return {
@@ -261,19 +240,19 @@ class TicketproParser:
             logger.error(f"Ошибка парсинга HTML: {e}")
             return None
 
-    def parse_category_page(self, category_url: str, category: str, display_name: str) -> List[Dict]:
-        """Парсит все страницы категории."""
+    def parse_category_page(self, category_url: str, category: str, display_name: str,
+                            relax_index: Optional[DedupIndex] = None) -> List[Dict]:
+        """Парсит все страницы категории.
+
+        relax_index=None — без проверки дублей (она делается в save() после загрузки всех категорий).
+        """
         events = []
-        page = 1
         base_url = self.base_url + category_url
         max_pages = 50
-        
-        relax_index = self.load_relax_index()
-        while page <= max_pages:
-            url = f"{base_url}?page={page}" if page > 1 else base_url
-            
-            logger.info(f"Загрузка страницы {page} для {display_name}")
-            html = self.fetch_page(url)
+
+        # Страницы ?page=N грузятся окнами по PAGE_WINDOW параллельно и разбираются
+        # по порядку; страницы окна после последней просто отбрасываются.
+        for page, html in self._iter_pages(base_url, display_name, max_pages):
             if not html:
                 break
             
@@ -295,6 +274,8 @@ class TicketproParser:
                 self.stats['total_events_found'] += 1
                 event = self.parse_event_from_html(event_box, category, display_name, relax_index)
                 if event:
+                    self.stats['minsk_events'] += 1
+                    self.stats['by_category'][display_name] = self.stats['by_category'].get(display_name, 0) + 1
                     events.append(event)
             
             logger.info(f"Страница {page}: накоплено {len(events)} событий")
@@ -309,27 +290,32 @@ class TicketproParser:
             if not next_link or 'disabled' in next_link.get('class', []):
                 logger.info("Нет следующей страницы, завершаем")
                 break
-            
-            page += 1
-            time.sleep(1)
         
         return events
 
-    def save_events(self, all_events: List[Dict]) -> int:
-        """Сначала удаляет старые, потом сохраняет новые."""
+    def _iter_pages(self, base_url: str, display_name: str, max_pages: int):
+        """(номер, html) страниц категории по порядку.
+
+        Первая страница — отдельно (у большинства категорий она единственная),
+        дальше — окнами по PAGE_WINDOW.
+        """
+        logger.info(f"Загрузка страницы 1 для {display_name}")
+        yield 1, get_fetcher().get(base_url, headers=self.headers)
+        for start in range(2, max_pages + 1, PAGE_WINDOW):
+            numbers = list(range(start, min(start + PAGE_WINDOW, max_pages + 1)))
+            urls = [f"{base_url}?page={n}" for n in numbers]
+            logger.info(f"Загрузка страниц {numbers[0]}–{numbers[-1]} для {display_name}")
+            yield from zip(numbers, get_fetcher().get_many(urls, headers=self.headers))
+
+    def save_events(self, all_events: List[Dict]) -> List[Dict]:
+        """Приводит записи Ticketpro в БД к новому списку (upsert по разнице).
+        Возвращает записанные события. Ошибка БД пробрасывается — источник
+        помечается неуспешным (run_sources)."""
         if not all_events:
             logger.info("Нет событий для сохранения")
-            return 0
-        
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
+            return []
         
-        # 1. Удаляем все старые события Ticketpro
-        cursor.execute("DELETE FROM events WHERE source_name='ticketpro.by'")
-        deleted = cursor.rowcount
-        logger.info(f"🗑️ Удалено старых записей: {deleted}")
-        
-        # 2. Убираем дубликаты ВНУТРИ ЭТОГО ЗАПУСКА
+        # 1. Убираем дубликаты ВНУТРИ ЭТОГО ЗАПУСКА
         seen = set()
         unique_events = []
         
@@ -342,66 +328,68 @@ class TicketproParser:
                 seen.add(key)
                 unique_events.append(event)
         
-        # 3. Сохраняем уникальные события
-        new_count = 0
-        for event in unique_events:
-            try:
-                cursor.execute("""
-                    INSERT INTO events (
-                        title, details, description, event_date, show_time,
-                        place, location, price, category, source_url, source_name
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    event['title'], event['details'], event['description'],
-                    event['event_date'], event['show_time'], event['place'],
-                    event['location'], event['price'], event['category'],
-                    event['source_url'], event['source_name']
-                ))
-                new_count += 1
-            except Exception as e:
-                logger.error(f"Ошибка сохранения: {e}")
-        
-        conn.commit()
-        conn.close()
-        
-        return new_count
+        # 2. Вставляем новые, обновляем изменившиеся, удаляем исчезнувшие
+        try:
+            with bulk_connection(DB_PATH) as conn:
+                stats = upsert_events(conn, unique_events, "source_name = 'ticketpro.by'")
+        except Exception as e:
+            logger.error(f"Ошибка сохранения: {e}")
+            raise
+        logger.info(f"💾 Изменения в БД: {stats}")
+        return stats.written(unique_events)
 
-    def run(self):
+    def fetch(self) -> SourceResult:
         logger.info("="*60)
         logger.info("🎫 ПАРСЕР TICKETPRO (С НОРМАЛИЗАЦИЕЙ МЕСТ)")
         logger.info("="*60)
         
-        all_events = []
+        result = SourceResult()
         for cat_url, category, display_name in self.categories:
             logger.info(f"\n--- Парсинг категории: {display_name} ---")
             events = self.parse_category_page(cat_url, category, display_name)
-            all_events.extend(events)
+            result.batches.append((display_name, events))
+        return result
+
+    def save(self, result: SourceResult) -> SourceResult:
+        # Дубли с другими источниками — по индексу, загруженному после их сохранения
+        relax_index = self.load_relax_index(ev['event_date'] for ev in result.events)
+        all_events = []
+        event_category = {}
+        for display_name, events in result.batches:
+            for event in events:
+                if self.is_duplicate(event['title'], event['event_date'], event['place'],
+                                     event['show_time'], relax_index):
+                    self.stats['minsk_events'] -= 1
+                    self.stats['by_category'][display_name] -= 1
+                    continue
+                all_events.append(event)
+                event_category[id(event)] = display_name
         
         if all_events:
-            saved = self.save_events(all_events)
+            written = self.save_events(all_events)
+            saved = len(written)
+            saved_by_category = defaultdict(int)
+            for event in written:
+                saved_by_category[event_category[id(event)]] += 1
             logger.info("\n" + "="*60)
             logger.info("📊 СТАТИСТИКА ЗАПУСКА")
             logger.info(f"   📄 Всего страниц: {self.stats['total_pages']}")
             logger.info(f"   🔍 Найдено событий: {self.stats['total_events_found']}")
             logger.info(f"   ✅ Прошли фильтр Минска: {self.stats['minsk_events']}")
             logger.info(f"   ❌ Отфильтровано (не Минск): {self.stats['filtered_out']}")
-            logger.info(f"   🔁 Дубликатов с Relax: {self.stats['duplicates_with_relax']}")
+            logger.info(f"   🔁 Дубликатов с Relax: {self.stats['duplicates_with_relax']} {dict(relax_index.reasons)}")
             logger.info(f"   🔂 Дубликатов внутри запуска: {self.stats['duplicates_within_run']}")
             logger.info("\n   📊 По категориям:")
             for cat, count in self.stats['by_category'].items():
                 logger.info(f"     {cat}: {count}")
             logger.info(f"\n   💾 Сохранено в БД: {saved}")
-            print(f"   📊 Результаты:")
-            print(f"      ✅ Добавлено новых событий: {saved}")
-            print(f"      🔁 Дубликатов с Relax: {self.stats['duplicates_with_relax']}")
-            print(f"      ❌ Не Минск: {self.stats['filtered_out']}")
             # По категориям ticketpro
             for cat_name, cnt in self.stats['by_category'].items():
-                print(f"RESULT:{cat_name}:{cnt}:{cnt}")
+                result.count(cat_name, found=cnt, saved=saved_by_category[cat_name])
         else:
             logger.warning("❌ События не найдены")
-            print("   ⚠️ Ticketpro: события не найдены")
         logger.info("="*60)
+        return result
 
 if __name__ == "__main__":
     parser = TicketproParser()